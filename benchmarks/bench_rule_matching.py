@@ -0,0 +1,100 @@
+"""
+Benchmark: rule analysis of one file, the per-rule loop over all lines (before) vs
+the single-pass MultiPatternMatcher (after). Both must report the same matches.
+
+Run from the repo root:
+    PYTHONPATH=. python benchmarks/bench_rule_matching.py [lines] [rules]
+"""
+import random
+import re
+import sys
+import time
+
+from logai.rule_matcher import MultiPatternMatcher
+from logai.utils.constants import PARSER_CONFIG_MAX_MATCHES
+
+WORDS = [
+    "wifi", "client", "connected", "disconnected", "dhcp", "lease", "timeout", "reboot",
+    "kernel", "panic", "memory", "wlan0", "hostapd", "station", "auth", "failure",
+    "dnsmasq", "query", "reply", "gateway", "ethernet", "link", "down", "up",
+]
+
+
+def make_rules(count):
+    rnd = random.Random(7)
+    rules = []
+    for i in range(count):
+        a, b = rnd.sample(WORDS, 2)
+        kind = i % 4
+        if kind == 0:
+            rules.append(rf"{a} .* {b}")
+        elif kind == 1:
+            rules.append(rf"(?i){a}\s+{b}_{i}")
+        elif kind == 2:
+            rules.append(rf"({a}|{b}) error code \d+")
+        else:
+            rules.append(rf"rule{i}:\s*\w+")
+    return [re.compile(rule) for rule in rules]
+
+
+def make_lines(count):
+    rnd = random.Random(11)
+    lines = []
+    for i in range(count):
+        words = " ".join(rnd.choice(WORDS) for _ in range(8))
+        if i % 50 == 0:
+            words += f" rule{rnd.randrange(200)}: hit"
+        if i % 70 == 0:
+            words += f" {rnd.choice(WORDS)} error code {i}"
+        lines.append(f"2025-09-03T00:00:00 {words}\n")
+    return lines
+
+
+def legacy(patterns, lines):
+    out = []
+    for pattern in patterns:
+        matches = []
+        for line in lines:
+            if pattern.search(line):
+                matches.append(line)
+                if len(matches) >= PARSER_CONFIG_MAX_MATCHES:
+                    break
+        out.append(matches)
+    return out
+
+
+def single_pass(patterns, lines):
+    matcher = MultiPatternMatcher(patterns)
+    out = [[] for _ in patterns]
+    done = [False] * len(patterns)
+    for line in lines:
+        for i in matcher.match(line, done):
+            out[i].append(line)
+            if len(out[i]) >= PARSER_CONFIG_MAX_MATCHES:
+                done[i] = True
+    return out, matcher
+
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    n_rules = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    patterns = make_rules(n_rules)
+    lines = make_lines(n_lines)
+
+    start = time.perf_counter()
+    before_result = legacy(patterns, lines)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after_result, matcher = single_pass(patterns, lines)
+    after = time.perf_counter() - start
+
+    assert before_result == after_result, "matchers disagree"
+    print(f"lines: {n_lines}, rules: {n_rules} ({matcher.prefiltered} prefiltered)")
+    print(f"before (rule x line loop): {before:.3f}s")
+    print(f"after  (single pass):      {after:.3f}s")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: app startup. Import time of the WSGI entry point and of the modules the
+callbacks import, which heavy libraries got imported along the way, the latency of the
+first HTTP request and of the first and second embedding encode. Every measurement runs
+in a fresh interpreter.
+
+Run from the repo root:
+    PYTHONPATH=. python benchmarks/bench_startup.py [repeats]
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = ["logai_wsgi", "logai.embedding", "logai.log_parser_config", "logai.pattern"]
+HEAVY = ["torch", "sentence_transformers", "transformers", "faiss"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+REQUEST_SNIPPET = """
+import json, time
+from logai_wsgi import server
+client = server.test_client()
+start = time.perf_counter()
+status = client.get("/").status_code
+print(json.dumps({"seconds": time.perf_counter() - start, "status": status}))
+"""
+
+ENCODE_SNIPPET = """
+import json, time
+from logai.embedding_service import allow_local_fallback, embedding_encoder
+allow_local_fallback()
+start = time.perf_counter()
+encoder = embedding_encoder()
+encoder.encode(["<DATETIME> <THREADID> wifi client connected"])
+first = time.perf_counter() - start
+start = time.perf_counter()
+encoder.encode(["<DATETIME> <THREADID> wifi client disconnected"])
+print(json.dumps({"first": first, "second": time.perf_counter() - start, "encoder": type(encoder).__name__}))
+"""
+
+
+def run(snippet):
+    proc = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True)
+    if proc.returncode:
+        return None, proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    for module in MODULES:
+        times, heavy, error = [], [], None
+        for _ in range(repeats):
+            result, error = run(IMPORT_SNIPPET.format(module=module, heavy=HEAVY))
+            if result is None:
+                break
+            times.append(result["seconds"])
+            heavy = result["heavy"]
+        if error:
+            print(f"import {module}: failed ({error})")
+        else:
+            print(f"import {module}: {statistics.median(times):.3f}s median of {repeats}, "
+                  f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+    result, error = run(REQUEST_SNIPPET)
+    if error:
+        print(f"first request: failed ({error})")
+    else:
+        print(f"first request GET /: {result['seconds']:.3f}s (status {result['status']})")
+
+    result, error = run(ENCODE_SNIPPET)
+    if error:
+        print(f"first encode: failed ({error})")
+    else:
+        print(f"first encode ({result['encoder']}): {result['first']:.3f}s, second: {result['second']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: template metadata of a project's FAISS index. The older meta.pkl list of
+dicts, loaded whole on every search and rewritten on every add, against the Arrow
+segments of TemplateMetaStore, where a search takes only its k rows and an add writes
+one new segment.
+
+Run from the repo root:
+    PYTHONPATH=. python benchmarks/bench_template_meta.py [templates] [files] [k]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from logai.template_meta import TemplateMetaStore, vector_ids
+
+
+def make_rows(count, filename):
+    return [{"template": f"<DATETIME> <THREADID> {filename} component {i} state changed to <NUM>",
+             "frequency": i % 997, "filename": filename} for i in range(count)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    per_file = count // files
+    rng = np.random.default_rng(0)
+    queries = [rng.integers(count, size=k) for _ in range(50)]
+
+    with tempfile.TemporaryDirectory() as project_dir:
+        pkl = os.path.join(project_dir, "meta.pkl")
+        start = time.perf_counter()
+        for f in range(files):
+            meta = []
+            if os.path.exists(pkl):
+                with open(pkl, "rb") as fh:
+                    meta = pickle.load(fh)
+            meta.extend(make_rows(per_file, f"file{f}"))
+            with open(pkl, "wb") as fh:
+                pickle.dump(meta, fh)
+        pkl_add = time.perf_counter() - start
+        start = time.perf_counter()
+        for ids in queries:
+            with open(pkl, "rb") as fh:
+                meta = pickle.load(fh)
+            [meta[int(i)] for i in ids]
+        pkl_search = (time.perf_counter() - start) / len(queries)
+
+        store = TemplateMetaStore(project_dir)
+        start = time.perf_counter()
+        all_ids = []
+        for f in range(files):
+            rows = make_rows(per_file, f"file{f}")
+            columns = {c: [r[c] for r in rows] for c in ("template", "frequency", "filename")}
+            columns["id"] = vector_ids(store.file_id(f"file{f}"), columns["template"])
+            store.append(columns)
+            all_ids.append(columns["id"])
+        arrow_add = time.perf_counter() - start
+        all_ids = np.concatenate(all_ids)
+        start = time.perf_counter()
+        for positions in queries:
+            TemplateMetaStore(project_dir).take(all_ids[positions])  # fresh store: nothing cached between searches
+        arrow_search = (time.perf_counter() - start) / len(queries)
+
+    print(f"templates: {files * per_file} in {files} files, k: {k}")
+    print(f"meta.pkl  adding all files: {pkl_add:.2f}s, per search: {pkl_search * 1000:.2f} ms")
+    print(f"arrow     adding all files: {arrow_add:.2f}s, per search: {arrow_search * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: timestamp parsing rows/second, per-row try_parse (before) vs the
+vectorized Pattern._parse_timestamps (after).
+
+Run from the repo root:
+    PYTHONPATH=. python benchmarks/bench_timestamp_parsing.py [rows]
+"""
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from dateutil import parser as dateparser
+
+from logai.pattern import Pattern
+
+SAMPLES = [
+    "2025-09-03T00:28:37",
+    "2025-09-03-00-28-37",
+    "250903-00:28:37.123",
+    "Sep  3 00:28:37",
+    "2025-09-03 00:28:37",
+    "175383.097855",
+    None,
+]
+
+
+def legacy_try_parse(ts):
+    """Per-row parser used by _logs_to_dataframe before vectorization."""
+    if pd.isna(ts) or not isinstance(ts, str) or not ts.strip():
+        return pd.NaT
+    ts = ts.strip()
+    if re.match(r"^\d+\.\d+$", ts):
+        return pd.NaT
+    if re.match(r"^\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}$", ts):
+        try:
+            return datetime.strptime(ts, "%Y-%m-%d-%H-%M-%S")
+        except Exception:
+            return pd.NaT
+    if re.match(r"^\d{6}-\d{2}:\d{2}:\d{2}\.\d+", ts):
+        try:
+            return datetime.strptime(ts[:15], "%y%m%d-%H:%M:%S")
+        except Exception:
+            pass
+    if re.match(r"^[A-Z][a-z]{2}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}$", ts):
+        dt = dateparser.parse(ts)
+        if dt:
+            return dt
+    dt = dateparser.parse(ts)
+    if dt is None:
+        return pd.NaT
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def legacy_parse(raw):
+    timestamps = raw.apply(legacy_try_parse)
+    real_times = timestamps.dropna()
+    base_time = real_times.min() if not real_times.empty else datetime.now()
+    hostapd_mask = timestamps.isna() & raw.notna() & raw.astype(str).str.match(r"^\d+\.\d+$")
+    timestamps.loc[hostapd_mask] = raw[hostapd_mask].apply(lambda x: base_time + timedelta(seconds=float(x)))
+    return pd.to_datetime(timestamps, errors="coerce")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    raw = pd.Series([SAMPLES[i % len(SAMPLES)] for i in range(rows)], dtype=object)
+    # uptimes with 6 and 7 decimals exercise the microsecond rounding
+    uptimes = raw.index[raw.eq(SAMPLES[5])]
+    raw[uptimes] = [f"{i * 7.0000013:.{6 + i % 2}f}" for i in range(len(uptimes))]
+    parser = Pattern()
+
+    start = time.perf_counter()
+    expected = legacy_parse(raw)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    timestamps, _ = parser._parse_timestamps(raw)
+    after = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(pd.to_datetime(timestamps), expected, check_names=False)
+
+    print(f"rows: {rows}")
+    print(f"before (per-row try_parse): {rows / before:,.0f} rows/s ({before:.3f}s)")
+    print(f"after  (vectorized):        {rows / after:,.0f} rows/s ({after:.3f}s)")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
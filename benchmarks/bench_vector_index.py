@@ -0,0 +1,86 @@
+"""
+Benchmark: FAISS index types for template search, recall@k against the exact flat
+index and single-query latency (the AI search issues one query at a time), plus build
+time and index size. Vectors are clustered like template embeddings: many templates of
+a project are near-duplicates differing in a few tokens.
+
+Run from the repo root:
+    PYTHONPATH=. python benchmarks/bench_vector_index.py [vectors] [queries] [k] [types]
+
+types is a comma separated subset of flat,ivf_flat,ivf_pq,hnsw (ivf_pq trains slowly).
+"""
+import sys
+import time
+
+import numpy as np
+
+from logai.vector_index import (
+    INDEX_TYPES, apply_search_params, build_index, flat_params, promoted_params, faiss,
+)
+
+DIMENSION = 384  # all-MiniLM-L6-v2
+SWEEP_NPROBE = [4, 8, 16, 32, 64]
+SWEEP_EF_SEARCH = [32, 64, 128, 256]
+
+
+def make_vectors(count, rng):
+    centers = rng.normal(size=(max(count // 20, 1), DIMENSION)).astype("float32")
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors += 0.35 * rng.normal(size=vectors.shape).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(vectors, count, rng):
+    queries = vectors[rng.integers(len(vectors), size=count)]
+    queries = queries + 0.2 * rng.normal(size=queries.shape).astype("float32")
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype("float32")
+
+
+def index_bytes(index):
+    return len(faiss.serialize_index(index))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    types = sys.argv[4].split(",") if len(sys.argv) > 4 else list(INDEX_TYPES)
+    if "flat" not in types:
+        types.insert(0, "flat")  # ground truth
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(3)
+    vectors = make_vectors(count, rng)
+    queries = make_queries(vectors, n_queries, rng)
+
+    print(f"vectors: {count}, queries: {n_queries}, k: {k}")
+    truth = None
+    for index_type in types:
+        params = flat_params(DIMENSION) if index_type == "flat" else promoted_params(index_type, DIMENSION, count)
+        start = time.perf_counter()
+        index = build_index(params, vectors, np.arange(count))
+        build = time.perf_counter() - start
+        print(f"{index_type}: build {build:.2f}s, size {index_bytes(index) / 1e6:.1f} MB")
+
+        # the default search knob first, then a sweep of it
+        sweep = [None]
+        if index_type in ("ivf_flat", "ivf_pq"):
+            sweep += [{"nprobe": n} for n in SWEEP_NPROBE if n != params["nprobe"] and n <= params["nlist"]]
+        elif index_type == "hnsw":
+            sweep += [{"ef_search": ef} for ef in SWEEP_EF_SEARCH if ef != params["ef_search"]]
+        for knob in sweep:
+            search_params = dict(params, **(knob or {}))
+            apply_search_params(index, search_params)
+            start = time.perf_counter()
+            found = np.vstack([index.search(query[None, :], k)[1] for query in queries])
+            latency = (time.perf_counter() - start) / n_queries * 1000
+            if truth is None:
+                truth = found
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)])
+            knobs = {key: value for key, value in search_params.items()
+                     if key not in ("type", "dimension", "trained_on")}
+            print(f"  recall@{k}: {recall:.3f}  query: {latency:7.3f} ms  {knobs}{'' if knob else '  (default)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,13 @@ import secrets
 import os
 from pathlib import Path
 from gui.user_db_mngr import DBManager
-from sentence_transformers import SentenceTransformer
 dbm = DBManager()
 
 from logai.utils.constants import (
     BASE_DIR, 
     UPLOAD_DIRECTORY,
-    SENTENCE_TRANSFORMER_MODE_NAME,
 )
 
-EMBEDDING_MODEL=None
 
 def create_app():
     # Initialize Flask server and Dash app
@@ -29,14 +26,8 @@ def create_app():
     dbm.init_app(flask_server)
     dbm.create_tables(flask_server)
 
-    # check and download sentence transformer
-    model_path=os.path.join(BASE_DIR, SENTENCE_TRANSFORMER_MODE_NAME)
-    if not os.path.exists(model_path):
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        model.save(model_path)
-    global EMBEDDING_MODEL
-    EMBEDDING_MODEL=SentenceTransformer(model_path)
-    print(f"Loaded SentenceTransformer model from {model_path}")
+    # the SentenceTransformer model lives in the embedding service
+    # (python -m logai.embedding_service), see logai/embedding_service.py
 
 
     app = Dash(
@@ -9,6 +9,8 @@ from gui.pages.highlighter import TextHighlighter
 from logai.utils.constants import UPLOAD_DIRECTORY, LINES_PER_PAGE
 
 from logai.embedding import VectorEmbedding
+from logai.parameter_stats import parameter_summary, read_parameter_stats
+from logai.pattern_result import read_template_rows, read_time_window
 
 @callback(
     Output("ai-embed-search-results", "data"),
@@ -61,32 +63,17 @@ def update_ai_embed_search_results(n_clicks, model_close, query, project_data):
         return True, str(error)
 
 
-def get_param_subset(result_df, log_pattern):
-    para_list = pd.DataFrame(None, columns=["position", "value_counts", "values"])
+def get_param_subset(result_file_path, log_pattern):
+    """Per-position parameter table of log_pattern, from the parse-time statistics."""
+    if not log_pattern:
+        return parameter_summary(None)
+    return parameter_summary(read_parameter_stats(result_file_path, log_pattern))
 
-    if result_df.empty or not log_pattern:
-        return para_list
-
-    parameters = result_df[result_df["template"] == log_pattern]["parameter_list"]
-
-    para_list["values"] = pd.Series(
-        pd.DataFrame(parameters.tolist()).T.values.tolist()
-    )
-    para_list["position"] = [
-        "POSITION_{}".format(v) for v in para_list.index.values
-    ]
-    para_list["value_counts"] = [
-        len(list(filter(None, v))) for v in para_list["values"]
-    ]
-
-    return para_list
-
-def get_parameter_list(df, template):
-    subset = get_param_subset(df, template)
-
-    subset["values"] = subset["values"].apply(lambda x: ", ".join(set(filter(None, x))))
+def get_parameter_list(result_file_path, template):
+    subset = get_param_subset(result_file_path, template)
     subset = subset.rename(
-        columns={"position": "Position", "value_counts": "Count", "values": "Value"}
+        columns={"position": "Position", "value_counts": "Count", "distinct": "Distinct",
+                 "values": "Value", "range": "Range"}
     )
     columns = [{"name": c, "id": c} for c in subset.columns]
     return dash_table.DataTable(
@@ -108,10 +95,7 @@ def get_parameter_list(df, template):
         column_selectable="single",
     )
 def get_logline_subset(df, log_pattern):
-    res = df[df["template"] == log_pattern].drop(
-        ["parameter_list", "template"], axis=1
-    )
-    return res
+    return df[["timestamp", "loglines"]]
 
 def get_log_lines(df, template):
     df = get_logline_subset(df, template)
@@ -151,9 +135,10 @@ def load_loglines(selected, rows, project_data):
             #project_dir = Path(f'{UPLOAD_DIRECTORY}/{user_id}/{project_id}')
             filename, filepath, original_name, file_size, _ = dbm.get_project_file_info_orig_name(project_id, filename)
             parquet_path = Path(str(filepath) + ".parquet")
-            df = pd.read_parquet(parquet_path).reset_index(drop=True)
+            df = read_template_rows(parquet_path, template, columns=["timestamp", "loglines"])
+            df = df.reset_index(drop=True)
             
-            param_list = get_parameter_list(df, template)
+            param_list = get_parameter_list(parquet_path, template)
             log_lines = get_log_lines(df, template)
 
             return param_list, log_lines, original_name, template
@@ -231,10 +216,6 @@ def load_raw_loglines(selected, time_period, highlight_toggle, template, time_un
     # Get the file info
     filename, filepath, original_name, file_size, _ = dbm.get_project_file_info_orig_name(project_id, filename)
     parquet_path = Path(str(filepath) + ".parquet")
-    df = pd.read_parquet(parquet_path).reset_index(drop=True)
-
-    # Convert timestamp column to datetime
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
     timestamp = pd.to_datetime(row["timestamp"])
 
     # Compute time window
@@ -247,8 +228,9 @@ def load_raw_loglines(selected, time_period, highlight_toggle, template, time_un
     start_time = timestamp - delta
     end_time = timestamp + delta
 
-    # Filter logs in window
-    context_logs = df[(df["timestamp"] >= start_time) & (df["timestamp"] <= end_time)]
+    # Read only the logs in the window, indexed by their row number in the file
+    context_logs = read_time_window(parquet_path, start_time, end_time, columns=["timestamp", "loglines", "template"])
+    context_logs["timestamp"] = pd.to_datetime(context_logs["timestamp"])
 
     # Render lines with optional highlighting
     lines = []
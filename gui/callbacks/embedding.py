@@ -7,9 +7,11 @@ import dash
 from gui.app_instance import dbm
 from logai.pattern import Pattern
 import time
-from logai.utils.constants import UPLOAD_DIRECTORY
+from logai.utils.constants import UPLOAD_DIRECTORY, FAISS_INDEX_STALE_SECONDS
 from logai.utils.constants import NON_TEXT_EXTENSIONS, IGNORE_FILENAME_LIST
-from logai.embedding import VectorEmbedding, read_status, update_file_status
+from logai.embedding import faiss_scheduler
+from logai.project_status import read_status, update_file_status
+from logai.pattern_result import load_templates
 
 @callback(
     Output("embed-templates-table", "data"),
@@ -36,14 +38,14 @@ def update_templates_table(selected_file, project_data):
     
     # Parse logs and extract patterns
     parser = Pattern(project_dir=project_dir)
-    result_df, result_df_path = parser.parse_logs(file_path)
+    _, result_df_path = parser.parse_logs(file_path, load_result=False)
+    templates_df = load_templates(result_df_path)
     
-    if result_df is None or result_df.empty:
+    if templates_df is None or templates_df.empty:
         return []
 
     # get subset of columns with template and count
-    template_counts = result_df['template'].value_counts().reset_index()
-    template_counts.columns = ['template', 'count']
+    template_counts = templates_df[['template', 'count']].sort_values('count', ascending=False)
     template_counts['log_type'] = ''
     template_counts['meaning'] = ''
     return template_counts.to_dict('records')
@@ -51,13 +53,16 @@ def update_templates_table(selected_file, project_data):
 def get_pipeline_status(project_dir):
     status = read_status(project_dir)
     queued_files, parsed_files, done_files = [], [], []
-    color_map = {"queued": "gray", "processing": "blue", "done": "orange", "indexed": "green", "error": "red"}
+    color_map = {"queued": "gray", "processing": "blue", "indexing": "blue", "done": "orange", "indexed": "green", "error": "red"}
 
     for fname, info in sorted(status.items()):
         state = info.get("state", "queued")
         color = color_map.get(state, "gray")
+        label = fname
+        if state == "indexed" and "embedding_cache_hit_rate" in info:
+            label = f"{fname} (cache {info['embedding_cache_hit_rate']:.0%})"
         badge = html.Div(
-            fname,
+            label,
             style={
                 "padding": "4px 6px",
                 "margin": "2px 0",
@@ -68,7 +73,7 @@ def get_pipeline_status(project_dir):
         )
         if state == "queued":
             queued_files.append(badge)
-        elif state == "parsed":
+        elif state in ("parsed", "indexing"):
             parsed_files.append(badge)
         elif state == "indexed":
             done_files.append(badge)
@@ -140,16 +145,39 @@ def update_status(_interval, project_data):
             continue
 
         status = read_status(project_dir).get(original_name, {})
-        if status.get("state") == "parsed":
-                # check if parquet file exists
-                parquet_path = project_dir / f"{filename}.parquet"
-                if parquet_path.exists():
-                    #faiss_scheduler.enqueue_file(project_dir, parquet_path)
-                    embedding  = VectorEmbedding()
-                    embedding.add_templates(project_dir, parquet_path, original_name)
-                    update_file_status(project_dir, original_name, "indexed", {"queued_at": time.time()})
-                    break  # Enqueue one file at a time
-    
+        state = status.get("state")
+        if state == "indexing":
+            # queued again only when the worker process that queued it went away
+            if faiss_scheduler.is_pending(project_dir, original_name):
+                continue
+            if time.time() - status.get("timestamp", 0) < FAISS_INDEX_STALE_SECONDS:
+                continue
+        elif state != "parsed":
+            continue
+        elif time.time() < (status.get("retry_at") or 0):
+            # failed to index, offered again later
+            continue
+        parquet_path = project_dir / f"{filename}.parquet"
+        if parquet_path.exists():
+            # indexed in the background, the full queue is offered again on the next poll
+            if not faiss_scheduler.enqueue_file(project_dir, parquet_path, original_name):
+                break
+
+    # vectors of files that are no longer part of the project
+    project_names = {original_name for _, _, original_name, _, _ in files}
+    for name, info in read_status(project_dir).items():
+        state = info.get("state")
+        if name in project_names or state not in ("indexed", "removing"):
+            continue
+        if state == "removing":
+            if faiss_scheduler.is_pending(project_dir, name):
+                continue
+            # a failed removal is retried at retry_at, one of a dead worker when stale
+            if time.time() < (info.get("retry_at") or info.get("timestamp", 0) + FAISS_INDEX_STALE_SECONDS):
+                continue
+        if not faiss_scheduler.remove_file(project_dir, name):
+            break
+
     print("Checked for parsed files to index")
     queued_files, parsed_files, done_files, all_done = get_pipeline_status(project_dir)
     return queued_files, parsed_files, done_files, all_done
@@ -169,10 +197,7 @@ def export_df_to_csv(files):
         if not parquet_path.exists():
             continue
 
-        df = pd.read_parquet(parquet_path)
-
-        # Drop unwanted columns
-        df = df.drop(columns=["timestamp", "loglines", "parameter_list"], errors="ignore")
+        df = load_templates(parquet_path)[['template', 'count']].copy()
         df['template'] = df['template'].astype(str)
         
         ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
@@ -181,8 +206,9 @@ def export_df_to_csv(files):
         # Remove any remaining non-printable ASCII chars
         df['template'] = df['template'].apply(lambda x: re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f]', '', x))
         
-        result_df = df['template'].value_counts().reset_index()
-        result_df.columns = ['template', 'count']
+        # templates that only differed by stripped characters are merged
+        result_df = df.groupby('template', as_index=False)['count'].sum()
+        result_df = result_df.sort_values('count', ascending=False, ignore_index=True)
 
         result_df["filename"] = original_name
 
@@ -1,12 +1,15 @@
+import os
 from pathlib import Path
 from dash import dcc, ctx, Input, Output, State, callback, dash_table, html
 import plotly.express as px
 from gui.app_instance import dbm
 from logai.log_parser_config import LogParserConfig
+from logai.parser_report import read_report_status, report_jobs
 from dash import no_update
 
 from logai.utils.constants import (
-    UPLOAD_DIRECTORY
+    UPLOAD_DIRECTORY,
+    PARSER_CONFIG_USE_TEMPLATES,
 )
 
 def summary(result_df):
@@ -157,7 +160,7 @@ def click_run( n_click, modal_close, project_data ):
 
                 project_dir = Path(f'{UPLOAD_DIRECTORY}/{user_id}/{project_id}')
                 lpc = LogParserConfig()
-                result_df = lpc.analyse_logs(project_dir, files)
+                result_df = lpc.analyse_logs(project_dir, files, use_templates=PARSER_CONFIG_USE_TEMPLATES)
                 if result_df.empty:
                     return no_update, no_update, no_update, False, ""
 
@@ -179,34 +182,45 @@ def click_run( n_click, modal_close, project_data ):
     Output("parser-download-report", "data"),
     Output("parser_dwld_exception_modal", "is_open"),
     Output("parser_dwld_exception_modal_content", "children"),
+    Output("parser-report-interval", "disabled"),
+    Output("parser-report-progress", "children"),
     Input("parser-generate-report-btn", "n_clicks"),
     Input("parser_dwld_exception_modal_close", "n_clicks"),
+    Input("parser-report-interval", "n_intervals"),
     State("current-project-store", "data"),
     prevent_initial_call=True,
 )
-def generate_report(n_clicks, modal_close, project_data):
+def generate_report(n_clicks, modal_close, n_intervals, project_data):
     if not project_data or not project_data.get("project_id"):
-        return  no_update, False, ""
+        return  no_update, False, "", True, ""
 
     try:
         if ctx.triggered:
             prop_id = ctx.triggered[0]["prop_id"].split(".")[0]
-            
+            project_id = project_data["project_id"]
+            project_name = project_data["project_name"]
+            user_id = project_data.get("user_id")
+            project_dir = Path(f'{UPLOAD_DIRECTORY}/{user_id}/{project_id}')
+
             if prop_id == "parser-generate-report-btn":
-                project_id = project_data["project_id"]
-                project_name = project_data["project_name"]
-                user_id = project_data.get("user_id")
-                project_dir = Path(f'{UPLOAD_DIRECTORY}/{user_id}/{project_id}')
-                lpc = LogParserConfig()
-                pdf_path, pdf_name = lpc.generate_pdf(project_dir, project_name)
-                if not pdf_path:
-                    return no_update, False, ""
-                
-                return dcc.send_file(pdf_path), False, ""
+                # built in the background, the interval below polls report_status.json
+                report_jobs.start(project_dir, project_name)
+                return no_update, False, "", False, "Generating report..."
+
+            elif prop_id == "parser-report-interval":
+                status = read_report_status(project_dir)
+                state = status.get("state")
+                if state == "running":
+                    return no_update, False, "", False, f"Generating report... {status.get('progress', 0.0):.0%}"
+                if state == "error":
+                    return no_update, True, status.get("message", ""), True, ""
+                if state == "done" and os.path.exists(status.get("pdf_path", "")):
+                    return dcc.send_file(status["pdf_path"]), False, "", True, ""
+                return no_update, False, "", True, ""
 
             elif prop_id == "parser_dwld_exception_modal_close":
-                return no_update, False, ""
+                return no_update, False, "", True, ""
         else:
-            return no_update, False, ""
+            return no_update, False, "", True, ""
     except Exception as error:
-        return no_update, True, str(error)
\ No newline at end of file
+        return no_update, True, str(error), True, ""
\ No newline at end of file
@@ -8,6 +8,9 @@ from dash import ctx, html, Input, Output, State, callback, dash_table
 import dash
 from gui.app_instance import dbm
 from logai.pattern import Pattern
+from logai.pattern_result import load_templates, read_result, read_rollup, read_template_rows
+from logai.parameter_stats import parameter_summary, read_parameter_stats
+from logai.utils.downsample import lttb
 import plotly.graph_objects as go
 
 from logai.utils.constants import (
@@ -21,15 +24,15 @@ def save_result_df(result_df, file_path):
     result_df.to_parquet(result_file_path, index=False)
     return result_file_path
 
-def load_result_df(file_path):
+def load_result_df(file_path, columns=None):
     if not os.path.exists(file_path):
         return pd.DataFrame()
-    return pd.read_parquet(file_path)
+    return read_result(file_path, columns=columns)
 
-def summary(result_df):
-    if len(result_df) > 0:
-        total_loglines = len(result_df["loglines"])
-        total_log_patterns = len(result_df["template"].unique())
+def summary(templates_df):
+    if len(templates_df) > 0:
+        total_loglines = int(templates_df["count"].sum())
+        total_log_patterns = len(templates_df)
 
         return html.Div(
             [
@@ -45,8 +48,8 @@ def summary(result_df):
             ]
         )
 
-def summary_graph(result_df):
-    count_table = result_df["template"].value_counts()
+def summary_graph(templates_df):
+    count_table = templates_df.set_index("template")["count"].sort_values(ascending=False)
     scatter_df = pd.DataFrame(count_table)
     scatter_df.columns = ["counts"]
     
@@ -103,18 +106,16 @@ def click_run(
 
                 project_dir = Path(f'{UPLOAD_DIRECTORY}/{user_id}/{project_id}')
                 
-                # Parse logs and extract patterns
+                # Parse logs and extract patterns; the page only needs the templates table
                 parser = Pattern(project_dir=project_dir)
-                result_df, result_df_path = parser.parse_logs(file_path)
+                _, result_df_path = parser.parse_logs(file_path, load_result=False)
+                templates_df = load_templates(result_df_path)
 
-                if result_df is None or result_df.empty:
+                if templates_df is None or templates_df.empty:
                     return None,dash.no_update,dash.no_update, True, "No patterns were extracted from the log file."
 
-                if "timestamp" not in result_df.columns or "loglines" not in result_df.columns:
-                    return None,dash.no_update,dash.no_update, True, "The log file must contain 'timestamp' and 'logline' columns."
-                
-                summary_div = summary(result_df)
-                fig = summary_graph(result_df)
+                summary_div = summary(templates_df)
+                fig = summary_graph(templates_df)
 
                 return str(result_df_path), summary_div, fig, False, ""
             
@@ -143,25 +144,11 @@ def update_log_pattern(data):
     else:
         return html.Div()
 
-def get_parameter_list(result_df, log_pattern):
-    para_list = pd.DataFrame(None, columns=["position", "value_counts", "values"])
-
-    if result_df.empty or not log_pattern:
-        return para_list
-
-    parameters = result_df[result_df["template"] == log_pattern]["parameter_list"]
-
-    para_list["values"] = pd.Series(
-        pd.DataFrame(parameters.tolist()).T.values.tolist()
-    )
-    para_list["position"] = [
-        "POSITION_{}".format(v) for v in para_list.index.values
-    ]
-    para_list["value_counts"] = [
-        len(list(filter(None, v))) for v in para_list["values"]
-    ]
-
-    return para_list
+def get_parameter_list(result_file_path, log_pattern):
+    """Per-position parameter table of log_pattern, from the parse-time statistics."""
+    if not log_pattern:
+        return parameter_summary(None)
+    return parameter_summary(read_parameter_stats(result_file_path, log_pattern))
 
 
 @callback(
@@ -171,14 +158,11 @@ def get_parameter_list(result_df, log_pattern):
 )
 def update_dynamic_lists(data, result_df_path):
     if data is not None and result_df_path is not None:
-        df_logs = load_result_df(result_df_path)
         selected_template = data['points'][0]['customdata']
-        
-        subset = get_parameter_list(df_logs, selected_template)
-
-        subset["values"] = subset["values"].apply(lambda x: ", ".join(set(filter(None, x))))
+        subset = get_parameter_list(result_df_path, selected_template)
         subset = subset.rename(
-            columns={"position": "Position", "value_counts": "Count", "values": "Value"}
+            columns={"position": "Position", "value_counts": "Count", "distinct": "Distinct",
+                     "values": "Value", "range": "Range"}
         )
         columns = [{"name": c, "id": c} for c in subset.columns]
         return dash_table.DataTable(
@@ -202,13 +186,8 @@ def update_dynamic_lists(data, result_df_path):
     else:
         return dash_table.DataTable()
 
-def get_log_lines(result_df, log_pattern):
-        df = result_df
-        res = df[df["template"] == log_pattern].drop(
-            ["parameter_list", "template"], axis=1
-        )
-
-        return res
+def get_log_lines(result_file_path, log_pattern):
+        return read_template_rows(result_file_path, log_pattern, columns=["timestamp", "loglines"])
 
 @callback(
     Output("select-loglines", "children"), 
@@ -217,8 +196,7 @@ def get_log_lines(result_df, log_pattern):
 )
 def update_logline(data, result_df_path):
     if data is not None and result_df_path is not None:
-        df_logs = load_result_df(result_df_path)
-        df = get_log_lines(df_logs, data["points"][0]["customdata"])
+        df = get_log_lines(result_df_path, data["points"][0]["customdata"])
         columns = [{"name": c, "id": c} for c in df.columns]
         return dash_table.DataTable(
             data=df.to_dict("records"),
@@ -280,33 +258,18 @@ def update_y_timeseries(data, interval, result_df_path):
     if data is None or result_df_path is None:
         return go.Figure()
 
-    df_logs = load_result_df(result_df_path)
-    if df_logs.empty:
-        return go.Figure()
-
     interval_map = {0: "1s", 1: "1min", 2: "1h", 3: "1d"}
     freq = interval_map.get(interval, "1min")
     pattern = data["points"][0]["customdata"]
 
-    # Filter only timestamp column
-    df_pattern = df_logs.loc[df_logs["template"]==pattern, ["timestamp"]].dropna()
-    if df_pattern.empty:
+    # Counts per bucket were rolled up at parse time
+    ts_df = read_rollup(result_df_path, pattern, freq)
+    if ts_df.empty:
         return go.Figure()
 
-    # Ensure datetime
-    df_pattern["timestamp"] = pd.to_datetime(df_pattern["timestamp"])
-
-    # Group by interval
-    ts_df = (
-        df_pattern.groupby(pd.Grouper(key="timestamp", freq=freq))
-        .size()
-        .reset_index(name="count")
-    )
-
-    # downsampling if too many points - user can adjust freq to control points
+    # downsampling if too many points - LTTB keeps the spikes
     max_points = 5000
-    if len(ts_df) > max_points:
-        ts_df = ts_df.iloc[::len(ts_df)//max_points + 1]
+    ts_df = lttb(ts_df, max_points)
 
     title = f"Trend of Occurrence at Freq({freq})"
     return create_time_series(ts_df, "Linear", title)
\ No newline at end of file
@@ -25,7 +25,9 @@ def create_control_card():
                         outline=True,
                         n_clicks=0
                     ),
-                    dcc.Download(id="parser-download-report")
+                    dcc.Download(id="parser-download-report"),
+                    dcc.Interval(id="parser-report-interval", interval=1000, n_intervals=0, disabled=True),
+                    html.Small(id="parser-report-progress", className="text-muted ms-2"),
                 ], width=6
                 ),
             ]),
@@ -0,0 +1,8 @@
+# Read by gunicorn from the working directory (see docker-compose.yml).
+
+
+def post_worker_init(worker):
+    # The worker accepts requests as soon as this returns; faiss and the embedding
+    # service connection are warmed up in the background instead of on the first search.
+    from logai.embedding import warm_up_async
+    warm_up_async()
@@ -1,47 +1,29 @@
 import os
 import time
-import faiss
 import pandas as pd
 import numpy as np
-import pickle
 import json
 from pathlib import Path
 from filelock import FileLock
+from logai.pattern_result import load_templates
+from logai.project_status import read_status, remove_file_status, update_file_status
+from logai.embedding_service import embedding_encoder, service_client
+from logai.embedding_cache import shared_embedding_cache
+from logai.template_meta import TemplateMetaStore, file_id_range, vector_ids
+from logai.index_registry import index_registry
+from logai.utils.lazy import lazy_import
+from logai.utils.constants import FAISS_INDEX_QUEUE_SIZE, FAISS_INDEX_BATCH_TEMPLATES
+from logai.utils.constants import FAISS_INDEX_RETRY_SECONDS, FAISS_INDEX_MAX_ATTEMPTS
+from logai.vector_index import (
+    apply_search_params, build_index, create_index, flat_params, ids_and_vectors, index_has_ids, index_ids,
+    load_index_params, maybe_promote, remove_ids, save_index_params,
+)
 from typing import List, Dict, Any, Optional
 import threading
 import queue
 
-# ---------- Helpers ----------
-def status_file(project_dir: Path) -> Path:
-    return Path(project_dir / "status.json")
-
-def read_status(project_dir: Path) -> Dict[str, Any]:
-    sf = status_file(project_dir)
-    if not sf.exists():
-        return {}
-    try:
-        return json.loads(sf.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-def write_status_atomically(project_dir: Path, status_obj: Dict[str, Any]) -> None:
-    sf = status_file(project_dir)
-    tmp = sf.with_suffix(".json.tmp")
-    tmp.write_text(json.dumps(status_obj, indent=2), encoding="utf-8")
-    os.replace(str(tmp), str(sf))
-
-def update_file_status(project_dir: Path, filename: str, state: str, meta: Optional[Dict[str,Any]] = None):
-    """Update status.json for a single file with atomic write."""
-    status = read_status(project_dir)
-    status.setdefault(filename, {})
-    status[filename].update({
-        "state": state,
-        "timestamp": time.time()
-    })
-    if meta:
-        status[filename].update(meta)
-    write_status_atomically(project_dir, status)
-
+# faiss is imported on first use, see warm_up
+faiss = lazy_import("faiss")
 
 # ---------- Main Class ----------
 class VectorEmbedding:
@@ -50,29 +32,32 @@ class VectorEmbedding:
         self.embeddings = {}
         self.index = None
         self.template_ids = []
-        from gui.app_instance import EMBEDDING_MODEL
-        self.model = EMBEDDING_MODEL
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
-        print(f"Initialized SentenceTransformer")
+        # shared embedding service when running, else the model loaded in this process
+        self.model = embedding_encoder()
+        self.embedding_dim = self.model.dimension()
+        print(f"Initialized {type(self.model).__name__}")
     
-    def _load_result_df(self,file_path):
+    @staticmethod
+    def _load_result_df(file_path):
         if not os.path.exists(file_path):
             return pd.DataFrame()
-        return pd.read_parquet(file_path)
+        return load_templates(file_path)
 
     def _paths_for_project(self, project_dir):
         d = project_dir
         return {
             'index': os.path.join(d, 'faiss.index'),
-            'meta': os.path.join(d, 'meta.pkl'),
             'lock': os.path.join(d, 'faiss.lock')
         }
 
     def _load_index(self, path):
+        """The index at path and its parameters (see logai/vector_index.py)."""
+        params = load_index_params(path, self.embedding_dim)
         if os.path.exists(path):
             try:
                 idx = faiss.read_index(path)
-                return idx
+                apply_search_params(idx, params)
+                return idx, params
             except Exception as e:
                 # corrupted index -> remove and create new
                 print('Failed to read index, removing corrupted file:', e)
@@ -81,100 +66,399 @@ class VectorEmbedding:
                 except:
                     pass
         # create fresh
-        return faiss.IndexFlatIP(self.embedding_dim)
+        params = flat_params(self.embedding_dim)
+        return create_index(params), params
 
-    def _save_index_atomic(self, index, path):
+    def _save_index_atomic(self, index, path, params):
         tmp = path + '.tmp'
         faiss.write_index(index, tmp)
         os.replace(tmp, path)
+        save_index_params(path, params)
 
-    def _load_meta(self, path):
-        if os.path.exists(path):
-            with open(path, 'rb') as f:
-                return pickle.load(f)
-        return []
+    def _open_project(self, project_dir):
+        """Index, params and metadata store of project_dir; the caller holds the project lock."""
+        paths = self._paths_for_project(project_dir)
+        index, params = self._load_index(paths['index'])
+        meta_store = TemplateMetaStore(project_dir)
+        if not index_has_ids(index):
+            index = self._convert_to_ids(project_dir, index, params, meta_store)
+        return index, params, meta_store
 
-    def _save_meta(self, path, meta):
-        with open(path, 'wb') as f:
-            pickle.dump(meta, f)
+    def _convert_to_ids(self, project_dir, index, params, meta_store):
+        """Rebuild an index whose vectors are numbered by position with file/template ids."""
+        start_time = time.perf_counter()
+        table = meta_store.legacy_table()
+        count = min(index.ntotal, table.num_rows if table is not None else 0)
+        _, vectors = ids_and_vectors(index)
+        rows = table.slice(0, count).to_pandas() if count else pd.DataFrame(columns=['template', 'frequency', 'filename'])
+        ids = np.empty(count, dtype='int64')
+        for filename, positions in rows.groupby('filename', sort=False).indices.items():
+            ids[positions] = vector_ids(meta_store.file_id(filename), rows['template'].values[positions])
+        # a file added twice: keep its latest vectors
+        _, last = np.unique(ids[::-1], return_index=True)
+        keep = np.sort(count - 1 - last)
+        index = build_index(params, vectors[:count][keep], ids[keep])
+        if len(keep):
+            meta_store.append({
+                'id': ids[keep],
+                'template': rows['template'].values[keep],
+                'frequency': rows['frequency'].values[keep],
+                'filename': rows['filename'].values[keep],
+            })
+        self._save_index_atomic(index, self._paths_for_project(project_dir)['index'], params)
+        meta_store.drop_legacy()
+        print(f"Converted {project_dir} index to vector ids: {len(keep)} of {count} vectors kept, "
+              f"{time.perf_counter() - start_time:.3f} seconds")
+        return index
 
-    def add_templates(self, project_dir, result_df_path, filename):
-        #print("add template ", project_dir)
-        paths = self._paths_for_project(project_dir)
-        #lock = FileLock(paths['lock'])
-        df = self._load_result_df(result_df_path)
+    @staticmethod
+    def _distinct_templates(df):
         if 'template' not in df.columns:
             raise ValueError('Parquet must contain "template" column')
-        
-        dff = df['template'].value_counts().reset_index()
-        dff.columns = ['template', 'count']
-        templates = dff['template'].unique().astype(str).tolist()
-        embeddings = self.model.encode(templates, convert_to_numpy=True, normalize_embeddings=True)
-        embeddings = np.array(embeddings, dtype='float32')
-        #print("acquire lock")
-        #with lock:
-        index = self._load_index(paths['index'])
-        meta = self._load_meta(paths['meta'])
-        #print("add embedding")
-        # add embeddings
-        index.add(embeddings)
-        # extend metadata
-        for _, row in dff.iterrows():
-            m = {
-                'template': str(row['template']),
-                'frequency': int(row['count']),
-                'filename': filename,
+        dff = df[['template', 'count']].sort_values('count', ascending=False, ignore_index=True)
+        # one vector and one metadata row per distinct template
+        return dff.drop_duplicates('template', ignore_index=True)
+
+    def add_templates(self, project_dir, result_df_path, filename):
+        df = self._load_result_df(result_df_path)
+        added = self.add_template_batch(project_dir, [(filename, df)])
+        return dict(added[filename], cache=added['cache'])
+
+    def add_template_batch(self, project_dir, files):
+        """
+        Add the templates of several parsed files of one project: one encode call for
+        all of them and one index save. files is a list of (filename, templates df).
+        Returns per filename {'status', 'added', 'cache_hits', 'cache_hit_rate'} and
+        the embedding cache stats under 'cache'.
+        """
+        paths = self._paths_for_project(project_dir)
+        frames = []
+        for filename, df in files:
+            dff = self._distinct_templates(df)
+            dff['filename'] = filename
+            frames.append(dff)
+        batch = pd.concat(frames, ignore_index=True)
+        templates = batch['template'].astype(str).tolist()
+        # only templates never seen in any project are encoded
+        cache = shared_embedding_cache(self.embedding_dim)
+        embeddings, hit = cache.encode(self.model, templates)
+
+        # load, add and save under the lock, so adds from other processes are not lost
+        with FileLock(paths['lock']):
+            index, params, meta_store = self._open_project(project_dir)
+            ids = np.empty(len(batch), dtype='int64')
+            current = index_ids(index)
+            previous = np.zeros(len(current), dtype=bool)
+            replaced = {}
+            for filename, _ in files:
+                first, last = file_id_range(meta_store.file_id(filename))
+                in_file = (current >= first) & (current <= last)
+                replaced[filename] = int(in_file.sum())
+                previous |= in_file
+            for filename, rows in batch.groupby('filename', sort=False).indices.items():
+                ids[rows] = vector_ids(meta_store.file_id(filename), batch['template'].values[rows])
+            # re-indexing a file replaces its vectors
+            index, _ = remove_ids(index, params, current[previous])
+            _, unique = np.unique(ids, return_index=True)
+            keep = np.sort(unique)
+            # metadata rows of the new vector ids, written before the index referencing them
+            meta_store.append({
+                'id': ids[keep],
+                'template': batch['template'].astype(str).values[keep],
+                'frequency': batch['count'].astype('int64').values[keep],
+                'filename': batch['filename'].values[keep],
+            })
+            # add embeddings, rebuilding the index as an ANN index once it is large
+            index.add_with_ids(embeddings[keep], ids[keep])
+            index, params = maybe_promote(index, params)
+            self._save_index_atomic(index, paths['index'], params)
+            meta_store.compact(index_ids(index))
+            # searches in this process use the new index right away
+            index_registry.publish(project_dir, paths['index'], (index, params, meta_store))
+
+        results = {'cache': cache.stats()}
+        for filename, rows in batch.groupby('filename', sort=False).indices.items():
+            # templates normalising to the same text share one vector id
+            rows = rows[np.isin(rows, keep)]
+            hits = int(hit[rows].sum())
+            print('added: {0} for filename {1} ({2} from embedding cache, {3} replaced)'.format(
+                len(rows), filename, hits, replaced[filename]))
+            results[filename] = {
+                'status': 'ok',
+                'added': len(rows),
+                'replaced': replaced[filename],
+                'cache_hits': hits,
+                'cache_hit_rate': hits / len(rows) if len(rows) else 0.0,
             }
-            meta.append(m)
-        self._save_index_atomic(index, paths['index'])
-        self._save_meta(paths['meta'], meta)
-        print('added: {0} for filename {1}'.format(len(templates), filename))
-        return {'status':'ok', 'added': len(templates)}
+        for filename, _ in files:
+            # files without templates
+            results.setdefault(filename, {'status': 'ok', 'added': 0, 'replaced': replaced[filename],
+                                          'cache_hits': 0, 'cache_hit_rate': 0.0})
+        return results
+
+    def remove_file(self, project_dir, filename):
+        """Remove the vectors of filename from the project index. Returns how many were removed."""
+        paths = self._paths_for_project(project_dir)
+        if not os.path.exists(paths['index']):
+            return 0
+        with FileLock(paths['lock']):
+            index, params, meta_store = self._open_project(project_dir)
+            file_id = meta_store.file_id(filename, create=False)
+            if file_id is None:
+                return 0
+            first, last = file_id_range(file_id)
+            current = index_ids(index)
+            index, removed = remove_ids(index, params, current[(current >= first) & (current <= last)])
+            if removed:
+                self._save_index_atomic(index, paths['index'], params)
+                meta_store.compact(index_ids(index))
+                index_registry.publish(project_dir, paths['index'], (index, params, meta_store))
+        print(f"removed: {removed} vectors of filename {filename}")
+        return removed
+
+    def _load_project(self, project_dir):
+        paths = self._paths_for_project(project_dir)
+        # the lock keeps the index and its params file from the same save
+        with FileLock(paths['lock']):
+            return self._open_project(project_dir)
 
     def search(self, project_dir, text, top_k=5):
         paths = self._paths_for_project(project_dir)
-        lock = FileLock(paths['lock'])
-        qemb = self.model.encode([text], convert_to_numpy=True, normalize_embeddings=True).astype('float32')
-        # no need to lock for read index, but ensure safe read
-        with lock:
-            index = self._load_index(paths['index'])
-            meta = self._load_meta(paths['meta'])
-            if index.ntotal == 0:
-                return []
-            k = min(top_k, index.ntotal)
-            D, I = index.search(qemb, k)
-            #print("vectors ", I[0])
+        qemb = self.model.encode([text])
+        # loaded once per process, reloaded only after an add replaced the index
+        loaded = index_registry.get(project_dir, paths['index'], lambda: self._load_project(project_dir))
+        if loaded is None:
+            return []
+        index, _, meta_store = loaded
+        if index.ntotal == 0:
+            return []
+        k = min(top_k, index.ntotal)
+        D, I = index.search(qemb, k)
+        #print("vectors ", I[0])
+        # only the k result rows are read from the metadata store
+        meta = meta_store.take(I[0])
         results = []
-        for dist, idx in zip(D[0], I[0]):
-            if idx < len(meta):
-                m = meta[int(idx)].copy()
+        for dist, m in zip(D[0], meta):
+            if m is not None:
                 m['similarity'] = float(dist)
                 results.append(m)
         results = sorted(results, key=lambda x: x['similarity'], reverse=True)
         return results
 
+# ---------- Warm-up ----------
+def warm_up(load_local=False):
+    """
+    Pay the first-use costs before a request does: import faiss and run one encode
+    through the embedding service. Without a running service the model is only loaded
+    into this process when load_local is set and local fallback is allowed.
+    """
+    start_time = time.perf_counter()
+    faiss.IndexFlatIP
+    encoder = service_client()
+    if encoder is None and load_local:
+        encoder = embedding_encoder()
+    if encoder is not None:
+        encoder.encode(["warm up"])
+    print(f"Embedding warm-up ({type(encoder).__name__ if encoder else 'faiss only'}): "
+          f"{time.perf_counter() - start_time:.3f} seconds")
+
+def warm_up_async(load_local=False) -> threading.Thread:
+    """warm_up on a daemon thread, so a starting server can already answer requests."""
+    def run():
+        try:
+            warm_up(load_local)
+        except Exception as e:
+            print(f"Embedding warm-up failed: {e}")
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
 # ---------- Scheduler ----------
 class FaissScheduler:
-    def __init__(self):
-        self.queue = queue.Queue()
-        self.thread = threading.Thread(target=self._worker, daemon=True)
-        self.thread.start()
-        self.embedding_model = VectorEmbedding()
+    """
+    Background indexer of parsed files. enqueue_file hands a parsed result to a worker
+    thread, which takes queued files until FAISS_INDEX_BATCH_TEMPLATES templates are
+    loaded, leaving the rest queued, encodes the files of each project at once and
+    saves its index once per batch. remove_file queues the removal of a file's vectors behind the
+    adds queued before it. The queue holds at most FAISS_INDEX_QUEUE_SIZE files; files
+    that do not fit keep their state and are offered again on the next status poll.
+    A failed batch or removal only affects its own files: they go back to "parsed" or
+    "removing" with a retry_at time, and an add failing FAISS_INDEX_MAX_ATTEMPTS times
+    is marked "error".
+    """
+    def __init__(self, max_queued: int = FAISS_INDEX_QUEUE_SIZE,
+                 batch_templates: int = FAISS_INDEX_BATCH_TEMPLATES):
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.batch_templates = batch_templates
+        self._pending = set()   # (project_dir, filename) queued or being indexed
+        self._carry = None      # job taken from the queue that did not fit the last batch
+        self._lock = threading.Lock()
+        self.thread = None
+        # the model is loaded by the worker, not when the scheduler is created
+        self.embedding_model = None
+
+    def _start(self):
+        with self._lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._worker, daemon=True)
+                self.thread.start()
+
+    def enqueue_file(self, project_dir, file_path, filename) -> bool:
+        """
+        Queue the parsed result file_path of filename for indexing. False when the
+        queue is full; True when it is queued or already waiting.
+        """
+        return self._enqueue(project_dir, file_path, filename, "indexing")
+
+    def remove_file(self, project_dir, filename) -> bool:
+        """Queue the removal of the vectors of filename, like enqueue_file."""
+        return self._enqueue(project_dir, None, filename, "removing")
+
+    def _enqueue(self, project_dir, file_path, filename, state):
+        key = (str(project_dir), filename)
+        with self._lock:
+            if key in self._pending:
+                return True
+            try:
+                self.queue.put_nowait((project_dir, file_path, filename))
+            except queue.Full:
+                return False
+            self._pending.add(key)
+        update_file_status(project_dir, filename, state, {"queue_depth": self.queue.qsize(), "retry_at": None})
+        self._start()
+        return True
+
+    def is_pending(self, project_dir, filename) -> bool:
+        with self._lock:
+            return (str(project_dir), filename) in self._pending
 
-    def enqueue_file(self, project_dir, file_path):
-        self.queue.put((project_dir, file_path))
+    def _next_batch(self):
+        """
+        Queued jobs up to batch_templates templates, waiting for the first one. Files
+        are loaded as they are taken; the one that does not fit is kept for the next
+        batch and the files behind it stay queued. Jobs are (project_dir, filename, df),
+        with df None for removals.
+        """
+        jobs, templates = [], 0
+        while True:
+            if self._carry is not None:
+                job, self._carry = self._carry, None
+            else:
+                try:
+                    project_dir, file_path, filename = self.queue.get(block=not jobs)
+                except queue.Empty:
+                    break
+                try:
+                    job = self._load_job(project_dir, file_path, filename)
+                except Exception as e:
+                    update_file_status(project_dir, filename, "error", {"message": str(e)})
+                    self._release(project_dir, filename)
+                    continue
+            job_templates = 0 if job[2] is None else len(job[2])
+            if jobs and templates + job_templates > self.batch_templates:
+                self._carry = job
+                break
+            jobs.append(job)
+            templates += job_templates
+        return jobs
+
+    @staticmethod
+    def _load_job(project_dir, file_path, filename):
+        if file_path is None:
+            return project_dir, filename, None
+        df = VectorEmbedding._distinct_templates(VectorEmbedding._load_result_df(file_path))
+        return project_dir, filename, df
+
+    def _release(self, project_dir, filename):
+        with self._lock:
+            self._pending.discard((str(project_dir), filename))
+        self.queue.task_done()
 
     def _worker(self):
         while True:
-            project_dir, file_path = self.queue.get()
+            jobs = self._next_batch()
             try:
-                # read parquet, generate embeddings, add to FAISS
-                df = pd.read_parquet(file_path)
-                self.embedding_model.add_to_faiss(df)
-                update_file_status(project_dir, Path(file_path).stem, "indexed")
+                if self.embedding_model is None:
+                    self.embedding_model = VectorEmbedding()
             except Exception as e:
-                update_file_status(project_dir, Path(file_path).stem, "error", {"message": str(e)})
+                # e.g. the embedding service is not up yet: nothing was tried, offer all later
+                print(f"FAISS indexing postponed: {e}")
+                for project_dir, filename, df in jobs:
+                    self._retry(project_dir, filename, "removing" if df is None else "parsed", e, attempt=False)
+            else:
+                by_project = {}
+                for job in jobs:
+                    by_project.setdefault(str(job[0]), []).append(job)
+                for project_jobs in by_project.values():
+                    try:
+                        self._index_project(project_jobs)
+                    except Exception as e:
+                        # files left "indexing" are queued again once stale
+                        print(f"FAISS indexing of {project_jobs[0][0]} failed: {e}")
             finally:
-                self.queue.task_done()
+                for project_dir, filename, _ in jobs:
+                    self._release(project_dir, filename)
+
+    def _index_project(self, jobs):
+        project_dir = jobs[0][0]
+        batch = []
+        for _, filename, df in jobs:
+            if df is None:
+                # adds queued before the removal go first
+                if batch:
+                    self._index_batch(project_dir, batch)
+                    batch = []
+                try:
+                    self.embedding_model.remove_file(project_dir, filename)
+                except Exception as e:
+                    print(f"FAISS removal of {filename} failed: {e}")
+                    self._retry(project_dir, filename, "removing", e)
+                    continue
+                remove_file_status(project_dir, filename)
+                continue
+            batch.append((filename, df))
+        if batch:
+            self._index_batch(project_dir, batch)
+
+    def _index_batch(self, project_dir, batch):
+        start_time = time.perf_counter()
+        try:
+            added = self.embedding_model.add_template_batch(project_dir, batch)
+        except Exception as e:
+            print(f"FAISS indexing of {len(batch)} files failed: {e}")
+            for filename, _ in batch:
+                self._retry(project_dir, filename, "parsed", e)
+            return
+        seconds = time.perf_counter() - start_time
+        templates = sum(added[filename]['added'] for filename, _ in batch)
+        throughput = round(templates / seconds, 1) if seconds > 0 else 0.0
+        print(f"Indexed {len(batch)} files, {templates} templates in {seconds:.3f} seconds "
+              f"({throughput} templates/s, {self.queue.qsize()} files queued)")
+        for filename, _ in batch:
+            update_file_status(project_dir, filename, "indexed", {
+                "indexed_at": time.time(),
+                "templates": added[filename]["added"],
+                "replaced": added[filename]["replaced"],
+                "embedding_cache_hits": added[filename]["cache_hits"],
+                "embedding_cache_hit_rate": round(added[filename]["cache_hit_rate"], 4),
+                "batch_files": len(batch),
+                "throughput": throughput,
+                "queue_depth": self.queue.qsize(),
+                "attempts": 0,
+                "message": None,
+            })
+
+    def _retry(self, project_dir, filename, state, error, attempt=True):
+        """Put filename back in state, to be offered again after FAISS_INDEX_RETRY_SECONDS."""
+        attempts = read_status(project_dir).get(filename, {}).get("attempts", 0) + int(attempt)
+        if state == "parsed" and attempts >= FAISS_INDEX_MAX_ATTEMPTS:
+            update_file_status(project_dir, filename, "error", {"message": str(error), "attempts": attempts})
+            return
+        update_file_status(project_dir, filename, state, {
+            "message": str(error),
+            "attempts": attempts,
+            "retry_at": time.time() + FAISS_INDEX_RETRY_SECONDS,
+        })
 
-#faiss_scheduler = FaissScheduler()
\ No newline at end of file
+# one background indexer per process (gunicorn worker), started on first enqueue
+faiss_scheduler = FaissScheduler()
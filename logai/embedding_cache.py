@@ -0,0 +1,162 @@
+import os
+import re
+import hashlib
+import threading
+
+import numpy as np
+from filelock import FileLock
+
+from logai.utils.constants import EMBEDDING_CACHE_DIR
+
+"""
+Content-addressed cache of template embeddings, shared by all projects and processes.
+
+    keys.npy     uint8 (n, 20): sha1 of every normalised template, in row order
+    vectors.npy  float32 (capacity, dimension), memory mapped; rows past n are unused
+
+New vectors are written into free rows of vectors.npy (or a grown copy of it) before
+keys.npy is replaced, so readers never see a key without its vector. Writers serialise on
+cache.lock; readers reload when keys.npy changes.
+"""
+
+_DIGEST = 20
+_MIN_CAPACITY = 1024
+
+
+def normalize_template(template) -> str:
+    return re.sub(r"\s+", " ", str(template)).strip()
+
+
+def template_digest(normalized) -> bytes:
+    return hashlib.sha1(normalized.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, dimension, directory=EMBEDDING_CACHE_DIR):
+        self.dimension = dimension
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, "keys.npy")
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.file_lock = FileLock(os.path.join(directory, "cache.lock"))
+        self.lock = threading.Lock()
+        self._version = None
+        self._rows = {}
+        self._vectors = None
+        self.hits = 0
+        self.misses = 0
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.keys_path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+        if version == self._version:
+            return
+        if version is None:
+            self._rows, self._vectors = {}, None
+        else:
+            keys = np.load(self.keys_path)
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding cache {self.directory} holds {vectors.shape[1]}-d vectors, "
+                                 f"model gives {self.dimension}-d")
+            self._rows = {keys[i].tobytes(): i for i in range(len(keys))}
+            self._vectors = vectors
+        self._version = version
+
+    def encode(self, encoder, templates):
+        """
+        float32 (len(templates), dimension) embeddings of templates. Only templates never
+        seen before are passed to encoder.encode. Returns (vectors, hit), hit marking the
+        templates served from the cache.
+        """
+        normalized = [normalize_template(t) for t in templates]
+        digests = [template_digest(n) for n in normalized]
+        out = np.empty((len(templates), self.dimension), dtype="float32")
+        with self.lock:
+            self._refresh()
+            rows = self._rows
+            found = [i for i, d in enumerate(digests) if d in rows]
+            if found:
+                out[found] = self._vectors[[rows[digests[i]] for i in found]]
+            missing = [i for i, d in enumerate(digests) if d not in rows]
+
+        if missing:
+            unique = {}
+            for i in missing:
+                unique.setdefault(digests[i], normalized[i])
+            vectors = np.asarray(encoder.encode(list(unique.values())), dtype="float32")
+            position = {digest: k for k, digest in enumerate(unique)}
+            out[missing] = vectors[[position[digests[i]] for i in missing]]
+            self._append(list(unique), vectors)
+
+        hit = np.ones(len(templates), dtype=bool)
+        hit[missing] = False
+        with self.lock:
+            self.hits += len(templates) - len(missing)
+            self.misses += len(missing)
+        return out, hit
+
+    def _append(self, digests, vectors):
+        with self.file_lock, self.lock:
+            self._refresh()
+            new = [k for k, digest in enumerate(digests) if digest not in self._rows]
+            if not new:
+                return
+            count = len(self._rows)
+            needed = count + len(new)
+            capacity = self._vectors.shape[0] if self._vectors is not None else 0
+            if needed > capacity:
+                # grow into a copy so readers keep a consistent mapping of the old file
+                tmp = self.vectors_path + ".tmp.npy"
+                grown = np.lib.format.open_memmap(
+                    tmp, mode="w+", dtype="float32",
+                    shape=(max(needed, 2 * capacity, _MIN_CAPACITY), self.dimension),
+                )
+                if count:
+                    grown[:count] = self._vectors[:count]
+                grown[count:needed] = vectors[new]
+                grown.flush()
+                del grown
+                os.replace(tmp, self.vectors_path)
+            else:
+                stored = np.lib.format.open_memmap(self.vectors_path, mode="r+")
+                stored[count:needed] = vectors[new]
+                stored.flush()
+                del stored
+
+            keys = np.zeros((needed, _DIGEST), dtype=np.uint8)
+            for digest, row in self._rows.items():
+                keys[row] = np.frombuffer(digest, dtype=np.uint8)
+            for k, i in enumerate(new):
+                keys[count + k] = np.frombuffer(digests[i], dtype=np.uint8)
+            tmp = self.keys_path + ".tmp.npy"
+            np.save(tmp, keys)
+            os.replace(tmp, self.keys_path)
+            self._version = None
+            self._refresh()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_embedding_cache(dimension) -> EmbeddingCache:
+    """The process-wide EmbeddingCache."""
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared.dimension != dimension:
+            _shared = EmbeddingCache(dimension)
+        return _shared
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import threading
+import socketserver
+
+import numpy as np
+
+from logai.utils.constants import (
+    BASE_DIR,
+    SENTENCE_TRANSFORMER_MODE_NAME,
+    EMBEDDING_SERVICE_SOCKET,
+    EMBEDDING_MAX_BATCH,
+    EMBEDDING_BATCH_LATENCY_MS,
+    EMBEDDING_SERVICE_TIMEOUT,
+    EMBEDDING_SERVICE_CONNECT_TIMEOUT,
+    EMBEDDING_LOCAL_FALLBACK,
+)
+
+"""
+One process holding the SentenceTransformer model for all gunicorn workers.
+
+Workers talk to it over a Unix socket. Every message is a 4-byte big-endian header length,
+a JSON header and, for encode responses, the float32 vectors as raw bytes. Concurrent
+requests are collected for up to EMBEDDING_BATCH_LATENCY_MS (or until EMBEDDING_MAX_BATCH
+texts are waiting), identical texts are encoded once, and the model runs one batch.
+
+Run it with:
+    python -m logai.embedding_service
+"""
+
+_HEADER = struct.Struct("!I")
+
+
+def model_path():
+    return os.path.join(BASE_DIR, SENTENCE_TRANSFORMER_MODE_NAME)
+
+
+def load_model():
+    """Load the SentenceTransformer model, downloading it on first use."""
+    from sentence_transformers import SentenceTransformer
+
+    path = model_path()
+    if not os.path.exists(path):
+        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        model.save(path)
+    model = SentenceTransformer(path)
+    print(f"Loaded SentenceTransformer model from {path}")
+    return model
+
+
+def _encode(model, texts):
+    vectors = model.encode(
+        texts, batch_size=EMBEDDING_MAX_BATCH, convert_to_numpy=True, normalize_embeddings=True
+    )
+    return np.asarray(vectors, dtype="float32")
+
+
+# ---------------------
+# Service
+# ---------------------
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingBatcher:
+    """Coalesces encode requests from many threads into model batches."""
+    def __init__(self, model, max_batch=EMBEDDING_MAX_BATCH, latency_ms=EMBEDDING_BATCH_LATENCY_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.latency = latency_ms / 1000.0
+        self.dimension = model.get_sentence_embedding_dimension()
+        self.queue = queue.Queue()
+        self.stats = {"requests": 0, "texts": 0, "encoded": 0, "batches": 0, "encode_seconds": 0.0}
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def encode(self, texts):
+        request = _Request(list(texts))
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _worker(self):
+        while True:
+            batch = [self.queue.get()]
+            waiting = len(batch[0].texts)
+            deadline = time.monotonic() + self.latency
+            while waiting < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                waiting += len(request.texts)
+            self._run(batch)
+
+    def _run(self, batch):
+        texts = list(dict.fromkeys(text for request in batch for text in request.texts))
+        try:
+            start_time = time.perf_counter()
+            vectors = _encode(self.model, texts) if texts else np.zeros((0, self.dimension), dtype="float32")
+            rows = {text: i for i, text in enumerate(texts)}
+            for request in batch:
+                request.result = vectors[[rows[text] for text in request.texts]]
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += sum(len(request.texts) for request in batch)
+            self.stats["encoded"] += len(texts)
+            self.stats["batches"] += 1
+            self.stats["encode_seconds"] += time.perf_counter() - start_time
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher = self.server.batcher
+        try:
+            header, _ = _recv_message(self.request)
+            op = header.get("op")
+            if op == "encode":
+                vectors = batcher.encode(header.get("texts", []))
+                _send_message(self.request, {"ok": True, "shape": list(vectors.shape)}, vectors.tobytes())
+            elif op == "info":
+                _send_message(self.request, {"ok": True, "dimension": batcher.dimension, "stats": batcher.stats})
+            else:
+                _send_message(self.request, {"ok": False, "error": f"unknown op {op!r}"})
+        except Exception as e:
+            try:
+                _send_message(self.request, {"ok": False, "error": str(e)})
+            except OSError:
+                pass
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, socket_path, batcher):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.batcher = batcher
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+
+def serve(socket_path=EMBEDDING_SERVICE_SOCKET):
+    batcher = EmbeddingBatcher(load_model())
+    with EmbeddingServer(socket_path, batcher) as server:
+        print(f"Embedding service listening on {socket_path} "
+              f"(max batch {batcher.max_batch}, latency {batcher.latency * 1000:.0f} ms)")
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+# ---------------------
+# Clients
+# ---------------------
+class EmbeddingClient:
+    """Encodes through the embedding service; same encode/dimension API as LocalEmbedder."""
+    def __init__(self, socket_path=EMBEDDING_SERVICE_SOCKET, timeout=EMBEDDING_SERVICE_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._dimension = None
+
+    def _call(self, header):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    sock.connect(self.socket_path)
+                    break
+                except BlockingIOError:
+                    # listen backlog full, the service is busy
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.01)
+            _send_message(sock, header)
+            response, payload = _recv_message(sock)
+        if not response.get("ok"):
+            raise RuntimeError(f"Embedding service error: {response.get('error')}")
+        return response, payload
+
+    def info(self):
+        response, _ = self._call({"op": "info"})
+        return response
+
+    def dimension(self):
+        if self._dimension is None:
+            self._dimension = int(self.info()["dimension"])
+        return self._dimension
+
+    def encode(self, texts):
+        """float32 (len(texts), dimension) array of normalised embeddings."""
+        texts = [str(text) for text in texts]
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype="float32")
+        response, payload = self._call({"op": "encode", "texts": texts})
+        return np.frombuffer(payload, dtype="float32").reshape(response["shape"])
+
+
+class LocalEmbedder:
+    """The model loaded in this process, for running without the service."""
+    def __init__(self, model=None):
+        self.model = model if model is not None else load_model()
+
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        texts = [str(text) for text in texts]
+        return _encode(self.model, texts)
+
+
+_local_embedder = None
+_local_lock = threading.Lock()
+_local_fallback = EMBEDDING_LOCAL_FALLBACK
+
+
+def allow_local_fallback(allow=True):
+    """Let embedding_encoder load the model in this process when the service is down."""
+    global _local_fallback
+    _local_fallback = allow
+
+
+def service_client():
+    """EmbeddingClient if the service answers, else None."""
+    client = EmbeddingClient()
+    if os.path.exists(client.socket_path):
+        try:
+            client.dimension()
+            return client
+        except OSError as e:
+            print(f"Embedding service not reachable at {client.socket_path}: {e}")
+    return None
+
+
+def connect_service(timeout=EMBEDDING_SERVICE_CONNECT_TIMEOUT):
+    """
+    EmbeddingClient of the service, retrying for up to timeout seconds while it starts.
+    Raises ConnectionError when it does not answer in time.
+    """
+    client = EmbeddingClient()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client.dimension()
+            return client
+        except OSError as e:
+            if time.monotonic() >= deadline:
+                raise ConnectionError(
+                    f"Embedding service not reachable at {client.socket_path} after {timeout:.0f} seconds: {e}"
+                ) from e
+        time.sleep(0.5)
+
+
+def embedding_encoder():
+    """
+    EmbeddingClient of the service (see connect_service). Only when local fallback is
+    allowed (EMBEDDING_LOCAL_FALLBACK=1 or allow_local_fallback(), as the development
+    server does) is an unreachable service replaced by a LocalEmbedder shared by the
+    process.
+    """
+    global _local_embedder
+    if not _local_fallback:
+        return connect_service()
+    client = service_client()
+    if client is not None:
+        return client
+    with _local_lock:
+        if _local_embedder is None:
+            print("Embedding service not running, local fallback: loading the model in this process")
+            _local_embedder = LocalEmbedder()
+        return _local_embedder
+
+
+# ---------------------
+# Wire format
+# ---------------------
+def _send_message(sock, header, payload=b""):
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding service connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_message(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, length).decode("utf-8"))
+    payload = b""
+    if "shape" in header:
+        rows, cols = header["shape"]
+        payload = _recv_exact(sock, rows * cols * 4)
+    return header, payload
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from logai.utils.constants import FAISS_REGISTRY_MAX_BYTES
+
+# ---------------------
+# Process-wide registry of loaded project indexes
+# ---------------------
+"""
+Keeps each project's FAISS index and metadata store loaded between searches. An entry
+is tagged with the generation of the index on disk (inode, mtime and size of faiss.index
+and of its params file); it is reloaded only when a writer replaced either of them.
+Memory is bounded by the size of the serialised indexes; least recently used projects
+are evicted first, the project just used is always kept.
+
+Loaded indexes are shared between callers and must only be searched, never added to.
+"""
+class IndexRegistry:
+    def __init__(self, max_bytes: int = FAISS_REGISTRY_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()   # project dir -> (generation, (index, params, meta), nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def generation(index_path):
+        """On-disk generation of the index at index_path, None when there is none."""
+        try:
+            st = os.stat(index_path)
+        except OSError:
+            return None
+        try:
+            pst = os.stat(str(index_path) + ".params.json")
+            params = (pst.st_ino, pst.st_mtime_ns)
+        except OSError:
+            params = None
+        return (st.st_ino, st.st_mtime_ns, st.st_size, params)
+
+    def get(self, project_dir, index_path, loader: Callable[[], Any]):
+        """
+        loader()'s (index, params, meta) of project_dir, from the registry while the
+        index on disk is unchanged. None when the project has no index yet.
+        """
+        key = os.path.abspath(str(project_dir))
+        generation = self.generation(index_path)
+        if generation is None:
+            self.invalidate(key)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.reloads += 1
+
+        # read outside the lock so searches of other projects go on
+        loaded = loader()
+        self._put(key, generation, loaded, os.path.getsize(index_path))
+        return loaded
+
+    def publish(self, project_dir, index_path, loaded):
+        """Register an index this process just saved to index_path, sparing the reload."""
+        key = os.path.abspath(str(project_dir))
+        generation = self.generation(index_path)
+        if generation is not None:
+            self._put(key, generation, loaded, os.path.getsize(index_path))
+
+    def _put(self, key, generation, loaded, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (generation, loaded, nbytes)
+            self._bytes += nbytes
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def invalidate(self, project_dir=None):
+        """Drop every entry, or only the entry of project_dir."""
+        with self._lock:
+            if project_dir is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            key = os.path.abspath(str(project_dir))
+            if key in self._entries:
+                self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.reloads
+            return {
+                "hits": self.hits,
+                "reloads": self.reloads,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+# one registry per process (gunicorn worker)
+index_registry = IndexRegistry()
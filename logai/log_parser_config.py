@@ -1,22 +1,27 @@
 import re
 import os
 import json
+import time
+import hashlib
+import threading
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 from dataclasses import dataclass, field
 from typing import List
 
-from reportlab.lib import colors
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table as PlatypusTable, TableStyle, Preformatted
-)
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-
 from sqlalchemy import Table
+from logai.parser_report import ReportBuilder, sort_results
+from logai.rule_matcher import MultiPatternMatcher
+from logai.template_rules import match_rules_on_templates, template_decidable, template_mode_available
 from logai.utils.constants import (
     PARSER_CONFIG_PATH,
+    PARSER_CONFIG_MAX_MATCHES,
+    PARSER_CONFIG_SAMPLE_LOGS,
+    PARSER_CONFIG_WORKERS,
+    PARSER_CONFIG_RANGE_BYTES,
+    REPORT_BATCH_ROWS,
 )
 
 @dataclass
@@ -41,10 +46,64 @@ class IssueCategory:
     name: str
     Issues: List[Issue] = field(default_factory=list)
 
+def config_version():
+    """Version of rule_parser_config.json on disk: (mtime_ns, size), None if missing."""
+    try:
+        stat = os.stat(PARSER_CONFIG_PATH)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CompiledRules:
+    """
+    Process-wide compiled view of rule_parser_config.json, shared by every
+    LogParserConfig of a gunicorn worker. Compiled regexes and matchers are cached by
+    pattern text, so rebuilding the lookup after an edit only compiles what changed.
+    Workers notice edits made by other workers through config_version().
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.lookup = None
+        self.patterns = {}   # regex text -> compiled regex
+        self.matchers = {}   # (file name, regex texts) -> MultiPatternMatcher
+        self.compiled = 0
+
+    def compile(self, pattern):
+        regex = self.patterns.get(pattern)
+        if regex is None:
+            regex = re.compile(pattern)
+            self.patterns[pattern] = regex
+            self.compiled += 1
+        return regex
+
+    def matcher(self, filename, patterns):
+        key = (filename, tuple(p.pattern for p in patterns))
+        matcher = self.matchers.get(key)
+        if matcher is None:
+            matcher = MultiPatternMatcher(patterns)
+            print(f"Rule matcher for {filename}: {matcher.prefiltered}/{len(patterns)} patterns prefiltered.")
+            self.matchers[key] = matcher
+        return matcher
+
+    def update(self, lookup, version):
+        """Install a rebuilt lookup and drop regexes and matchers it no longer uses."""
+        used = {rule["Pattern"] for rules in lookup.values() for rule in rules}
+        self.patterns = {p: r for p, r in self.patterns.items() if p in used}
+        current = {(f, tuple(rule["Pattern"] for rule in rules)) for f, rules in lookup.items()}
+        self.matchers = {k: m for k, m in self.matchers.items() if k in current}
+        self.lookup = lookup
+        self.version = version
+
+compiled_rules = CompiledRules()
+
+
 class LogParserConfig:
     def __init__(self):
         self.config = self.load_config()
         self.lookup_cache = None
+        self.file_timings = {}
         self.parser_results_path = None
 
     # --------------------- Config Functions ---------------------
@@ -82,10 +141,17 @@ class LogParserConfig:
             print(f"⚠️ Error saving config: {e}")
             return
 
-        with open(PARSER_CONFIG_PATH, "w") as f:
+        tmp = PARSER_CONFIG_PATH + ".tmp"
+        with open(tmp, "w") as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp, PARSER_CONFIG_PATH)
         self.config = data
 
+        # recompile only the changed rules; other workers pick the edit up by mtime
+        with compiled_rules.lock:
+            self.lookup_cache = self.build_lookup()
+            compiled_rules.update(self.lookup_cache, config_version())
+
     def delete_config_entry(self, category=None, issue_title=None, delete_category=False):
         """Delete an issue or entire category from config."""
 
@@ -109,11 +175,12 @@ class LogParserConfig:
 
     # --------------------- Build Regex Cache ---------------------
     def build_lookup(self):
-        """Builds and caches regex lookup table for all patterns in config"""
+        """Builds regex lookup table for all patterns in config, compiling through compiled_rules"""
         lookup = {}
         if not self.config:
             return lookup
         config = self._load_config()
+        compiled_before = compiled_rules.compiled
         pattern_map = {}
         for category in config:
             for issue in category.Issues:
@@ -127,19 +194,33 @@ class LogParserConfig:
                             "RegexType": regex_obj.type,
                             "Description": regex_obj.description,
                             "Pattern": regex_obj.pattern,
-                            "RegexCompiled": re.compile(regex_obj.pattern),
+                            "RegexCompiled": compiled_rules.compile(regex_obj.pattern),
                         }
                         pattern_map.setdefault(fname, []).append(entry)
-        print(f"Regex lookup cache built: {sum(len(v) for v in pattern_map.values())} patterns.")
+        print(f"Regex lookup cache built: {sum(len(v) for v in pattern_map.values())} patterns, "
+              f"{compiled_rules.compiled - compiled_before} compiled.")
         return pattern_map
 
-    def analyse_logs(self, project_dir, files):
-        if not self.lookup_cache:
-            self.lookup_cache = self.build_lookup()
-        return self._parse_logs(project_dir, files)
-    
+    def current_lookup(self):
+        """Shared lookup of the config on disk, rebuilt only after it changed."""
+        version = config_version()
+        with compiled_rules.lock:
+            if compiled_rules.lookup is None or compiled_rules.version != version:
+                self.config = self.load_config()
+                compiled_rules.update(self.build_lookup(), version)
+            return compiled_rules.lookup
+
+    def analyse_logs(self, project_dir, files, use_templates=False):
+        """
+        use_templates=True matches rules against the template index of files that have a
+        current parsed result (see logai.template_rules), falling back to the raw lines
+        for other files and for rules that depend on the raw line.
+        """
+        self.lookup_cache = self.current_lookup()
+        return self._parse_logs(project_dir, files, use_templates)
+
     # --------------------- Log Parser ---------------------
-    def _parse_logs(self, project_dir, files):
+    def _parse_logs(self, project_dir, files, use_templates=False):
         if not project_dir:
             return pd.DataFrame()
         
@@ -149,16 +230,7 @@ class LogParserConfig:
         if not files or not self.lookup_cache:
             return pd.DataFrame()
         
-        """         
-        if os.path.exists(self.parser_results_path):
-            try:
-                df = pd.read_parquet(self.parser_results_path)
-                return df
-            except Exception as e:
-                print(f"⚠️ Error loading cached results: {e}")
-                self.lookup_cache = None  # Rebuild cache if error 
-        """
-
+        jobs = []
         for filename, file_path, original_name, _, _ in files:
             if not os.path.exists(file_path):
                 continue
@@ -171,131 +243,251 @@ class LogParserConfig:
             if filename not in self.lookup_cache:
                 continue
 
-            with open(file_path, "r", errors="ignore") as f:
-                lines = f.readlines()
-            
-            #print(f"Parsing file: {filename} with {len(lines)} lines.")
+            jobs.append((filename, file_path))
+
+        # reuse per-pattern results of files whose content is unchanged, so a rule edit
+        # only scans the files it applies to, for the changed patterns only
+        cache_path = os.path.join(project_dir, "log_parser_results.cache.json")
+        cache = _read_json(cache_path)
+        if cache.get("limits") != [PARSER_CONFIG_MAX_MATCHES, PARSER_CONFIG_SAMPLE_LOGS]:
+            cache = {}
+        files_cache = cache.get("files", {})
+        new_cache = {"limits": [PARSER_CONFIG_MAX_MATCHES, PARSER_CONFIG_SAMPLE_LOGS], "files": {}}
+
+        stale_jobs = []
+        template_jobs = []
+        for filename, file_path in jobs:
+            key = os.path.basename(str(file_path))
+            entry = files_cache.get(key, {})
+            stat = os.stat(file_path)
+            file_hash = _file_hash(file_path, entry)
+            mode = "templates" if use_templates and template_mode_available(file_path) else "raw"
+            known = entry.get("patterns", {}) if (entry.get("sha1"), entry.get("mode", "raw")) == (file_hash, mode) else {}
+            new_cache["files"][key] = {
+                "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": file_hash,
+                "mode": mode, "patterns": {},
+            }
+            patterns = new_cache["files"][key]["patterns"]
+            missing = []
             for rule in self.lookup_cache[filename]:
-                matches = []
-                pattern = rule["RegexCompiled"]
-                for line in lines:
-                    if pattern.search(line):
-                        matches.append(line)
-                        if len(matches) >= 100:
-                            break
-                if matches:
+                pattern = rule["Pattern"]
+                if pattern in known:
+                    patterns[pattern] = known[pattern]
+                elif pattern not in missing:
+                    missing.append(pattern)
+            if missing:
+                compiled = [compiled_rules.compile(pattern) for pattern in missing]
+                if mode == "templates":
+                    on_templates = [pattern for pattern in compiled if template_decidable(pattern)]
+                    compiled = [pattern for pattern in compiled if not template_decidable(pattern)]
+                    if on_templates:
+                        template_jobs.append((filename, file_path, on_templates))
+                if compiled:
+                    stale_jobs.append((filename, file_path, compiled))
+
+        scanned = sum(len(job[2]) for job in stale_jobs + template_jobs)
+        total = sum(len(self.lookup_cache[filename]) for filename, _ in jobs)
+        print(f"Rule analysis cache: {total - scanned} of {total} rule results reused, "
+              f"{len(template_jobs)} files to match on templates, {len(stale_jobs)} files to scan.")
+
+        for filename, file_path, compiled in template_jobs:
+            start_time = time.perf_counter()
+            matched = match_rules_on_templates(
+                str(file_path) + ".parquet", compiled, PARSER_CONFIG_MAX_MATCHES, PARSER_CONFIG_SAMPLE_LOGS
+            )
+            patterns = new_cache["files"][os.path.basename(str(file_path))]["patterns"]
+            for pattern, (count, rule_samples) in zip(compiled, matched):
+                patterns[pattern.pattern] = [count, rule_samples]
+            print(f"Template rule matching of {filename}: {time.perf_counter() - start_time:.3f} seconds")
+
+        for (filename, file_path, compiled), (_, counts, samples) in zip(stale_jobs, self._analyse_files(stale_jobs)):
+            patterns = new_cache["files"][os.path.basename(str(file_path))]["patterns"]
+            for pattern, count, rule_samples in zip(compiled, counts, samples):
+                patterns[pattern.pattern] = [count, rule_samples]
+
+        for filename, file_path in jobs:
+            patterns = new_cache["files"][os.path.basename(str(file_path))]["patterns"]
+            for rule in self.lookup_cache[filename]:
+                count, rule_samples = patterns[rule["Pattern"]]
+                if count:
                     results.append({
                         "Category": rule["Category"],
                         "Title": rule["Title"],
                         "Cause": rule["Cause"],
                         "Description": rule["Description"],
-                        "Frequency": len(matches),
-                        "SampleLogs": matches[:5],  # First 5 matches
+                        "Frequency": count,
+                        "SampleLogs": rule_samples,
                         "FileName": filename,
                     })
+        _write_json(cache_path, new_cache)
 
         if not results:
             return pd.DataFrame()
 
         df = pd.DataFrame(results)
         if self.parser_results_path:
-            df.to_parquet(self.parser_results_path, index=False)
+            # stored in report order so the report can stream it
+            sort_results(df).to_parquet(self.parser_results_path, index=False, row_group_size=REPORT_BATCH_ROWS)
         return df
 
+    def _analyse_files(self, jobs, workers=PARSER_CONFIG_WORKERS):
+        """
+        Match every (filename, file_path, patterns) job against its compiled patterns.
+        Files are split into byte ranges of PARSER_CONFIG_RANGE_BYTES that run in a
+        process pool; the per-range counts and samples are merged in file order, so the
+        output is the same as a sequential scan. Yields (filename, counts, samples) in
+        job order.
+        """
+        if not jobs:
+            return
+        tasks = []
+        for job, (filename, file_path, patterns) in enumerate(jobs):
+            for start, end in _file_ranges(file_path, PARSER_CONFIG_RANGE_BYTES):
+                tasks.append((job, filename, file_path, start, end))
+
+        start_time = time.perf_counter()
+        if len(tasks) > 1 and workers > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+                outputs = list(pool.map(
+                    _analyse_range_worker,
+                    [file_path for _, _, file_path, _, _ in tasks],
+                    [start for _, _, _, start, _ in tasks],
+                    [end for _, _, _, _, end in tasks],
+                    [jobs[job][2] for job, _, _, _, _ in tasks],
+                ))
+        else:
+            outputs = [
+                _analyse_range_worker(file_path, start, end, jobs[job][2], compiled_rules.matcher(filename, jobs[job][2]))
+                for job, filename, file_path, start, end in tasks
+            ]
+
+        merged = {}
+        self.file_timings = {}
+        for (job, filename, _, _, _), (counts, samples, elapsed) in zip(tasks, outputs):
+            if job not in merged:
+                merged[job] = (filename, [0] * len(counts), [[] for _ in counts])
+            _, total_counts, total_samples = merged[job]
+            for i, (count, rule_samples) in enumerate(zip(counts, samples)):
+                total_counts[i] = min(total_counts[i] + count, PARSER_CONFIG_MAX_MATCHES)
+                total_samples[i].extend(rule_samples[:PARSER_CONFIG_SAMPLE_LOGS - len(total_samples[i])])
+            self.file_timings[filename] = self.file_timings.get(filename, 0.0) + elapsed
+
+        for filename, seconds in self.file_timings.items():
+            print(f"Rule analysis of {filename}: {seconds:.3f} seconds")
+        print(f"Rule analysis of {len(jobs)} files in {len(tasks)} ranges: {time.perf_counter() - start_time:.3f} seconds wall time")
+
+        for job in sorted(merged):
+            yield merged[job]
+
     # --------------------- PDF Report Generator ---------------------
-    def generate_pdf(self, project_dir, project_name):
+    def generate_pdf(self, project_dir, project_name, progress=None):
+        """
+        Build the report from the results a batch at a time (see logai/parser_report.py).
+        For a background build with progress use parser_report.report_jobs.start.
+        """
         self.parser_results_path = os.path.join(project_dir, "log_parser_results.parquet")
 
         if not os.path.exists(self.parser_results_path):
             raise FileNotFoundError("No parser results found to generate report.")
-        
-        df = pd.read_parquet(self.parser_results_path)
-        pdf_path, pdf_name = self._generate_pdf_report(df, project_name)
-        return pdf_path, pdf_name
-    
-    def _generate_pdf_report(self, df, project_name):
+
         pdf_name = f"Static_Analysis_Report-{project_name}.pdf"
         pdf_path = os.path.join(os.path.dirname(self.parser_results_path), pdf_name)
-        doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-        styles = getSampleStyleSheet()
-
-        # Custom styles
-        small_code_style = ParagraphStyle(
-            "SmallCode",
-            parent=styles["Code"],
-            fontName="Courier",
-            fontSize=6,
-            leading=8,
-            backColor=colors.whitesmoke,
-            leftIndent=15,
-            rightIndent=15,
-            borderPadding=4,
-        )
-
-        body_text = styles["BodyText"]
-        title_style = styles["Heading2"]
-        header_style = styles["Heading3"]
-
-        # Highlight style for high-frequency descriptions
-        highlight_body_style = ParagraphStyle(
-            "HighlightBody",
-            parent=body_text,
-            backColor=colors.lavenderblush,  # light red background
-            borderPadding=4,
-        )
-
-        flow = [Paragraph("Log Analysis Report", styles["Title"]), Spacer(1, 12)]
-
-        # Group by Category first, then within each Category, group by Title, Cause, Filename
-        category_groups = df.groupby("Category", dropna=False)
-
-        for category, cat_df in category_groups:
-            # Print category once
-            flow.append(Paragraph(f"<b>{category}</b>", title_style))
-            flow.append(Spacer(1, 6))
-
-            # Now group the rest
-            issue_groups = (
-                cat_df.groupby(["Title", "Cause", "FileName"], dropna=False)
-                .apply(lambda x: x.to_dict("records"), include_groups=False)
-                .to_dict()
-            )
-
-            for (title, cause, filename), records in issue_groups.items():
-                flow.append(Paragraph(f"<b>{title}</b>", header_style))
-                flow.append(Paragraph(f"<b>Cause:</b> {cause}", body_text))
-                flow.append(Paragraph(f"<b>Filename:</b> {filename}", body_text))
-                flow.append(Spacer(1, 6))
-
-                for idx, rec in enumerate(records, 1):
-                    freq = rec.get("Frequency", 0)
-                    desc_style = highlight_body_style if freq > 10 else body_text
-
-                    flow.append(
-                        Paragraph(
-                            f"{idx}. <b>{rec['Description']}</b> (Frequency: {rec['Frequency']})",
-                            desc_style,
-                        )
-                    )
-                    flow.append(Spacer(1, 6))
-
-                    sample_logs = rec["SampleLogs"]
-                    if not len(sample_logs):
-                        continue
-
-                    for log_line in sample_logs:
-                        clean_line = log_line.strip().replace("\\n", "\n")
-                        wrapped_log = Paragraph(
-                            f"<font face='Courier' size='7'><pre>{clean_line}</pre></font>",
-                            small_code_style,
-                        )
-                        flow.append(wrapped_log)
-                        flow.append(Spacer(1, 6))
-
-                flow.append(Spacer(1, 12))
-
-            flow.append(Spacer(1, 18))  # Add extra space after category
-
-        doc.build(flow)
+        start_time = time.perf_counter()
+        ReportBuilder(self.parser_results_path, pdf_path, progress).build()
+        print(f"Report {pdf_name}: {time.perf_counter() - start_time:.3f} seconds")
         return pdf_path, pdf_name
 
+
+# ---------------------
+# Rule analysis cache helpers
+# ---------------------
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def _file_hash(file_path, entry, block_size=1024 * 1024):
+    """sha1 of the file content; reused from entry while size and mtime are unchanged."""
+    stat = os.stat(file_path)
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("sha1"):
+        return entry["sha1"]
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ---------------------
+# Rule analysis workers (top-level so ProcessPoolExecutor can pickle them)
+# ---------------------
+def _file_ranges(file_path, range_bytes):
+    """Split file_path into byte ranges of about range_bytes that start on line boundaries."""
+    size = os.path.getsize(file_path)
+    offsets = [0]
+    with open(file_path, "rb") as f:
+        while offsets[-1] + range_bytes < size:
+            f.seek(offsets[-1] + range_bytes)
+            f.readline()
+            if f.tell() >= size:
+                break
+            offsets.append(f.tell())
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def _iter_lines(file_path, start, end):
+    """
+    Decoded lines of bytes [start, end) of file_path, split and terminated as in text
+    mode: CRLF, a lone CR and LF all end a line and become "\\n".
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            raw = f.readline()
+            if not raw:
+                break
+            position += len(raw)
+            text = raw.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+            parts = text.split("\n")
+            for part in parts[:-1]:
+                yield part + "\n"
+            if parts[-1]:
+                yield parts[-1]
+
+def _analyse_range_worker(file_path, start, end, patterns, matcher=None):
+    """
+    Stream bytes [start, end) of file_path once against every pattern. Only a counter and
+    the first PARSER_CONFIG_SAMPLE_LOGS lines are kept per rule, and the scan stops as
+    soon as every pattern has reached PARSER_CONFIG_MAX_MATCHES.
+    Returns (counts, samples, seconds).
+    """
+    start_time = time.perf_counter()
+    if matcher is None:
+        matcher = MultiPatternMatcher(patterns)
+    counts = [0] * len(patterns)
+    samples = [[] for _ in patterns]
+    done = [False] * len(patterns)
+    remaining = len(patterns)
+
+    for line in _iter_lines(file_path, start, end):
+        for i in matcher.match(line, done):
+            counts[i] += 1
+            if len(samples[i]) < PARSER_CONFIG_SAMPLE_LOGS:
+                samples[i].append(line)
+            if counts[i] >= PARSER_CONFIG_MAX_MATCHES:
+                done[i] = True
+                remaining -= 1
+        if not remaining:
+            break
+    return counts, samples, time.perf_counter() - start_time
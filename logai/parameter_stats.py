@@ -0,0 +1,324 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from logai.pattern_result import read_template_rows, template_id, result_format_version
+from logai.result_cache import result_cache
+from logai.utils.constants import (
+    PARAM_STATS_MAX_DISTINCT,
+    PARAM_STATS_TOP_K,
+    PARAM_STATS_HIST_BINS,
+)
+
+"""
+Per template, per parameter position statistics written next to a parsed result as
+<file>.params.parquet, so the parameter table renders without reading the rows.
+
+While a position has at most PARAM_STATS_MAX_DISTINCT distinct values every count is
+exact. Past that the position switches to a sketch: a HyperLogLog for the cardinality
+and the PARAM_STATS_MAX_DISTINCT most frequent values seen so far for the top-k
+(counts of values that were dropped and came back are lower bounds).
+Empty parameters are not counted, same as the old filter(None, ...) table.
+"""
+
+PARAM_STATS_SCHEMA = pa.schema([
+    ("template_id", pa.int32()),
+    ("position", pa.int32()),
+    ("count", pa.int64()),
+    ("distinct", pa.int64()),
+    ("distinct_exact", pa.bool_()),
+    ("top_values", pa.list_(pa.string())),
+    ("top_counts", pa.list_(pa.int64())),
+    ("numeric_count", pa.int64()),
+    ("min", pa.float64()),
+    ("max", pa.float64()),
+    ("hist_edges", pa.list_(pa.float64())),
+    ("hist_counts", pa.list_(pa.int64())),
+    # merge state for appended tails, not needed for display
+    ("values", pa.list_(pa.string())),
+    ("value_counts", pa.list_(pa.int64())),
+    ("hll", pa.binary()),
+])
+
+DISPLAY_COLUMNS = [f.name for f in PARAM_STATS_SCHEMA if f.name not in ("template_id", "values", "value_counts", "hll")]
+
+GROUP = ["template_id", "position"]
+
+# HyperLogLog with 2^10 registers (~3% standard error)
+HLL_P = 10
+HLL_M = 1 << HLL_P
+
+
+def parameter_stats_path(result_file_path) -> Path:
+    """<file>.parquet -> <file>.params.parquet"""
+    result_file_path = str(result_file_path)
+    if result_file_path.endswith(".parquet"):
+        result_file_path = result_file_path[:-len(".parquet")]
+    return Path(result_file_path + ".params.parquet")
+
+
+def _hll_update(registers, values):
+    hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+    idx = (hashes >> np.uint64(64 - HLL_P)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - HLL_P)) - 1)
+    # rank = position of the leftmost 1 bit in the remaining 64 - p bits
+    bit_length = np.zeros(len(rest), dtype=np.int64)
+    nonzero = rest > 0
+    bit_length[nonzero] = np.frexp(rest[nonzero].astype(np.float64))[1]
+    rank = (64 - HLL_P) - bit_length + 1
+    np.maximum.at(registers, idx, rank.astype(np.uint8))
+
+def _hll_estimate(registers) -> int:
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    estimate = alpha * HLL_M * HLL_M / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * HLL_M and zeros:
+        estimate = HLL_M * np.log(HLL_M / zeros)
+    return int(round(estimate))
+
+
+class _Sketch:
+    """State of one position past PARAM_STATS_MAX_DISTINCT distinct values."""
+    def __init__(self, registers, top, hist_edges, hist_counts):
+        self.registers = registers
+        self.top = top
+        self.hist_edges = hist_edges
+        self.hist_counts = hist_counts
+
+    def add(self, values, counts, numbers):
+        _hll_update(self.registers, values)
+        for value, count in zip(values, counts):
+            self.top[value] = self.top.get(value, 0) + int(count)
+        if len(self.top) > PARAM_STATS_MAX_DISTINCT:
+            kept = sorted(self.top.items(), key=lambda kv: (-kv[1], kv[0]))[:PARAM_STATS_MAX_DISTINCT]
+            self.top = dict(kept)
+        if self.hist_edges is not None:
+            valid = ~np.isnan(numbers)
+            if valid.any():
+                # edges are frozen at the switch to the sketch; outliers land in the end bins
+                clipped = np.clip(numbers[valid], self.hist_edges[0], self.hist_edges[-1])
+                self.hist_counts += np.histogram(clipped, bins=self.hist_edges, weights=counts[valid])[0].astype(np.int64)
+
+
+class ParameterStats:
+    """
+    Accumulates parameter statistics per (template_id, position) over the chunks of a
+    parse. add() takes the same template ids and parameter lists that are written to
+    the result; save() writes <file>.params.parquet.
+    """
+    def __init__(self):
+        self.exact = pd.DataFrame(columns=GROUP + ["value", "count"])
+        self.totals = pd.DataFrame(columns=GROUP + ["count", "numeric_count", "min", "max"])
+        self.sketches = {}
+
+    @classmethod
+    def for_append(cls, result_file_path) -> "ParameterStats":
+        """Statistics of an existing result, ready to fold an appended tail into."""
+        stats = cls()
+        path = parameter_stats_path(result_file_path)
+        if not path.exists():
+            pf = pq.ParquetFile(str(result_file_path))
+            for i in range(pf.num_row_groups):
+                table = pf.read_row_group(i, columns=["template_id", "parameter_list"])
+                stats.add(table.column("template_id").to_numpy(), table.column("parameter_list"))
+            return stats
+
+        df = pd.read_parquet(path)
+        stats.totals = df[GROUP + ["count", "numeric_count", "min", "max"]].copy()
+        exact = df[df["distinct_exact"]]
+        if not exact.empty:
+            exploded = exact[GROUP + ["values", "value_counts"]].explode(["values", "value_counts"]).dropna()
+            stats.exact = pd.DataFrame({
+                "template_id": exploded["template_id"].to_numpy(),
+                "position": exploded["position"].to_numpy(),
+                "value": exploded["values"].to_numpy(),
+                "count": exploded["value_counts"].astype(np.int64).to_numpy(),
+            })
+        for row in df[~df["distinct_exact"]].itertuples(index=False):
+            registers = np.frombuffer(row.hll, dtype=np.uint8).copy()
+            top = dict(zip(row.values, (int(c) for c in row.value_counts)))
+            edges = np.array(row.hist_edges, dtype=np.float64) if row.hist_edges is not None and len(row.hist_edges) else None
+            counts = np.array(row.hist_counts, dtype=np.int64) if edges is not None else None
+            stats.sketches[(int(row.template_id), int(row.position))] = _Sketch(registers, top, edges, counts)
+        return stats
+
+    def add(self, template_ids: np.ndarray, parameter_lists):
+        """parameter_lists: pyarrow list<string> array/chunked array or a Series of lists."""
+        if not isinstance(parameter_lists, (pa.Array, pa.ChunkedArray)):
+            parameter_lists = pa.array(pd.Series(parameter_lists).tolist(), type=pa.list_(pa.string()))
+        if isinstance(parameter_lists, pa.ChunkedArray):
+            parameter_lists = parameter_lists.combine_chunks()
+
+        lengths = pc.list_value_length(parameter_lists).fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+        if not lengths.sum():
+            return
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        values = pc.list_flatten(parameter_lists).to_numpy(zero_copy_only=False)
+        chunk = pd.DataFrame({
+            "template_id": np.repeat(np.asarray(template_ids), lengths),
+            "position": (np.arange(len(values)) - starts).astype(np.int32),
+            "value": values,
+        })
+        chunk = chunk[chunk["value"].notna() & (chunk["value"] != "")]
+        if chunk.empty:
+            return
+
+        counts = chunk.groupby(GROUP + ["value"], sort=False).size().reset_index(name="count")
+        uniques, codes = np.unique(counts["value"].to_numpy(dtype=object), return_inverse=True)
+        counts["number"] = pd.to_numeric(pd.Series(uniques), errors="coerce").to_numpy(dtype=np.float64)[codes]
+        self._add_totals(counts)
+
+        if self.sketches:
+            keys = list(zip(counts["template_id"], counts["position"]))
+            sketched = np.fromiter((key in self.sketches for key in keys), dtype=bool, count=len(keys))
+            for key, group in counts[sketched].groupby(GROUP, sort=False):
+                self.sketches[key].add(group["value"].to_numpy(dtype=object), group["count"].to_numpy(), group["number"].to_numpy())
+            counts = counts[~sketched]
+
+        counts = counts[GROUP + ["value", "count"]]
+        merged = pd.concat([self.exact, counts], ignore_index=True) if not self.exact.empty else counts
+        self.exact = merged.groupby(GROUP + ["value"], sort=False)["count"].sum().reset_index()
+        self._spill()
+
+    def _add_totals(self, counts):
+        numeric = counts["number"].notna()
+        weighted = counts.assign(numeric_count=np.where(numeric, counts["count"], 0))
+        chunk = weighted.groupby(GROUP, sort=False).agg(
+            count=("count", "sum"), numeric_count=("numeric_count", "sum"),
+            min=("number", "min"), max=("number", "max"),
+        ).reset_index()
+        if self.totals.empty:
+            self.totals = chunk
+            return
+        merged = pd.concat([self.totals, chunk], ignore_index=True)
+        self.totals = merged.groupby(GROUP, sort=False).agg(
+            count=("count", "sum"), numeric_count=("numeric_count", "sum"),
+            min=("min", "min"), max=("max", "max"),
+        ).reset_index()
+
+    def _spill(self):
+        """Move positions with too many distinct values from exact counts to a sketch."""
+        distinct = self.exact.groupby(GROUP, sort=False).size()
+        overflow = distinct[distinct > PARAM_STATS_MAX_DISTINCT]
+        if overflow.empty:
+            return
+        spill = self.exact.set_index(GROUP).index.isin(overflow.index)
+        for key, group in self.exact[spill].groupby(GROUP, sort=False):
+            values = group["value"].to_numpy(dtype=object)
+            counts = group["count"].to_numpy(dtype=np.int64)
+            numbers = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+            edges, hist = _histogram(numbers, counts)
+            sketch = _Sketch(np.zeros(HLL_M, dtype=np.uint8), {}, edges, hist)
+            sketch.add(values, counts, np.full(len(values), np.nan))
+            self.sketches[(int(key[0]), int(key[1]))] = sketch
+        self.exact = self.exact[~spill].reset_index(drop=True)
+
+    def to_frame(self) -> pd.DataFrame:
+        rows = []
+        exact = self.exact.sort_values(GROUP + ["count", "value"], ascending=[True, True, False, True], kind="stable")
+        for key, group in exact.groupby(GROUP, sort=False):
+            values = group["value"].tolist()
+            counts = group["count"].astype(np.int64).tolist()
+            numbers = pd.to_numeric(group["value"], errors="coerce").to_numpy(dtype=np.float64)
+            edges, hist = _histogram(numbers, np.asarray(counts, dtype=np.int64))
+            rows.append((key, len(values), True, values, counts, edges, hist, None))
+        for key, sketch in self.sketches.items():
+            items = sorted(sketch.top.items(), key=lambda kv: (-kv[1], kv[0]))
+            rows.append((key, _hll_estimate(sketch.registers), False, [v for v, _ in items], [c for _, c in items],
+                         sketch.hist_edges, sketch.hist_counts, sketch.registers.tobytes()))
+
+        totals = self.totals.set_index(GROUP)
+        records = []
+        for (tid, position), distinct, is_exact, values, counts, edges, hist, hll in rows:
+            total = totals.loc[(tid, position)]
+            records.append({
+                "template_id": int(tid),
+                "position": int(position),
+                "count": int(total["count"]),
+                "distinct": int(distinct),
+                "distinct_exact": is_exact,
+                "top_values": values[:PARAM_STATS_TOP_K],
+                "top_counts": counts[:PARAM_STATS_TOP_K],
+                "numeric_count": int(total["numeric_count"]),
+                "min": None if pd.isna(total["min"]) else float(total["min"]),
+                "max": None if pd.isna(total["max"]) else float(total["max"]),
+                "hist_edges": None if edges is None else [float(e) for e in edges],
+                "hist_counts": None if hist is None else [int(c) for c in hist],
+                "values": values,
+                "value_counts": counts,
+                "hll": hll,
+            })
+        df = pd.DataFrame(records, columns=[f.name for f in PARAM_STATS_SCHEMA])
+        return df.sort_values(GROUP, kind="stable").reset_index(drop=True)
+
+    def save(self, result_file_path) -> Path:
+        path = parameter_stats_path(result_file_path)
+        tmp = Path(str(path) + ".tmp")
+        table = pa.Table.from_pandas(self.to_frame(), schema=PARAM_STATS_SCHEMA, preserve_index=False)
+        pq.write_table(table, str(tmp))
+        os.replace(str(tmp), str(path))
+        return path
+
+
+def _histogram(numbers, counts):
+    """PARAM_STATS_HIST_BINS equal-width bins over the numeric values, (None, None) if there are none."""
+    valid = ~np.isnan(numbers)
+    if not valid.any():
+        return None, None
+    hist, edges = np.histogram(numbers[valid], bins=PARAM_STATS_HIST_BINS, weights=counts[valid])
+    return edges, hist.astype(np.int64)
+
+
+def read_parameter_stats(result_file_path, template) -> pd.DataFrame:
+    """
+    Display statistics of every parameter position of template, ordered by position.
+    Results parsed before the sidecar existed are computed from the template's rows.
+    """
+    if not result_file_path or not os.path.exists(result_file_path):
+        return pd.DataFrame(columns=DISPLAY_COLUMNS)
+    return result_cache.get(result_file_path, lambda: _read_parameter_stats(result_file_path, template),
+                            variant=("params", template))
+
+def _read_parameter_stats(result_file_path, template) -> pd.DataFrame:
+    path = parameter_stats_path(result_file_path)
+    if path.exists() and result_format_version(result_file_path) >= 2:
+        tid = template_id(result_file_path, template)
+        if tid is None:
+            return pd.DataFrame(columns=DISPLAY_COLUMNS)
+        df = pd.read_parquet(path, columns=DISPLAY_COLUMNS, filters=[("template_id", "==", tid)])
+        return df.sort_values("position").reset_index(drop=True)
+
+    rows = read_template_rows(result_file_path, template, columns=["parameter_list"])
+    stats = ParameterStats()
+    stats.add(np.zeros(len(rows), dtype=np.int32), rows["parameter_list"])
+    return stats.to_frame()[DISPLAY_COLUMNS]
+
+
+def parameter_summary(stats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parameter table rows: position, value_counts (non-empty occurrences), distinct,
+    values (top values with their counts) and range (min - max of numeric positions).
+    """
+    summary = pd.DataFrame(None, columns=["position", "value_counts", "distinct", "values", "range"])
+    if stats is None or stats.empty:
+        return summary
+
+    summary["position"] = ["POSITION_{}".format(p) for p in stats["position"]]
+    summary["value_counts"] = stats["count"].astype(int).tolist()
+    summary["distinct"] = [
+        str(d) if exact else "~{}".format(d)
+        for d, exact in zip(stats["distinct"], stats["distinct_exact"])
+    ]
+    summary["values"] = [
+        ", ".join("{} ({})".format(v, c) for v, c in zip(values, counts))
+        for values, counts in zip(stats["top_values"], stats["top_counts"])
+    ]
+    summary["range"] = [
+        "{:g} - {:g}".format(lo, hi) if numeric and numeric == total else ""
+        for lo, hi, numeric, total in zip(stats["min"], stats["max"], stats["numeric_count"], stats["count"])
+    ]
+    return summary
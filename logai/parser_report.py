@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import pandas as pd
+import pyarrow.parquet as pq
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+from logai.utils.constants import (
+    REPORT_BATCH_ROWS,
+    REPORT_SAMPLE_LOGS,
+    REPORT_SAMPLE_LOG_CHARS,
+)
+
+"""
+Rule analysis PDF report, built from log_parser_results.parquet a batch of rows at a
+time. The results file is written sorted in report order (Category, Title, Cause,
+FileName), so headings are emitted as the keys change and every batch of flowables is
+laid out and dropped before the next one is read.
+"""
+
+REPORT_ORDER = ["Category", "Title", "Cause", "FileName"]
+
+_styles = None
+
+
+def report_styles():
+    """Paragraph styles of the report, created once per process."""
+    global _styles
+    if _styles is None:
+        styles = getSampleStyleSheet()
+        body_text = styles["BodyText"]
+        _styles = {
+            "title": styles["Title"],
+            "category": styles["Heading2"],
+            "issue": styles["Heading3"],
+            "body": body_text,
+            # Highlight style for high-frequency descriptions
+            "highlight": ParagraphStyle(
+                "HighlightBody",
+                parent=body_text,
+                backColor=colors.lavenderblush,  # light red background
+                borderPadding=4,
+            ),
+            "code": ParagraphStyle(
+                "SmallCode",
+                parent=styles["Code"],
+                fontName="Courier",
+                fontSize=6,
+                leading=8,
+                backColor=colors.whitesmoke,
+                leftIndent=15,
+                rightIndent=15,
+                borderPadding=4,
+            ),
+        }
+    return _styles
+
+
+def sort_results(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows in report order; rows of one issue keep their original order."""
+    return df.sort_values(REPORT_ORDER, kind="stable", na_position="last", ignore_index=True)
+
+
+def _ensure_sorted(results_path):
+    """Rewrite results written before they were stored in report order."""
+    keys = pd.read_parquet(results_path, columns=REPORT_ORDER)
+    if keys.equals(sort_results(keys)):
+        return
+    tmp = str(results_path) + ".tmp"
+    sort_results(pd.read_parquet(results_path)).to_parquet(tmp, index=False, row_group_size=REPORT_BATCH_ROWS)
+    os.replace(tmp, results_path)
+
+
+class ReportBuilder:
+    """
+    Streams results_path into pdf_path. progress(done_rows, total_rows) is called after
+    every batch.
+    """
+    def __init__(self, results_path, pdf_path, progress=None):
+        self.results_path = str(results_path)
+        self.pdf_path = str(pdf_path)
+        self.progress = progress
+
+    def build(self):
+        _ensure_sorted(self.results_path)
+        tmp_path = self.pdf_path + ".tmp"
+        doc = SimpleDocTemplate(tmp_path, pagesize=letter)
+        doc.build(_FlowStream(self._batches()))
+        os.replace(tmp_path, self.pdf_path)
+        return self.pdf_path
+
+    def _batches(self):
+        """Flowables of the report, one list per batch of result rows."""
+        styles = report_styles()
+        pf = pq.ParquetFile(self.results_path)
+        total = pf.metadata.num_rows
+        yield [Paragraph("Log Analysis Report", styles["title"]), Spacer(1, 12)]
+
+        category = issue = None
+        idx = done = 0
+        for batch in pf.iter_batches(batch_size=REPORT_BATCH_ROWS):
+            flow = []
+            for rec in batch.to_pylist():
+                key = tuple(rec[column] for column in REPORT_ORDER)
+                if key != issue:
+                    if issue is not None:
+                        flow.append(Spacer(1, 12))
+                    if issue is None or key[0] != category:
+                        if issue is not None:
+                            flow.append(Spacer(1, 18))  # Add extra space after category
+                        category = key[0]
+                        flow.append(Paragraph(f"<b>{category}</b>", styles["category"]))
+                        flow.append(Spacer(1, 6))
+                    issue = key
+                    idx = 0
+                    flow.append(Paragraph(f"<b>{rec['Title']}</b>", styles["issue"]))
+                    flow.append(Paragraph(f"<b>Cause:</b> {rec['Cause']}", styles["body"]))
+                    flow.append(Paragraph(f"<b>Filename:</b> {rec['FileName']}", styles["body"]))
+                    flow.append(Spacer(1, 6))
+                idx += 1
+                flow.extend(self._record(idx, rec, styles))
+            yield flow
+            done += batch.num_rows
+            if self.progress:
+                self.progress(done, total)
+
+        if issue is not None:
+            yield [Spacer(1, 12), Spacer(1, 18)]
+
+    def _record(self, idx, rec, styles):
+        freq = rec.get("Frequency") or 0
+        desc_style = styles["highlight"] if freq > 10 else styles["body"]
+        flow = [
+            Paragraph(f"{idx}. <b>{rec['Description']}</b> (Frequency: {rec['Frequency']})", desc_style),
+            Spacer(1, 6),
+        ]
+        sample_logs = rec.get("SampleLogs") or []
+        for log_line in sample_logs[:REPORT_SAMPLE_LOGS]:
+            clean_line = log_line.strip().replace("\\n", "\n")
+            if len(clean_line) > REPORT_SAMPLE_LOG_CHARS:
+                clean_line = clean_line[:REPORT_SAMPLE_LOG_CHARS] + " ..."
+            flow.append(Paragraph(
+                f"<font face='Courier' size='7'><pre>{escape(clean_line)}</pre></font>",
+                styles["code"],
+            ))
+            flow.append(Spacer(1, 6))
+        if len(sample_logs) > REPORT_SAMPLE_LOGS:
+            flow.append(Paragraph(
+                f"<i>{len(sample_logs) - REPORT_SAMPLE_LOGS} more sample lines not shown</i>", styles["body"]
+            ))
+            flow.append(Spacer(1, 6))
+        return flow
+
+
+class _FlowStream(list):
+    """
+    Flowable list for doc.build that is refilled from an iterator of flowable lists
+    whenever the document has laid out everything it holds.
+    """
+    def __init__(self, batches):
+        super().__init__()
+        self.batches = iter(batches)
+
+    def __len__(self):
+        while not super().__len__():
+            batch = next(self.batches, None)
+            if batch is None:
+                break
+            self.extend(batch)
+        return super().__len__()
+
+
+# ---------------------
+# Background report jobs
+# ---------------------
+def report_status_path(project_dir) -> Path:
+    return Path(project_dir) / "report_status.json"
+
+def read_report_status(project_dir):
+    path = report_status_path(project_dir)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def write_report_status(project_dir, status):
+    path = report_status_path(project_dir)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(status, indent=2), encoding="utf-8")
+    os.replace(str(tmp), str(path))
+
+
+class ReportJobs:
+    """One background report build per project, with progress in report_status.json."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.threads = {}
+
+    def start(self, project_dir, project_name) -> bool:
+        """Start building the report of project_dir; False if one is already running."""
+        key = str(project_dir)
+        with self.lock:
+            thread = self.threads.get(key)
+            if thread is not None and thread.is_alive():
+                return False
+            write_report_status(project_dir, {"state": "running", "progress": 0.0, "timestamp": time.time()})
+            thread = threading.Thread(target=self._worker, args=(project_dir, project_name), daemon=True)
+            self.threads[key] = thread
+            thread.start()
+        return True
+
+    def _worker(self, project_dir, project_name):
+        from logai.log_parser_config import LogParserConfig
+
+        start_time = time.time()
+
+        def progress(done, total):
+            write_report_status(project_dir, {
+                "state": "running", "progress": done / total if total else 1.0,
+                "rows": done, "total_rows": total, "timestamp": time.time(),
+            })
+
+        try:
+            pdf_path, pdf_name = LogParserConfig().generate_pdf(project_dir, project_name, progress=progress)
+            write_report_status(project_dir, {
+                "state": "done", "progress": 1.0, "pdf_path": str(pdf_path), "pdf_name": pdf_name,
+                "seconds": round(time.time() - start_time, 3), "timestamp": time.time(),
+            })
+        except Exception as e:
+            write_report_status(project_dir, {"state": "error", "message": str(e), "timestamp": time.time()})
+
+
+report_jobs = ReportJobs()
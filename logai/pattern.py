@@ -1,6 +1,14 @@
 import re
 import os
+import json
+import shutil
+import hashlib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from dateutil import parser as dateparser
@@ -10,6 +18,117 @@ from drain3.template_miner_config import TemplateMinerConfig
 from drain3.file_persistence import FilePersistence
 import time
 
+from logai.parameter_stats import ParameterStats
+from logai.pattern_result import (
+    RESULT_SCHEMA,
+    TemplateRollups,
+    TemplateRowIndex,
+    TemplateTable,
+    result_format_version,
+    read_result,
+)
+from logai.utils.constants import (
+    PATTERN_STREAM_CHUNK_LINES,
+    PATTERN_STREAM_MIN_FILE_SIZE,
+    PATTERN_SHARDS,
+    PATTERN_ROW_GROUP_ROWS,
+)
+
+# One named group per preprocess_regex timestamp alternative, used to classify
+# raw timestamps in bulk before the per-class pd.to_datetime calls
+TIMESTAMP_CLASSES_REGEX = (
+    r"^(?:"
+    r"(?P<iso>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})"             # 2023-10-02T12:34:56
+    r"|(?P<dashed>\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2})"         # 2023-10-02-12-34-56
+    r"|(?P<short>\d{6}-\d{2}:\d{2}:\d{2})\.\d+"                  # 230102-12:34:56.123
+    r"|(?P<syslog>[A-Z][a-z]{2}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})"   # Sep  3 00:28:37
+    r"|(?P<space>\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})"          # 2023-10-02 12:34:56
+    r"|(?P<uptime>\d+\.\d+)"                                     # 175383.097855
+    r")$"
+)
+TIMESTAMP_FORMATS = {
+    "iso": "%Y-%m-%dT%H:%M:%S",
+    "dashed": "%Y-%m-%d-%H-%M-%S",
+    "short": "%y%m%d-%H:%M:%S",
+    "space": "%Y-%m-%d %H:%M:%S",
+}
+
+_NEWLINES = re.compile(r"\r\n|\r|\n")
+_RAW_NEWLINES = re.compile(rb"\r\n|\r|\n")
+
+def _decode_lines(raw_lines):
+    """
+    Lines of the binary lines raw_lines as text-mode readlines() returns them: invalid
+    UTF-8 dropped and \r\n or a lone \r ending a line like \n. Reading in binary keeps
+    the byte offsets exact.
+    """
+    lines = _NEWLINES.sub("\n", b"".join(raw_lines).decode("utf-8", errors="ignore")).split("\n")
+    last = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+def _uptime_microseconds(seconds):
+    """
+    int64 microseconds of float seconds, rounded exactly as timedelta(seconds=...)
+    rounds them: whole seconds and microseconds are truncated, the remainder is
+    rounded half to even.
+    """
+    whole_seconds = np.trunc(seconds)
+    micro = (seconds - whole_seconds) * 1e6
+    whole_micro = np.trunc(micro)
+    left = micro - whole_micro
+    total = whole_seconds.astype(np.int64) * 1000000 + whole_micro.astype(np.int64)
+    return total + ((left > 0.5) | ((left == 0.5) & (total % 2 == 1)))
+
+def _line_offsets(raw_lines, start=0):
+    """File byte offset of every line _decode_lines(raw_lines) returns, raw_lines being read at start."""
+    data = b"".join(raw_lines)
+    offsets = [start] + [start + m.end() for m in _RAW_NEWLINES.finditer(data)]
+    if offsets[-1] == start + len(data):
+        offsets.pop()
+    return offsets
+
+# ---------- Parse state helpers ----------
+def parse_state_path(fpath) -> Path:
+    """Sidecar recording how much of fpath the cached <file>.parquet covers."""
+    return Path(str(fpath) + ".parquet.state.json")
+
+def read_parse_state(fpath):
+    path = parse_state_path(fpath)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def prefix_fingerprint(fpath, length, block_size=1024 * 1024):
+    """sha1 of the first `length` bytes of fpath."""
+    digest = hashlib.sha1()
+    remaining = int(length)
+    with open(fpath, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def result_is_current(fpath) -> bool:
+    """True if <file>.parquet exists and covers the whole file."""
+    if not os.path.exists(str(fpath) + ".parquet"):
+        return False
+    state = read_parse_state(fpath)
+    if not state:
+        return True
+    try:
+        return os.path.getsize(fpath) == int(state.get("offset", -1))
+    except OSError:
+        return True
+
 # ---------------------
 # Drain3 Parser Wrapper
 # ---------------------
@@ -22,6 +141,50 @@ Drain3 returns a dictionary like this when you call add_log_message(line)
   "parameter_list": ["123", "2025-10-01 12:34:56,789"]
 }
 """
+class ResultSidecars:
+    """
+    Everything written next to <file>.parquet, filled in as the result is encoded:
+    template table, row index, time-series rollups and parameter statistics.
+    """
+    def __init__(self, template_table=None, row_index=None, rollups=None, param_stats=None):
+        self.template_table = template_table or TemplateTable()
+        self.row_index = row_index or TemplateRowIndex()
+        self.rollups = rollups or TemplateRollups()
+        self.param_stats = param_stats or ParameterStats()
+
+    @classmethod
+    def for_append(cls, result_file_path) -> "ResultSidecars":
+        return cls(
+            TemplateTable.load(result_file_path),
+            TemplateRowIndex.for_append(result_file_path),
+            TemplateRollups.for_append(result_file_path),
+            ParameterStats.for_append(result_file_path),
+        )
+
+    def encode(self, df) -> pa.Table:
+        """
+        Arrow table in RESULT_SCHEMA for df, replacing template text by template_id.
+        An "offset" column (byte offset of each row's line in the log) goes to the row
+        index only and is removed from df.
+        Must be written with row_group_size=PATTERN_ROW_GROUP_ROWS to match row_index.
+        """
+        offsets = df.pop("offset").to_numpy() if "offset" in df else None
+        df["template_id"] = self.template_table.encode(df["template"], df["timestamp"])
+        template_ids = df["template_id"].to_numpy()
+        self.row_index.add(template_ids, offsets)
+        self.rollups.add(template_ids, df["timestamp"])
+        table = pa.Table.from_pandas(df, schema=RESULT_SCHEMA, preserve_index=False)
+        self.param_stats.add(template_ids, table.column("parameter_list"))
+        return table
+
+    def save(self, result_file_path):
+        # written before the result is replaced, so a current result always has current sidecars
+        self.template_table.save(result_file_path)
+        self.row_index.save(result_file_path)
+        self.rollups.save(result_file_path)
+        self.param_stats.save(result_file_path)
+
+
 class Pattern:
     def __init__(self, project_dir=None, sim_th=None, depth=None):
         config = TemplateMinerConfig()
@@ -42,72 +205,501 @@ class Pattern:
         #self.template_miner = TemplateMiner(config=config)
         self.log_df = pd.DataFrame()
         self.results = pd.DataFrame()
+        self.base_time = None
+        self.last_timestamp = None
 
-    def parse_logs(self, fpath):
+    def parse_logs(self, fpath, streaming=None, shards=None, load_result=True):
+        """
+        Parse fpath with Drain3 and cache the result next to it as <file>.parquet.
+        streaming=None picks streaming mode for files above PATTERN_STREAM_MIN_FILE_SIZE.
+        shards=N mines the file in N processes (see parse_logs_sharded).
+        If the file grew since the cached parse and its prefix is unchanged, only the
+        appended tail is parsed (see parse_logs_incremental).
+        Rows are sorted by timestamp over the whole file, except in streaming mode and for
+        appended tails, which are sorted per chunk and follow the earlier rows.
+        load_result=False returns (None, result_file_path) without reading the parquet back.
+        """
         # Check if already parsed file exists
         result_file_path = Path(str(fpath) + ".parquet")
         tmp_result_file_path = Path(str(fpath) + ".parquet.tmp")
         
         #print(f"Result file path: {result_file_path}")
         if os.path.exists(result_file_path):
-            return pd.read_parquet(result_file_path), result_file_path
+            mode = self._cached_result_mode(fpath)
+            if mode == "append":
+                _, result_file_path = self.parse_logs_incremental(fpath)
+                return self._load_result(result_file_path, load_result)
+            if mode == "cached":
+                return self._load_result(result_file_path, load_result)
+            # prefix changed: fall through to a full re-parse
+            print(f"Parsed prefix of {fpath} changed, re-parsing the whole file")
+            os.remove(result_file_path)
+
+        if shards is not None:
+            results, result_file_path = self.parse_logs_sharded(fpath, shards=shards)
+            return (results, result_file_path) if load_result else (None, result_file_path)
+
+        if streaming is None:
+            try:
+                streaming = os.path.getsize(fpath) >= PATTERN_STREAM_MIN_FILE_SIZE
+            except OSError:
+                streaming = False
+
+        if streaming:
+            _, result_file_path = self.parse_logs_streaming(fpath)
+            return self._load_result(result_file_path, load_result)
 
-        self.log_df = self._read_logs(fpath)
+        self.log_df, offset = self._read_logs(fpath)
         if self.log_df.empty:
             return pd.DataFrame(), None
         
-        self.results = pd.DataFrame()
+        self.results = self._mine_templates(self.log_df)
+        sidecars = ResultSidecars()
+        table = sidecars.encode(self.results)
+        pq.write_table(table, str(tmp_result_file_path), row_group_size=PATTERN_ROW_GROUP_ROWS)
+        sidecars.save(result_file_path)
+        os.replace(str(tmp_result_file_path), str(result_file_path))
+        self._write_parse_state(fpath, offset, self.last_timestamp)
 
-        def extract_template_and_args(logline):
-            # Step 1: Get the template from the logline
-            """
-            dict returned by add_log_message():
-            {
-                "change_type": "cluster_created",
-                "cluster_id": 1,
-                "template_mined": "<DATETIME> <THREADID> error"
-            }
-            """
-            result = self.template_miner.add_log_message(logline)
-            
-            template = result["template_mined"]
-            # Step 2: Extract parameters from logline based on the template
-            params = self.template_miner.get_parameter_list(template, logline)
-   
-            return template, params
-
-        # Apply to DataFrame
-        self.log_df[["template", "parameter_list"]] = self.log_df["loglines"].apply(
-                lambda x: pd.Series(list(extract_template_and_args(x)))
-            )
+        try:
+            self.template_miner.save_state()
+        except Exception:
+            pass
         
-        self.results = self.log_df[['timestamp', 'loglines', 'template', 'parameter_list']].copy()
-        self.results.to_parquet(tmp_result_file_path, index=False)
+        return (self.results if load_result else None), result_file_path
+
+    def _load_result(self, result_file_path, load_result=True):
+        if result_file_path is None:
+            return pd.DataFrame(), None
+        if not load_result:
+            return None, result_file_path
+        return read_result(result_file_path), result_file_path
+
+    def parse_logs_streaming(self, fpath, chunk_lines=PATTERN_STREAM_CHUNK_LINES):
+        """
+        Bounded-memory variant of parse_logs.
+        A first pass finds base_time, the earliest timestamp in the whole file, as a
+        single-pass parse picks it. The second pass reads chunk_lines lines at a time,
+        parses timestamps and mines templates per chunk and appends each chunk as a row
+        group with a pyarrow ParquetWriter.
+        Ordering: rows are sorted by timestamp within a chunk only; chunks follow each
+        other in file order, so the result is not globally sorted when timestamps go back
+        in time across a chunk boundary.
+        Returns (None, result_file_path) so the caller can load only the columns it needs.
+        """
+        result_file_path = Path(str(fpath) + ".parquet")
+        tmp_result_file_path = Path(str(fpath) + ".parquet.tmp")
+        if os.path.exists(result_file_path):
+            return None, result_file_path
+
+        size = os.path.getsize(fpath)
+        start = time.perf_counter()
+        writer = pq.ParquetWriter(str(tmp_result_file_path), RESULT_SCHEMA)
+        sidecars = ResultSidecars()
+        try:
+            with open(fpath, "rb") as fin:
+                base_time = self._scan_base_time(fin, size, chunk_lines)
+                fin.seek(0)
+                total_rows, prev_timestamp, offset = self._write_chunks(
+                    fin, writer, sidecars, chunk_lines, size, base_time=base_time,
+                )
+        except Exception as e:
+            print("Streaming parse failed. Exception {} filename {}".format(e, fpath))
+            writer.close()
+            if os.path.exists(tmp_result_file_path):
+                os.remove(tmp_result_file_path)
+            return pd.DataFrame(), None
+
+        writer.close()
+        if not total_rows:
+            os.remove(tmp_result_file_path)
+            return pd.DataFrame(), None
+
+        sidecars.save(result_file_path)
         os.replace(str(tmp_result_file_path), str(result_file_path))
+        self._write_parse_state(fpath, offset, prev_timestamp)
+        end = time.perf_counter()
+        print(f"Streamed {total_rows} lines in {end - start:.4f} seconds")
 
         try:
             self.template_miner.save_state()
         except Exception:
             pass
-        
+
+        return None, result_file_path
+
+    def parse_logs_incremental(self, fpath, chunk_lines=PATTERN_STREAM_CHUNK_LINES):
+        """
+        Parse only the bytes appended to fpath since the cached parse.
+        The tail is mined against the persisted drain3_state.json and written as new
+        row group(s) after the existing ones; base time and last timestamp come from the
+        parse state so hostapd uptimes and continuation lines line up with the prefix.
+        Returns (None, result_file_path).
+        """
+        result_file_path = Path(str(fpath) + ".parquet")
+        tmp_result_file_path = Path(str(fpath) + ".parquet.tmp")
+        state = read_parse_state(fpath)
+        start_offset = int(state["offset"])
+        end_offset = os.path.getsize(fpath)
+
+        base_time = pd.Timestamp(state["base_time"]) if state.get("base_time") else None
+        prev_timestamp = pd.Timestamp(state["last_timestamp"]) if state.get("last_timestamp") else None
+
+        start = time.perf_counter()
+        existing = pq.ParquetFile(str(result_file_path))
+        writer = pq.ParquetWriter(str(tmp_result_file_path), RESULT_SCHEMA)
+        sidecars = ResultSidecars.for_append(result_file_path)
+        try:
+            # parquet files are immutable: copy the old row groups one to one, then append the tail
+            for i in range(existing.num_row_groups):
+                writer.write_table(existing.read_row_group(i), row_group_size=existing.metadata.row_group(i).num_rows)
+            with open(fpath, "rb") as fin:
+                fin.seek(start_offset)
+                total_rows, prev_timestamp, read_bytes = self._write_chunks(
+                    fin, writer, sidecars, chunk_lines, end_offset - start_offset,
+                    base_time=base_time, prev_timestamp=prev_timestamp,
+                )
+        except Exception as e:
+            print("Incremental parse failed. Exception {} filename {}".format(e, fpath))
+            writer.close()
+            if os.path.exists(tmp_result_file_path):
+                os.remove(tmp_result_file_path)
+            return None, result_file_path
+
+        writer.close()
+        # ids and row groups are only ever appended, so the new sidecars are valid for the old result too
+        sidecars.save(result_file_path)
+        os.replace(str(tmp_result_file_path), str(result_file_path))
+        self._write_parse_state(fpath, start_offset + read_bytes, prev_timestamp)
+        end = time.perf_counter()
+        print(f"Appended {total_rows} lines in {end - start:.4f} seconds")
+
+        try:
+            self.template_miner.save_state()
+        except Exception:
+            pass
+
+        return None, result_file_path
+
+    def _scan_base_time(self, fin, max_bytes, chunk_lines):
+        """Earliest timestamp (hostapd uptimes aside) in the first max_bytes of the binary file fin."""
+        base_time = None
+        read_bytes = 0
+        while read_bytes < max_bytes:
+            raw_lines = list(islice(fin, chunk_lines))
+            if not raw_lines:
+                break
+            read_bytes += sum(len(line) for line in raw_lines)
+            matches = [self.preprocess_regex.match(line) for line in _decode_lines(raw_lines)]
+            del raw_lines
+            raw_timestamp = pd.Series([m.group("timestamp") if m else None for m in matches], dtype=object)
+            known = self._parse_real_timestamps(raw_timestamp)[0].dropna()
+            if not known.empty and (base_time is None or known.min() < base_time):
+                base_time = known.min()
+        return base_time if base_time is not None else datetime.now()
+
+    def _write_chunks(self, fin, writer, sidecars, chunk_lines, max_bytes, base_time=None, prev_timestamp=None):
+        """
+        Read the binary file fin chunk_lines lines at a time (stopping after max_bytes),
+        parse, mine and write each chunk to writer, encoding it through sidecars.
+        Returns (rows written, timestamp of the last line read, bytes read).
+        """
+        total_rows = 0
+        read_bytes = 0
+        position = fin.tell()
+        while read_bytes < max_bytes:
+            raw_lines = list(islice(fin, chunk_lines))
+            if not raw_lines:
+                break
+            lines = _decode_lines(raw_lines)
+            offsets = _line_offsets(raw_lines, position + read_bytes)
+            read_bytes += sum(len(line) for line in raw_lines)
+            del raw_lines
+
+            chunk_df = self._logs_to_dataframe(lines, base_time=base_time, prev_timestamp=prev_timestamp, offsets=offsets)
+            del lines, offsets
+            # continuation lines of the next chunk follow the last line in file order
+            prev_timestamp = self.last_timestamp
+            if chunk_df.empty:
+                continue
+
+            # keep one base time so hostapd uptimes stay on one clock
+            base_time = self.base_time
+
+            chunk_df = self._mine_templates(chunk_df)
+            table = sidecars.encode(chunk_df)
+            writer.write_table(table, row_group_size=PATTERN_ROW_GROUP_ROWS)
+            total_rows += len(chunk_df)
+            del chunk_df, table
+        return total_rows, prev_timestamp, read_bytes
+
+    def _cached_result_mode(self, fpath):
+        """
+        Decide what to do with an existing <file>.parquet:
+        "cached" - up to date (or written before parse state was recorded),
+        "append" - file grew and the parsed prefix is unchanged,
+        "reparse" - file shrank or the parsed prefix changed.
+        """
+        state = read_parse_state(fpath)
+        if not state:
+            return "cached"
+        try:
+            size = os.path.getsize(fpath)
+        except OSError:
+            return "cached"
+        offset = int(state.get("offset", 0))
+        if size == offset:
+            return "cached"
+        if size < offset or prefix_fingerprint(fpath, offset) != state.get("fingerprint"):
+            return "reparse"
+        if self.template_miner.persistence_handler is None:
+            # tail has to be mined against the same Drain3 state as the prefix
+            return "reparse"
+        if result_format_version(Path(str(fpath) + ".parquet")) < 2:
+            # v1 results are not appended to; upgrade them with a full parse
+            return "reparse"
+        return "append"
+
+    def _write_parse_state(self, fpath, offset, last_timestamp):
+        """
+        offset is the number of bytes of fpath parsed, last_timestamp the timestamp of the
+        last line read (in file order), which untimed lines of an appended tail continue.
+        """
+        state = {
+            "offset": int(offset),
+            "fingerprint": prefix_fingerprint(fpath, offset),
+            "base_time": str(self.base_time) if self.base_time is not None else None,
+            "last_timestamp": str(last_timestamp) if last_timestamp is not None and not pd.isna(last_timestamp) else None,
+        }
+        path = parse_state_path(fpath)
+        tmp = Path(str(path) + ".tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(str(tmp), str(path))
+
+    def parse_logs_sharded(self, fpath, shards=PATTERN_SHARDS):
+        """
+        Mine one large file on several cores.
+        The file is split into line ranges; each shard process extracts timestamps,
+        masks its lines and reduces them to distinct masked messages. The union of those
+        messages is mined here through a single Drain3 pass in sorted order, which gives
+        one canonical template set, and the shards then re-label their lines with it and
+        extract parameters. Drain3 is order dependent, so mining in canonical order is what
+        keeps the output identical for any number of shards.
+        """
+        result_file_path = Path(str(fpath) + ".parquet")
+        tmp_result_file_path = Path(str(fpath) + ".parquet.tmp")
+        if os.path.exists(result_file_path):
+            return read_result(result_file_path), result_file_path
+
+        offset = os.path.getsize(fpath)
+        ranges = _shard_ranges(fpath, max(1, int(shards)))
+        if not ranges:
+            return pd.DataFrame(), None
+
+        shard_dir = Path(str(fpath) + ".shards")
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        part_paths = [str(shard_dir / f"part-{i}.parquet") for i in range(len(ranges))]
+        labelled_paths = [str(shard_dir / f"labelled-{i}.parquet") for i in range(len(ranges))]
+
+        start = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                prepared = list(pool.map(
+                    _prepare_shard_worker,
+                    [str(fpath)] * len(ranges),
+                    [r[0] for r in ranges],
+                    [r[1] for r in ranges],
+                    part_paths,
+                ))
+
+                counts = {}
+                for shard in prepared:
+                    for masked, count in shard["counts"].items():
+                        counts[masked] = counts.get(masked, 0) + count
+                templates = self._mine_canonical(counts)
+                del counts
+
+                base_time, year = _merge_shard_time_bounds(prepared)
+                self.base_time = base_time
+
+                list(pool.map(
+                    _label_shard_worker,
+                    part_paths,
+                    [templates] * len(ranges),
+                    [base_time] * len(ranges),
+                    [year] * len(ranges),
+                    labelled_paths,
+                ))
+            del templates
+
+            df = pd.concat([pd.read_parquet(p) for p in labelled_paths], ignore_index=True)
+        except Exception as e:
+            print("Sharded parse failed. Exception {} filename {}".format(e, fpath))
+            return pd.DataFrame(), None
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+        # continuation lines inherit the previous timestamp, across shard boundaries too
+        df["timestamp"] = df["timestamp"].ffill()
+        known = df["timestamp"].dropna()
+        self.last_timestamp = known.iloc[-1] if not known.empty else None
+        df = df[df["template"].notna()]
+        # stable sort keeps file order for equal timestamps
+        df = df.sort_values("timestamp", na_position="last", kind="stable").reset_index(drop=True)
+        if df.empty:
+            return pd.DataFrame(), None
+
+        self.results = df[['timestamp', 'loglines', 'template', 'parameter_list', 'offset']].copy()
+        sidecars = ResultSidecars()
+        table = sidecars.encode(self.results)
+        pq.write_table(table, str(tmp_result_file_path), row_group_size=PATTERN_ROW_GROUP_ROWS)
+        sidecars.save(result_file_path)
+        os.replace(str(tmp_result_file_path), str(result_file_path))
+        self._write_parse_state(fpath, offset, self.last_timestamp)
+        end = time.perf_counter()
+        print(f"Sharded parse of {len(df)} lines over {len(ranges)} shards in {end - start:.4f} seconds")
+
+        try:
+            self.template_miner.save_state()
+        except Exception:
+            pass
+
         return self.results, result_file_path
-    
+
+    def _mine_canonical(self, counts):
+        """
+        Feed distinct masked messages to Drain3 in sorted order and return a
+        masked message -> final template mapping.
+        """
+        drain = self.template_miner.drain
+        cluster_ids = {}
+        mined_templates = {}
+        for masked in sorted(counts):
+            cluster, _ = drain.add_log_message(masked)
+            # account for every occurrence, not just the distinct message
+            cluster.size += counts[masked] - 1
+            cluster_ids[masked] = cluster.cluster_id
+            mined_templates[masked] = cluster.get_template()
+
+        final_templates = {}
+        for cluster_id in set(cluster_ids.values()):
+            cluster = drain.id_to_cluster.get(cluster_id)
+            final_templates[cluster_id] = cluster.get_template() if cluster is not None else None
+
+        return {
+            masked: final_templates[cluster_id] or mined_templates[masked]
+            for masked, cluster_id in cluster_ids.items()
+        }
+
+    def _mine_templates(self, log_df):
+        """Run every logline through Drain3 and return the result columns (and offset, if read)."""
+        templates, parameter_lists = self.mine_templates_batch(log_df["loglines"].tolist())
+        log_df["template"] = templates
+        log_df["parameter_list"] = parameter_lists
+        columns = ['timestamp', 'loglines', 'template', 'parameter_list']
+        if "offset" in log_df:
+            columns.append("offset")
+        return log_df[columns].copy()
+
+    def mine_templates_batch(self, loglines):
+        """
+        Batch Drain3 mining.
+        All lines are added to the miner first, then grouped by the template of their
+        final cluster; one parameter-extraction regex is compiled per template and reused
+        for every member. Returns (templates, parameter_lists) aligned with loglines.
+        """
+        add_log_message = self.template_miner.add_log_message
+        cluster_ids = []
+        mined_templates = []
+        for logline in loglines:
+            result = add_log_message(logline)
+            cluster_ids.append(result["cluster_id"])
+            mined_templates.append(result["template_mined"])
+
+        # final template per cluster; evicted clusters (max_clusters) keep the mined one
+        id_to_cluster = self.template_miner.drain.id_to_cluster
+        final_templates = {}
+        for cluster_id in set(cluster_ids):
+            cluster = id_to_cluster.get(cluster_id)
+            final_templates[cluster_id] = cluster.get_template() if cluster is not None else None
+        templates = [
+            final_templates[cluster_id] or mined
+            for cluster_id, mined in zip(cluster_ids, mined_templates)
+        ]
+
+        return templates, self.extract_parameters_batch(loglines, templates)
+
+    def extract_parameters_batch(self, loglines, templates):
+        """
+        Parameter lists for loglines given their templates, compiling one extraction
+        regex per distinct template. Rows without a template get None.
+        """
+        # same delimiter substitution get_parameter_list does, once for the whole batch
+        messages = pd.Series(loglines, dtype=object)
+        for delimiter in self.template_miner.config.drain_extra_delimiters:
+            messages = messages.str.replace(delimiter, " ", regex=True)
+        messages = messages.tolist()
+
+        members = {}
+        for row, template in enumerate(templates):
+            if isinstance(template, str):
+                members.setdefault(template, []).append(row)
+
+        parameter_lists = [None] * len(templates)
+        for template, rows in members.items():
+            extract = self._parameter_extractor(template)
+            for row in rows:
+                parameter_lists[row] = extract(messages[row])
+
+        return parameter_lists
+
+    def _parameter_extractor(self, template):
+        """
+        Compile the Drain3 parameter-extraction regex for template once and return a
+        callable giving the same result as template_miner.get_parameter_list.
+        """
+        template_regex, group_to_mask = self.template_miner._get_template_parameter_extraction_regex(template, False)
+        compiled = re.compile(template_regex)
+        # drain3 also names groups for masks that were never substituted; skip those
+        group_index = sorted(
+            index for name, index in compiled.groupindex.items() if name in group_to_mask
+        )
+
+        def extract(message):
+            match = compiled.match(message)
+            if not match:
+                return []
+            return [match.group(i) for i in group_index]
+
+        return extract
+
     def _read_logs(self, fpath):
+        """(log DataFrame, bytes read)"""
         logdf = pd.DataFrame()
+        offset = 0
         try:
-            with open(fpath, "r", encoding='utf-8', errors='ignore') as fin:
-                lines = fin.readlines()
+            with open(fpath, "rb") as fin:
+                raw = fin.read()
+                offset = len(raw)
+                lines = _decode_lines([raw])
+                offsets = _line_offsets([raw])
+                del raw
                 start = time.perf_counter()
-                logdf = self._logs_to_dataframe(lines)
+                logdf = self._logs_to_dataframe(lines, offsets=offsets)
                 end = time.perf_counter()
                 print(f"Execution time: {end - start:.4f} seconds")
         except Exception as e:
             print("Read log file failed. Exception {} filename {}".format(e, fpath))
         #print(logdf)
-        return logdf
+        return logdf, offset
 
 
-    def _logs_to_dataframe(self, log_lines):
+    def _logs_to_dataframe(self, log_lines, base_time=None, prev_timestamp=None, offsets=None):
+        """
+        base_time / prev_timestamp carry state between chunks in streaming mode:
+        base_time anchors hostapd uptimes, prev_timestamp fills leading untimed lines.
+        offsets, the byte offsets of log_lines in the file, are kept as an "offset" column.
+        """
         if not log_lines:
             return pd.DataFrame()
 
@@ -118,106 +710,111 @@ class Pattern:
             for log, m in zip(log_lines, matches)
         ]
         df = pd.DataFrame(data, columns=["raw_timestamp", "loglines"])
+        if offsets is not None:
+            df["offset"] = offsets
 
-        # Step 2: Parse timestamps robustly (does NOT touch hostapd float uptimes)
-        def try_parse(ts):
-            if pd.isna(ts) or not isinstance(ts, str) or not ts.strip():
-                return pd.NaT
-
-            ts = ts.strip()
-
-            # Skip pure uptime floats here; convert later using base_time
-            if re.match(r"^\d+\.\d+$", ts):
-                return pd.NaT
-
-            # YYYY-MM-DD-HH-MM-SS fallback
-            if re.match(r"^\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}$", ts):
-                try:
-                    return datetime.strptime(ts, "%Y-%m-%d-%H-%M-%S")
-                except Exception:
-                    return pd.NaT
-
-            # short ISO like 230102-12:34:56.123 -> parse manually
-            if re.match(r"^\d{6}-\d{2}:\d{2}:\d{2}\.\d+", ts):
-                try:
-                    # take YYMMDD-HH:MM:SS (first 15 chars)
-                    return datetime.strptime(ts[:15], "%y%m%d-%H:%M:%S")
-                except Exception:
-                    pass
-
-            # syslog style (e.g. "Sep  3 00:28:37") - dateparser will default year=1900
-            if re.match(r"^[A-Z][a-z]{2}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}$", ts):
-                dt = dateparser.parse(ts)
-                if dt:
-                    # Inject current year later (use base_time year)
-                    return dt
-
-            # fallback to dateparser for everything else
-            dt = dateparser.parse(ts)
-            if dt is None:
-                return pd.NaT
-
-            # If aware, normalize to UTC-naive
-            if dt.tzinfo is not None:
-                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-
-            return dt
-
-        df["timestamp"] = df["raw_timestamp"].apply(try_parse)
+        # Step 2-4: Classify and parse timestamps in bulk (hostapd uptimes use base_time)
+        df["timestamp"], base_time = self._parse_timestamps(df["raw_timestamp"], base_time)
+        self.base_time = base_time
 
         # Quick diagnostic
         parsed_count = df["timestamp"].notna().sum()
         print(f"Parsed timestamps: {parsed_count}/{len(df)}")
 
-        # Step 3: Determine base_time using only parsed timestamps (no forward-fill yet)
-        real_times = df["timestamp"].dropna()
-        if not real_times.empty:
-            # use min parsed time as base
-            base_time = real_times.min()
-        else:
-            base_time = datetime.now()
-        #print(f"Base time for hostapd timestamps: {base_time}")
-
-        # Step 4: Convert hostapd uptime floats (raw_timestamp matches float pattern)
-        def convert_hostapd_value(ts, base):
-            try:
-                if isinstance(ts, str) and re.match(r"^\d+\.\d+$", ts):
-                    return base + timedelta(seconds=float(ts))
-            except Exception:
-                pass
-            return pd.NaT
-
-        hostapd_mask = df["timestamp"].isna() & df["raw_timestamp"].notna() & df["raw_timestamp"].astype(str).str.match(r"^\d+\.\d+$")
-        if hostapd_mask.any():
-            df.loc[hostapd_mask, "timestamp"] = df.loc[hostapd_mask, "raw_timestamp"].apply(lambda x: convert_hostapd_value(x, base_time))
-
         # Step 5: Forward-fill timestamps for continuation / non-timestamped lines
         # Naive forward-fill example (may over-fill in some cases):
         df["timestamp"] = df["timestamp"].ffill()
+        if prev_timestamp is not None:
+            # leading lines of a chunk continue the previous chunk's last entry
+            df["timestamp"] = df["timestamp"].fillna(prev_timestamp)
 
-        # Step 6: Syslog-style year injection (only operate where timestamp exists and year==1900)
-        try:
-            syslog_mask = df["timestamp"].notna() & (df["timestamp"].dt.year == 1900)
-            if syslog_mask.any():
-                current_year = base_time.year
-                df.loc[syslog_mask, "timestamp"] = df.loc[syslog_mask, "timestamp"].apply(lambda dt: dt.replace(year=current_year))
-        except Exception as e:
-            print("Syslog year injection failed:", e)
-
-        # Step 7: Final normalization: ensure dtype is datetime64[ns] and tz-naive
+        # Step 6: Final normalization: ensure dtype is datetime64[ns] and tz-naive
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce").dt.tz_localize(None)
+        # timestamp of the last line in file order, before sorting
+        known = df["timestamp"].dropna()
+        self.last_timestamp = known.iloc[-1] if not known.empty else prev_timestamp
 
-        # Step 8: Sort (NaT will be placed last)
+        # Step 7: Sort (NaT will be placed last)
         df = df.sort_values("timestamp", na_position="last").reset_index(drop=True)
 
         remaining_nat = df["timestamp"].isna().sum()
         if remaining_nat:
             print(f"Remaining NaT timestamps after processing: {remaining_nat}")
 
-        # Step 9: Cleanup loglines (strip, remove empty lines)
+        # Step 8: Cleanup loglines (strip, remove empty lines)
         df = self.cleanup_loglines(df)
         return df
 
+    def _parse_timestamps(self, raw_timestamp, base_time=None, year=None):
+        """
+        Vectorized replacement for the old per-row try_parse, with the same results.
+        One str.extract pass classifies every raw timestamp into a preprocess_regex
+        alternative, then each class is converted with a single pd.to_datetime(format=...).
+        Syslog timestamps (e.g. "Sep  3 00:28:37") get the current year, as dateutil gave
+        them; year overrides it. Unless given, base_time is the earliest of all other
+        timestamps, syslog ones included, and hostapd uptimes are offsets from it.
+        Returns (timestamp series, base_time).
+        """
+        timestamps, classes = self._parse_real_timestamps(raw_timestamp, year)
+
+        # Determine base_time using only parsed timestamps
+        if base_time is None:
+            real_times = timestamps.dropna()
+            if not real_times.empty:
+                # use min parsed time as base
+                base_time = real_times.min()
+            else:
+                base_time = datetime.now()
+
+        # Convert hostapd uptime floats (e.g. 175383.097855) relative to base_time
+        uptime = pd.to_numeric(classes["uptime"].dropna(), errors="coerce").dropna()
+        if not uptime.empty:
+            micros = _uptime_microseconds(uptime.to_numpy(dtype="float64"))
+            timestamps.loc[uptime.index] = pd.Timestamp(base_time) + pd.to_timedelta(micros, unit="us")
+
+        return timestamps, base_time
+
+    def _parse_real_timestamps(self, raw_timestamp, year=None):
+        """Every timestamp but hostapd uptimes, and the str.extract classes of raw_timestamp."""
+        classes = raw_timestamp.str.extract(TIMESTAMP_CLASSES_REGEX)
+        timestamps = self._parse_dated_timestamps(raw_timestamp, classes)
+        syslog = classes["syslog"].dropna()
+        if not syslog.empty:
+            year = year if year is not None else datetime.now().year
+            timestamps.loc[syslog.index] = self._parse_syslog_timestamps(syslog, year)
+        return timestamps, classes
+
+    def _parse_dated_timestamps(self, raw_timestamp, classes):
+        """Parse every timestamp class that carries its own date (no syslog, no uptime)."""
+        timestamps = pd.Series(pd.NaT, index=raw_timestamp.index, dtype="datetime64[ns]")
+
+        for name, fmt in TIMESTAMP_FORMATS.items():
+            values = classes[name].dropna()
+            if not values.empty:
+                timestamps.loc[values.index] = pd.to_datetime(values, format=fmt, errors="coerce")
+
+        # anything the classifier did not recognise falls back to dateparser (rare)
+        unknown = raw_timestamp.notna() & classes.isna().all(axis=1)
+        if unknown.any():
+            def fallback_parse(ts):
+                try:
+                    dt = dateparser.parse(ts)
+                except Exception:
+                    return pd.NaT
+                if dt is None:
+                    return pd.NaT
+                # If aware, normalize to UTC-naive
+                if dt.tzinfo is not None:
+                    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+                return dt
+            timestamps.loc[unknown] = pd.to_datetime(raw_timestamp[unknown].apply(fallback_parse), errors="coerce")
+
+        return timestamps
+
+    def _parse_syslog_timestamps(self, syslog, year):
+        normalized = str(year) + " " + syslog.str.replace(r"\s+", " ", regex=True)
+        return pd.to_datetime(normalized, format="%Y %b %d %H:%M:%S", errors="coerce")
+
     def cleanup_loglines(self, df):
         df["loglines"] = df["loglines"].astype(str).str.strip()
         df = df[df["loglines"].ne("")]   # keep non-empty rows only
@@ -246,3 +843,96 @@ class Pattern:
         except Exception:
             return None
 
+
+# ---------------------
+# Sharded mining workers (top-level so ProcessPoolExecutor can pickle them)
+# ---------------------
+def _shard_ranges(fpath, shards):
+    """Split fpath into at most `shards` byte ranges that start on line boundaries."""
+    size = os.path.getsize(fpath)
+    if not size:
+        return []
+    offsets = [0]
+    with open(fpath, "rb") as f:
+        for i in range(1, shards):
+            f.seek(max(size * i // shards, offsets[-1]))
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > offsets[-1]:
+                offsets.append(pos)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def _prepare_shard_worker(fpath, start, end, part_path):
+    """
+    Phase 1: split timestamps, mask loglines and count distinct masked messages.
+    Keeps the shard on disk at part_path for phase 2.
+    """
+    parser = Pattern()
+    with open(fpath, "rb") as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    # same line splitting as the single-process paths, lone CRs included
+    lines = _decode_lines([raw])
+    offsets = _line_offsets([raw], start)
+    del raw
+
+    matches = [parser.preprocess_regex.match(log) for log in lines]
+    data = [
+        (m.group("timestamp"), m.group("loglines")) if m else (None, log)
+        for log, m in zip(lines, matches)
+    ]
+    del lines, matches
+    df = pd.DataFrame(data, columns=["raw_timestamp", "loglines"])
+    df["offset"] = offsets
+    del data, offsets
+
+    df["loglines"] = df["loglines"].astype(str).str.strip()
+    keep = df["loglines"].ne("") & df["loglines"].ne("\\n")
+    mask = parser.template_miner.masker.mask
+    df["masked"] = [mask(line) if k else None for line, k in zip(df["loglines"], keep)]
+    counts = df.loc[keep, "masked"].value_counts().to_dict()
+
+    # time bounds needed to pick one base_time for the whole file
+    classes = df["raw_timestamp"].str.extract(TIMESTAMP_CLASSES_REGEX)
+    dated = parser._parse_dated_timestamps(df["raw_timestamp"], classes).dropna()
+    syslog = classes["syslog"].dropna()
+    # leap year so "Feb 29" survives until the real year is known
+    syslog = parser._parse_syslog_timestamps(syslog, 2000).dropna() if not syslog.empty else syslog
+
+    df.to_parquet(part_path, index=False)
+    return {
+        "counts": counts,
+        "dated_min": dated.min() if not dated.empty else None,
+        "syslog_min": syslog.min() if not syslog.empty else None,
+    }
+
+def _merge_shard_time_bounds(prepared):
+    """Global (base_time, syslog year) from the per-shard bounds, as a single pass would pick."""
+    dated = [p["dated_min"] for p in prepared if p["dated_min"] is not None]
+    syslog = [p["syslog_min"] for p in prepared if p["syslog_min"] is not None]
+    # syslog timestamps get the current year, as in a single pass
+    year = datetime.now().year
+
+    candidates = list(dated)
+    if syslog:
+        first = min(syslog)
+        try:
+            candidates.append(first.replace(year=year))
+        except ValueError:
+            # Feb 29 in a non-leap year
+            pass
+    base_time = min(candidates) if candidates else datetime.now()
+    return base_time, year
+
+def _label_shard_worker(part_path, templates, base_time, year, out_path):
+    """Phase 2: parse timestamps, attach canonical templates and extract parameters."""
+    parser = Pattern()
+    df = pd.read_parquet(part_path)
+    df["timestamp"], _ = parser._parse_timestamps(df["raw_timestamp"], base_time=base_time, year=year)
+    df["template"] = df["masked"].map(templates)
+    df["parameter_list"] = parser.extract_parameters_batch(df["loglines"].tolist(), df["template"].tolist())
+    df[["timestamp", "loglines", "template", "parameter_list", "offset"]].to_parquet(out_path, index=False)
+    return out_path
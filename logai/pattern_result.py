@@ -0,0 +1,506 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import List, Optional
+
+from logai.result_cache import result_cache
+from logai.utils.constants import PATTERN_ROW_GROUP_ROWS
+
+"""
+Parsed result format written by Pattern.parse_logs.
+
+v1 (older files): <file>.parquet with timestamp, loglines, template, parameter_list
+                  - the full template text repeated on every row.
+v2:               <file>.parquet with timestamp, loglines, template_id, parameter_list
+                  plus <file>.templates.parquet holding one row per template:
+                  template_id, template, count, first_timestamp, last_timestamp,
+                  and <file>.rowindex.parquet locating every template's rows:
+                  template_id, row_group, rows (positions inside that row group),
+                  offsets (byte offset of each of those rows' line in the log file),
+                  and <file>.rollups.parquet with per-template occurrence counts:
+                  freq (one of ROLLUP_FREQS), template_id, bucket, count.
+
+Readers in this module accept both versions; v2 files are filtered on template_id.
+Unfiltered reads go through the process-wide result_cache, so returned frames are
+shared and must not be modified in place.
+"""
+
+RESULT_FORMAT_VERSION = 2
+
+# Schema of the <file>.parquet result, fixed so chunks can be appended
+RESULT_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("ns")),
+    ("loglines", pa.string()),
+    ("template_id", pa.int32()),
+    ("parameter_list", pa.list_(pa.string())),
+])
+
+TEMPLATES_SCHEMA = pa.schema([
+    ("template_id", pa.int32()),
+    ("template", pa.string()),
+    ("count", pa.int64()),
+    ("first_timestamp", pa.timestamp("ns")),
+    ("last_timestamp", pa.timestamp("ns")),
+])
+
+TEMPLATES_COLUMNS = [field.name for field in TEMPLATES_SCHEMA]
+
+ROLLUPS_SCHEMA = pa.schema([
+    ("freq", pa.string()),
+    ("template_id", pa.int32()),
+    ("bucket", pa.timestamp("ns")),
+    ("count", pa.int64()),
+])
+
+# Granularities of the time-series rollups, with their bucket width in ns
+ROLLUP_FREQS = {
+    "1s": 10**9,
+    "1min": 60 * 10**9,
+    "1h": 3600 * 10**9,
+    "1d": 86400 * 10**9,
+}
+
+ROW_INDEX_SCHEMA = pa.schema([
+    ("template_id", pa.int32()),
+    ("row_group", pa.int32()),
+    ("rows", pa.list_(pa.int32())),
+    ("offsets", pa.list_(pa.int64())),
+])
+
+
+# ---------- Paths / version ----------
+def templates_path(result_file_path) -> Path:
+    """<file>.parquet -> <file>.templates.parquet"""
+    result_file_path = str(result_file_path)
+    if result_file_path.endswith(".parquet"):
+        result_file_path = result_file_path[:-len(".parquet")]
+    return Path(result_file_path + ".templates.parquet")
+
+def row_index_path(result_file_path) -> Path:
+    """<file>.parquet -> <file>.rowindex.parquet"""
+    result_file_path = str(result_file_path)
+    if result_file_path.endswith(".parquet"):
+        result_file_path = result_file_path[:-len(".parquet")]
+    return Path(result_file_path + ".rowindex.parquet")
+
+def rollups_path(result_file_path) -> Path:
+    """<file>.parquet -> <file>.rollups.parquet"""
+    result_file_path = str(result_file_path)
+    if result_file_path.endswith(".parquet"):
+        result_file_path = result_file_path[:-len(".parquet")]
+    return Path(result_file_path + ".rollups.parquet")
+
+def result_format_version(result_file_path) -> int:
+    names = pq.read_schema(str(result_file_path)).names
+    return 2 if "template_id" in names else 1
+
+def row_index_has_offsets(result_file_path) -> bool:
+    """True if the row index of result_file_path records the log file offset of every row."""
+    path = row_index_path(result_file_path)
+    if not path.exists():
+        return False
+    pf = pq.ParquetFile(str(path))
+    columns = [pf.schema.column(i).path for i in range(len(pf.schema))]
+    if "offsets.list.element" not in columns:
+        return False
+    column = columns.index("offsets.list.element")
+    for i in range(pf.num_row_groups):
+        stats = pf.metadata.row_group(i).column(column).statistics
+        if stats is None or not stats.has_null_count or stats.null_count:
+            return False
+    return True
+
+
+# ---------- Writer side ----------
+class TemplateTable:
+    """
+    Dense template text <-> integer id mapping for one result file, with per-template
+    count and first/last timestamp. Ids are handed out in order of first appearance and
+    never change, so chunks and appended tails can be encoded incrementally.
+    """
+    def __init__(self, templates_df: Optional[pd.DataFrame] = None):
+        self.ids = {}
+        self.rows = []
+        if templates_df is not None and not templates_df.empty:
+            for row in templates_df.sort_values("template_id").itertuples(index=False):
+                self.ids[row.template] = len(self.rows)
+                self.rows.append([row.template, int(row.count), row.first_timestamp, row.last_timestamp])
+
+    @classmethod
+    def load(cls, result_file_path) -> "TemplateTable":
+        path = templates_path(result_file_path)
+        if not path.exists():
+            return cls()
+        return cls(pd.read_parquet(path))
+
+    def encode(self, templates: pd.Series, timestamps: pd.Series) -> np.ndarray:
+        """Return template ids for templates and fold their counts/time range into the table."""
+        codes, uniques = pd.factorize(templates)
+        ids = np.empty(len(uniques), dtype=np.int32)
+        for code, template in enumerate(uniques):
+            template_id = self.ids.get(template)
+            if template_id is None:
+                template_id = len(self.rows)
+                self.ids[template] = template_id
+                self.rows.append([template, 0, pd.NaT, pd.NaT])
+            ids[code] = template_id
+
+        stats = (
+            pd.DataFrame({"code": codes, "timestamp": pd.to_datetime(timestamps).values})
+            .groupby("code")["timestamp"]
+            .agg(["size", "min", "max"])
+        )
+        for code, count, first, last in stats.itertuples():
+            row = self.rows[ids[code]]
+            row[1] += int(count)
+            if not pd.isna(first) and (pd.isna(row[2]) or first < row[2]):
+                row[2] = first
+            if not pd.isna(last) and (pd.isna(row[3]) or last > row[3]):
+                row[3] = last
+        return ids[codes]
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.rows, columns=TEMPLATES_COLUMNS[1:])
+        df.insert(0, "template_id", np.arange(len(self.rows), dtype=np.int32))
+        return df
+
+    def save(self, result_file_path) -> Path:
+        path = templates_path(result_file_path)
+        tmp = Path(str(path) + ".tmp")
+        table = pa.Table.from_pandas(self.to_frame(), schema=TEMPLATES_SCHEMA, preserve_index=False)
+        pq.write_table(table, str(tmp))
+        os.replace(str(tmp), str(path))
+        return path
+
+
+class TemplateRowIndex:
+    """
+    template_id -> (row group, positions in row group, log file byte offsets) for one
+    result file. Writers call add() with the template ids of every table they write, in
+    write order, using row_group_size=row_group_rows so row groups never span two add()
+    calls. Offsets are null for row groups indexed without them.
+    """
+    def __init__(self, row_group_rows: int = PATTERN_ROW_GROUP_ROWS, next_row_group: int = 0,
+                 entries: Optional[pd.DataFrame] = None):
+        self.row_group_rows = row_group_rows
+        self.next_row_group = next_row_group
+        self.frames = [entries] if entries is not None and not entries.empty else []
+
+    @classmethod
+    def for_append(cls, result_file_path, row_group_rows: int = PATTERN_ROW_GROUP_ROWS) -> "TemplateRowIndex":
+        """Index of an existing result, ready to index row groups appended after it."""
+        pf = pq.ParquetFile(str(result_file_path))
+        path = row_index_path(result_file_path)
+        if path.exists():
+            entries = pd.read_parquet(path)
+            if "offsets" not in entries:
+                entries["offsets"] = None
+            return cls(row_group_rows, pf.num_row_groups, entries)
+
+        # no sidecar yet: index the existing row groups from their template_id column
+        index = cls(row_group_rows)
+        for i in range(pf.num_row_groups):
+            ids = pf.read_row_group(i, columns=["template_id"]).column(0).to_numpy()
+            index._add_row_group(ids, i)
+        index.next_row_group = pf.num_row_groups
+        return index
+
+    def add(self, template_ids: np.ndarray, offsets: Optional[np.ndarray] = None):
+        template_ids = np.asarray(template_ids)
+        for start in range(0, len(template_ids), self.row_group_rows):
+            end = start + self.row_group_rows
+            self._add_row_group(template_ids[start:end], self.next_row_group,
+                                None if offsets is None else offsets[start:end])
+            self.next_row_group += 1
+
+    def _add_row_group(self, template_ids, row_group, offsets=None):
+        if not len(template_ids):
+            return
+        df = pd.DataFrame({
+            "template_id": template_ids,
+            "position": np.arange(len(template_ids), dtype=np.int32),
+        })
+        if offsets is None:
+            grouped = df.groupby("template_id", sort=True)["position"].agg(list).reset_index(name="rows")
+            grouped["offsets"] = None
+        else:
+            df["offset"] = np.asarray(offsets, dtype=np.int64)
+            grouped = df.groupby("template_id", sort=True).agg(rows=("position", list), offsets=("offset", list)).reset_index()
+        grouped.insert(1, "row_group", row_group)
+        self.frames.append(grouped)
+
+    def save(self, result_file_path) -> Path:
+        path = row_index_path(result_file_path)
+        tmp = Path(str(path) + ".tmp")
+        if self.frames:
+            df = pd.concat(self.frames, ignore_index=True).sort_values(["template_id", "row_group"], kind="stable")
+        else:
+            df = pd.DataFrame(columns=[field.name for field in ROW_INDEX_SCHEMA])
+        table = pa.Table.from_pandas(df, schema=ROW_INDEX_SCHEMA, preserve_index=False)
+        pq.write_table(table, str(tmp))
+        os.replace(str(tmp), str(path))
+        return path
+
+
+class TemplateRollups:
+    """
+    Per-template occurrence counts bucketed at every ROLLUP_FREQS granularity.
+    Counts are additive, so chunks and appended tails are folded in with a group-by sum
+    and buckets split across two chunks come out whole.
+    """
+    # merge pending chunk counts once this many frames have piled up
+    COMPACT_FRAMES = 64
+
+    def __init__(self, entries: Optional[pd.DataFrame] = None):
+        self.frames = [entries] if entries is not None and not entries.empty else []
+
+    @classmethod
+    def for_append(cls, result_file_path) -> "TemplateRollups":
+        """Rollups of an existing result, ready to fold an appended tail into."""
+        path = rollups_path(result_file_path)
+        if path.exists():
+            return cls(pd.read_parquet(path))
+
+        # no sidecar yet: count the existing rows
+        rollups = cls()
+        pf = pq.ParquetFile(str(result_file_path))
+        for i in range(pf.num_row_groups):
+            df = pf.read_row_group(i, columns=["template_id", "timestamp"]).to_pandas()
+            rollups.add(df["template_id"].to_numpy(), df["timestamp"])
+        return rollups
+
+    def add(self, template_ids: np.ndarray, timestamps: pd.Series):
+        ts = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype="datetime64[ns]")
+        valid = ~np.isnat(ts)
+        ids = np.asarray(template_ids)[valid]
+        ts = ts[valid].astype(np.int64)
+        if not len(ids):
+            return
+        for freq, step in ROLLUP_FREQS.items():
+            df = pd.DataFrame({"template_id": ids, "bucket": (ts - ts % step).view("datetime64[ns]")})
+            counts = df.groupby(["template_id", "bucket"], sort=False).size().reset_index(name="count")
+            counts.insert(0, "freq", freq)
+            self.frames.append(counts)
+        if len(self.frames) > self.COMPACT_FRAMES:
+            self._compact()
+
+    def _compact(self):
+        if len(self.frames) < 2:
+            return
+        df = pd.concat(self.frames, ignore_index=True)
+        self.frames = [df.groupby(["freq", "template_id", "bucket"], sort=False)["count"].sum().reset_index()]
+
+    def save(self, result_file_path) -> Path:
+        path = rollups_path(result_file_path)
+        tmp = Path(str(path) + ".tmp")
+        self._compact()
+        if self.frames:
+            df = self.frames[0]
+            # freq-major order keeps each (freq, template) series contiguous for filtered reads
+            level = df["freq"].map({freq: i for i, freq in enumerate(ROLLUP_FREQS)})
+            df = df.assign(level=level).sort_values(["level", "template_id", "bucket"]).drop(columns="level")
+        else:
+            df = pd.DataFrame(columns=[field.name for field in ROLLUPS_SCHEMA])
+        table = pa.Table.from_pandas(df, schema=ROLLUPS_SCHEMA, preserve_index=False)
+        pq.write_table(table, str(tmp))
+        os.replace(str(tmp), str(path))
+        return path
+
+
+# ---------- Reader side ----------
+def load_templates(result_file_path) -> pd.DataFrame:
+    """
+    One row per template: template_id, template, count, first_timestamp, last_timestamp.
+    For v1 files the table is computed from the result (ids follow first appearance).
+    """
+    if not result_file_path or not os.path.exists(result_file_path):
+        return pd.DataFrame(columns=TEMPLATES_COLUMNS)
+    return result_cache.get(result_file_path, lambda: _load_templates(result_file_path), variant="templates")
+
+def _load_templates(result_file_path) -> pd.DataFrame:
+    if result_format_version(result_file_path) >= 2:
+        path = templates_path(result_file_path)
+        if path.exists():
+            return pd.read_parquet(path)
+        return pd.DataFrame(columns=TEMPLATES_COLUMNS)
+
+    df = pd.read_parquet(result_file_path, columns=["timestamp", "template"])
+    table = TemplateTable()
+    table.encode(df["template"], df["timestamp"])
+    return table.to_frame()
+
+def template_id(result_file_path, template) -> Optional[int]:
+    templates = load_templates(result_file_path)
+    match = templates.loc[templates["template"] == template, "template_id"]
+    return int(match.iloc[0]) if not match.empty else None
+
+def read_result(result_file_path, columns: Optional[List[str]] = None, filters=None) -> pd.DataFrame:
+    """
+    Read a parsed result in the v1 column layout (with a "template" text column) from
+    either format. columns/filters are passed to pyarrow, so unrequested columns are
+    never decoded.
+    """
+    if not result_file_path or not os.path.exists(result_file_path):
+        return pd.DataFrame()
+    if filters is not None:
+        return _read_result(result_file_path, columns, filters)
+    return result_cache.get(result_file_path, lambda: _read_result(result_file_path, columns), columns=columns)
+
+def _read_result(result_file_path, columns=None, filters=None) -> pd.DataFrame:
+    if result_format_version(result_file_path) < 2:
+        return pd.read_parquet(result_file_path, columns=columns, filters=filters)
+
+    want_template = columns is None or "template" in columns
+    read_columns = columns
+    if columns is not None:
+        read_columns = [c for c in columns if c != "template"]
+        if want_template and "template_id" not in read_columns:
+            read_columns.append("template_id")
+
+    df = pd.read_parquet(result_file_path, columns=read_columns, filters=filters)
+    return _add_template_text(result_file_path, df, columns) if want_template else df
+
+def _add_template_text(result_file_path, df, columns=None) -> pd.DataFrame:
+    text = load_templates(result_file_path).sort_values("template_id")["template"]
+    text = np.asarray(text.tolist() + [None], dtype=object)
+    ids = df["template_id"].to_numpy()
+    # ids missing from the sidecar map to None (last slot)
+    ids = np.where((ids >= 0) & (ids < len(text) - 1), ids, len(text) - 1)
+    df["template"] = text[ids]
+    return df if columns is None else df[columns]
+
+def read_time_window(result_file_path, start_time, end_time, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Rows with start_time <= timestamp <= end_time in the v1 column layout, indexed by
+    their row number in the whole result. Row groups outside the window are skipped
+    on their timestamp statistics.
+    """
+    if not result_file_path or not os.path.exists(result_file_path):
+        return pd.DataFrame(columns=columns)
+    start_time, end_time = pd.Timestamp(start_time), pd.Timestamp(end_time)
+    pf = pq.ParquetFile(str(result_file_path))
+    names = pf.schema_arrow.names
+    v2 = "template_id" in names
+    want_template = columns is None or "template" in columns
+    read_columns = [c for c in (columns or names) if c != "template"]
+    if want_template and v2 and "template_id" not in read_columns:
+        read_columns.append("template_id")
+    if want_template and not v2 and "template" not in read_columns:
+        read_columns.append("template")
+    if "timestamp" not in read_columns:
+        read_columns.append("timestamp")
+
+    ts_column = pf.schema.names.index("timestamp")
+    row_groups, positions = [], []
+    offset = 0
+    for i in range(pf.num_row_groups):
+        meta = pf.metadata.row_group(i)
+        stats = meta.column(ts_column).statistics
+        if (stats is None or not stats.has_min_max
+                or (pd.Timestamp(stats.max) >= start_time and pd.Timestamp(stats.min) <= end_time)):
+            row_groups.append(i)
+            positions.append(np.arange(offset, offset + meta.num_rows, dtype=np.int64))
+        offset += meta.num_rows
+
+    if not row_groups:
+        df = pf.schema_arrow.empty_table().select(read_columns).to_pandas()
+    else:
+        df = pf.read_row_groups(row_groups, columns=read_columns).to_pandas()
+        df.index = np.concatenate(positions)
+        ts = pd.to_datetime(df["timestamp"])
+        df = df[(ts >= start_time) & (ts <= end_time)].copy()
+    if want_template and v2:
+        return _add_template_text(result_file_path, df, columns)
+    return df if columns is None else df[columns]
+
+def read_template_rows(result_file_path, template, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Rows of one template only, filtered by pyarrow on template_id (v2) or template (v1)."""
+    if not result_file_path or not os.path.exists(result_file_path):
+        return pd.DataFrame(columns=columns)
+    return result_cache.get(result_file_path, lambda: _read_template_rows(result_file_path, template, columns),
+                            columns=columns, variant=("template", template))
+
+def _read_template_rows(result_file_path, template, columns=None) -> pd.DataFrame:
+    if result_format_version(result_file_path) < 2:
+        return pd.read_parquet(result_file_path, columns=columns, filters=[("template", "==", template)])
+
+    tid = template_id(result_file_path, template)
+    if tid is None:
+        return pd.DataFrame(columns=columns)
+    read_columns = None if columns is None else [c for c in columns if c != "template"]
+    df = _read_indexed_rows(result_file_path, tid, read_columns)
+    if df is None:
+        df = pd.read_parquet(result_file_path, columns=read_columns, filters=[("template_id", "==", tid)])
+    if columns is None or "template" in columns:
+        df["template"] = template
+    return df if columns is None else df[columns]
+
+def _read_indexed_rows(result_file_path, tid, columns) -> Optional[pd.DataFrame]:
+    """
+    Read the rows of template tid through the row index: only the row groups holding
+    the template are decoded, then its rows are taken out of them.
+    Returns None when there is no usable index.
+    """
+    path = row_index_path(result_file_path)
+    if not path.exists():
+        return None
+    entries = pd.read_parquet(path, columns=["row_group", "rows"], filters=[("template_id", "==", tid)])
+    pf = pq.ParquetFile(str(result_file_path))
+    if entries.empty:
+        return pa.schema([pf.schema_arrow.field(c) for c in (columns or pf.schema_arrow.names)]).empty_table().to_pandas()
+    row_groups = entries["row_group"].astype(int).tolist()
+    if max(row_groups) >= pf.num_row_groups:
+        # index does not belong to this result (stale sidecar)
+        return None
+
+    positions = []
+    offset = 0
+    for row_group, rows in zip(row_groups, entries["rows"]):
+        positions.append(np.asarray(rows, dtype=np.int64) + offset)
+        offset += pf.metadata.row_group(row_group).num_rows
+    table = pf.read_row_groups(row_groups, columns=columns)
+    return table.take(pa.array(np.concatenate(positions))).to_pandas()
+
+def read_rollup(result_file_path, template, freq) -> pd.DataFrame:
+    """
+    Occurrence counts of one template per freq bucket: timestamp, count.
+    Empty buckets are only materialised at the edges of gaps, which is all a line
+    chart needs to drop to zero between bursts.
+    """
+    if freq not in ROLLUP_FREQS:
+        raise ValueError(f"Unsupported rollup frequency {freq}")
+    if not result_file_path or not os.path.exists(result_file_path):
+        return pd.DataFrame(columns=["timestamp", "count"])
+    return result_cache.get(result_file_path, lambda: _read_rollup(result_file_path, template, freq),
+                            variant=("rollup", template, freq))
+
+def _read_rollup(result_file_path, template, freq) -> pd.DataFrame:
+    step = ROLLUP_FREQS[freq]
+    path = rollups_path(result_file_path)
+    tid = template_id(result_file_path, template) if result_format_version(result_file_path) >= 2 else None
+    if tid is not None and path.exists():
+        df = pd.read_parquet(path, columns=["bucket", "count"], filters=[("freq", "==", freq), ("template_id", "==", tid)])
+        buckets = df["bucket"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        counts = df["count"].to_numpy(dtype=np.int64)
+    else:
+        # v1 result or missing sidecar: bucket the template's rows now
+        ts = read_template_rows(result_file_path, template, columns=["timestamp"])["timestamp"]
+        ts = pd.to_datetime(ts).dropna().to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        buckets, counts = np.unique(ts - ts % step, return_counts=True)
+
+    order = np.argsort(buckets, kind="stable")
+    buckets, counts = buckets[order], counts[order].astype(np.int64)
+    if len(buckets) > 1:
+        gaps = np.flatnonzero(np.diff(buckets) > step)
+        zero_after = buckets[gaps] + step
+        zero_before = buckets[gaps + 1] - step
+        zeros = np.unique(np.concatenate([zero_after, zero_before]))
+        buckets = np.concatenate([buckets, zeros])
+        counts = np.concatenate([counts, np.zeros(len(zeros), dtype=np.int64)])
+        order = np.argsort(buckets, kind="stable")
+        buckets, counts = buckets[order], counts[order]
+
+    return pd.DataFrame({"timestamp": pd.to_datetime(buckets), "count": counts})
@@ -7,43 +7,13 @@ from typing import List, Dict, Any, Optional
 import pandas as pd
 from filelock import FileLock
 
-from logai.pattern import Pattern
+from logai.pattern import Pattern, result_is_current
+from logai.project_status import read_status, update_file_status
 from logai.utils.constants import NON_TEXT_EXTENSIONS, IGNORE_FILENAME_LIST
 
 #MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
 MAX_WORKERS = 2  # limit to 4 workers for now due to memory constraints
 
-# ---------- Helpers ----------
-def status_file(project_dir: Path) -> Path:
-    return Path(project_dir / "status.json")
-
-def read_status(project_dir: Path) -> Dict[str, Any]:
-    sf = status_file(project_dir)
-    if not sf.exists():
-        return {}
-    try:
-        return json.loads(sf.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-def write_status_atomically(project_dir: Path, status_obj: Dict[str, Any]) -> None:
-    sf = status_file(project_dir)
-    tmp = sf.with_suffix(".json.tmp")
-    tmp.write_text(json.dumps(status_obj, indent=2), encoding="utf-8")
-    os.replace(str(tmp), str(sf))
-
-def update_file_status(project_dir: Path, filename: str, state: str, meta: Optional[Dict[str,Any]] = None):
-    """Update status.json for a single file with atomic write."""
-    status = read_status(project_dir)
-    status.setdefault(filename, {})
-    status[filename].update({
-        "state": state,
-        "timestamp": time.time()
-    })
-    if meta:
-        status[filename].update(meta)
-    write_status_atomically(project_dir, status)
-
 '''
 class FileLockTimeout(Exception):
     pass
@@ -190,7 +160,8 @@ def _parse_file_worker(project_dir: Path, filename: str, original_filename: str,
         with lock:
             #print(f"Parsing {filename} in {project_dir}")
             parser = Pattern(project_dir=project_dir)
-            parser.parse_logs(file_path)
+            # result is not needed here; large files stream, grown files only parse the tail
+            parser.parse_logs(file_path, load_result=False)
             #print(f"Parsed {filename}, result at {result_df_path}")
 
             return {"state": "done", "message": "Parsed and saved"}
@@ -235,9 +206,8 @@ class PatternScheduler:
             if any(ign.lower() in original_name.lower() for ign in IGNORE_FILENAME_LIST):
                 continue
 
-            result_path = Path(file_path + ".parquet")
-            #print(f"Checking if result exists at {result_path}")
-            if result_path.exists():
+            #print(f"Checking if result exists at {file_path}.parquet")
+            if result_is_current(file_path):
                 results[original_name] = "parsed"
                 continue
 
@@ -0,0 +1,57 @@
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional
+from filelock import FileLock
+
+"""
+status.json of a project: per-file state written by the parse scheduler, the FAISS
+indexer and the GUI callbacks, from several threads and gunicorn workers at once.
+Updates hold status.json.lock around the read-modify-write, and every write goes
+through its own temporary file, so readers always see a complete file.
+"""
+
+def status_file(project_dir: Path) -> Path:
+    return Path(project_dir) / "status.json"
+
+def read_status(project_dir: Path) -> Dict[str, Any]:
+    sf = status_file(project_dir)
+    if not sf.exists():
+        return {}
+    try:
+        return json.loads(sf.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def write_status_atomically(project_dir: Path, status_obj: Dict[str, Any]) -> None:
+    sf = status_file(project_dir)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=sf.parent, prefix=sf.name + ".",
+                                     suffix=".tmp", delete=False) as tmp:
+        tmp.write(json.dumps(status_obj, indent=2))
+    try:
+        os.replace(tmp.name, str(sf))
+    except OSError:
+        os.remove(tmp.name)
+        raise
+
+def update_file_status(project_dir: Path, filename: str, state: str, meta: Optional[Dict[str,Any]] = None):
+    """Update status.json for a single file with atomic write."""
+    with FileLock(str(status_file(project_dir)) + ".lock"):
+        status = read_status(project_dir)
+        status.setdefault(filename, {})
+        status[filename].update({
+            "state": state,
+            "timestamp": time.time()
+        })
+        if meta:
+            status[filename].update(meta)
+        write_status_atomically(project_dir, status)
+
+def remove_file_status(project_dir: Path, filename: str):
+    """Drop the status.json entry of a file."""
+    with FileLock(str(status_file(project_dir)) + ".lock"):
+        status = read_status(project_dir)
+        if status.pop(filename, None) is not None:
+            write_status_atomically(project_dir, status)
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+
+import pandas as pd
+
+from logai.utils.constants import RESULT_CACHE_MAX_BYTES
+
+# ---------------------
+# Process-wide LRU cache of parsed result DataFrames
+# ---------------------
+"""
+Entries are keyed by (path, mtime, size, columns, variant), so a re-parsed or appended
+result file is never served stale. Memory is bounded by the deep pandas size of the
+cached frames; least recently used entries are evicted first.
+
+Cached frames are shared between callers and must be treated as read-only.
+"""
+class ResultCache:
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()   # key -> (DataFrame, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, loader: Callable[[], pd.DataFrame], columns: Optional[Sequence[str]] = None,
+            variant: Hashable = None) -> pd.DataFrame:
+        """
+        Return loader()'s frame for path, from cache when the file is unchanged.
+        columns is part of the key; a request for a subset of columns is also served
+        from a cached read of all columns.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return loader()
+
+        file_key = (os.path.abspath(str(path)), st.st_mtime_ns, st.st_size)
+        cols = tuple(columns) if columns is not None else None
+        key = file_key + (cols, variant)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if cols is not None:
+                full_key = file_key + (None, variant)
+                full = self._entries.get(full_key)
+                if full is not None and all(c in full[0].columns for c in cols):
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    return full[0][list(cols)]
+            self.misses += 1
+
+        # decode outside the lock so other threads can keep hitting the cache
+        df = loader()
+        self._put(key, df)
+        return df
+
+    def _put(self, key, df):
+        if not isinstance(df, pd.DataFrame):
+            return
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            # older versions of the same file can never be hit again
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+                self._drop(stale)
+
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (df, nbytes)
+            self._bytes += nbytes
+
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def invalidate(self, path=None):
+        """Drop every entry, or only the entries of path."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            path = os.path.abspath(str(path))
+            for key in [k for k in self._entries if k[0] == path]:
+                self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+# one cache per process (gunicorn worker)
+result_cache = ResultCache()
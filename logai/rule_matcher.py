@@ -0,0 +1,133 @@
+import re
+from re import _parser as sre_parse  # Python 3.11+ regex parser, used to find literals
+from typing import List, Optional, Pattern
+
+import ahocorasick
+
+# Literals shorter than this match too many lines to be worth prefiltering on
+MIN_LITERAL_LENGTH = 3
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, sre_parse.POSSESSIVE_REPEAT)
+
+
+def required_literals(pattern: Pattern) -> Optional[List[str]]:
+    """
+    Literal substrings of which at least one occurs in every line pattern matches,
+    or None when no such set can be derived (the regex then has to run on every line).
+    Literals of IGNORECASE patterns are lower-cased.
+    """
+    ignorecase = bool(pattern.flags & re.IGNORECASE)
+    try:
+        literals = _required(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None
+    if not literals or min(len(lit) for lit in literals) < MIN_LITERAL_LENGTH:
+        return None
+    if ignorecase:
+        if not all(lit.isascii() for lit in literals):
+            return None
+        literals = sorted({lit.lower() for lit in literals})
+    return literals
+
+
+def _required(items) -> Optional[List[str]]:
+    """
+    Walk one parsed sequence. Every element of a sequence is required, so the most
+    selective candidate (longest shortest-alternative) of any element will do.
+    """
+    best = None
+
+    def consider(candidate):
+        nonlocal best
+        if not candidate:
+            return
+        if best is None or (min(map(len, candidate)), -len(candidate)) > (min(map(len, best)), -len(best)):
+            best = candidate
+
+    run = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_parse.AT:
+            # anchors are zero-width, the literal run carries on
+            continue
+        if run:
+            consider(["".join(run)])
+            run = []
+
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            if (add_flags | del_flags) & re.IGNORECASE:
+                continue
+            consider(_required(sub))
+        elif op is sre_parse.ATOMIC_GROUP:
+            consider(_required(av))
+        elif op in _REPEATS:
+            low, _, sub = av
+            if low >= 1:
+                consider(_required(sub))
+        elif op is sre_parse.BRANCH:
+            alternatives = [_required(branch) for branch in av[1]]
+            if all(alternatives):
+                consider(sorted({lit for alt in alternatives for lit in alt}))
+    if run:
+        consider(["".join(run)])
+    return best
+
+
+class MultiPatternMatcher:
+    """
+    Matches a line against many compiled regexes in one pass.
+    Every regex with required literals is only run on lines where an Aho-Corasick
+    automaton over all those literals found one of them; the rest run on every line.
+    """
+    def __init__(self, patterns: List[Pattern]):
+        self.patterns = list(patterns)
+        unfiltered = []
+        words = {}, {}   # case-sensitive, lower-cased: literal -> rule indices
+        for i, pattern in enumerate(self.patterns):
+            literals = required_literals(pattern)
+            if literals is None:
+                unfiltered.append(i)
+                continue
+            table = words[1] if pattern.flags & re.IGNORECASE else words[0]
+            for literal in literals:
+                table.setdefault(literal, []).append(i)
+        self.unfiltered = tuple(unfiltered)
+        self.automaton = _build_automaton(words[0])
+        self.automaton_ci = _build_automaton(words[1])
+
+    def match(self, line: str, done=None) -> List[int]:
+        """Indices of the patterns matching line, in order, skipping those with done[i] set."""
+        candidates = set(self.unfiltered)
+        if self.automaton is not None:
+            for _, ids in self.automaton.iter(line):
+                candidates.update(ids)
+        if self.automaton_ci is not None:
+            for _, ids in self.automaton_ci.iter(line.lower()):
+                candidates.update(ids)
+        if not candidates:
+            return []
+
+        hits = []
+        for i in sorted(candidates):
+            if done is not None and done[i]:
+                continue
+            if self.patterns[i].search(line):
+                hits.append(i)
+        return hits
+
+    @property
+    def prefiltered(self) -> int:
+        return len(self.patterns) - len(self.unfiltered)
+
+
+def _build_automaton(words):
+    if not words:
+        return None
+    automaton = ahocorasick.Automaton()
+    for literal, ids in words.items():
+        automaton.add_word(literal, tuple(ids))
+    automaton.make_automaton()
+    return automaton
@@ -0,0 +1,194 @@
+import os
+import json
+import pickle
+import threading
+
+import numpy as np
+import pyarrow as pa
+
+from logai.embedding_cache import normalize_template, template_digest
+
+"""
+Metadata of the vectors in a project's FAISS index, keyed by vector id.
+
+    <project>/meta/seg-<sequence>.arrow   Arrow IPC file, rows sorted by id
+    <project>/meta/files.json             file id of every indexed file name
+
+A vector id is the file id in the high bits and a hash of the normalised template in the
+low FILE_ID_SHIFT bits, so re-indexing a file yields the same ids and all ids of a file
+lie in one range. Every add writes a new segment; when an id is in several segments the
+newest row wins. Readers memory map the segments and take only the requested rows.
+compact rewrites the live rows into one segment once replaced and removed rows dominate.
+
+Projects indexed before vector ids hold their rows by vector position in meta.pkl;
+legacy_table reads it for the conversion to ids.
+"""
+
+META_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("template", pa.string()),
+    ("frequency", pa.int64()),
+    ("filename", pa.string()),
+])
+
+META_COLUMNS = [field.name for field in META_SCHEMA]
+
+FILE_ID_SHIFT = 39  # template hash bits; the file id gets the remaining 24
+_TEMPLATE_MASK = (1 << FILE_ID_SHIFT) - 1
+_PREFIX = "seg-"
+_SUFFIX = ".arrow"
+
+
+def file_id_range(file_id):
+    """[first, last] vector ids of a file."""
+    return file_id << FILE_ID_SHIFT, ((file_id + 1) << FILE_ID_SHIFT) - 1
+
+
+def vector_ids(file_id, templates):
+    """int64 vector ids of templates of the file with file_id."""
+    base = file_id << FILE_ID_SHIFT
+    return np.array([
+        base | (int.from_bytes(template_digest(normalize_template(t))[:8], "big") & _TEMPLATE_MASK)
+        for t in templates
+    ], dtype="int64")
+
+
+class TemplateMetaStore:
+    def __init__(self, project_dir):
+        self.directory = os.path.join(project_dir, "meta")
+        self.legacy_path = os.path.join(project_dir, "meta.pkl")
+        self.files_path = os.path.join(self.directory, "files.json")
+        self._lock = threading.Lock()
+        self._tables = {}  # segment path -> (mtime_ns, memory mapped table, ids)
+
+    # ---------- File ids ----------
+    def _files(self):
+        if not os.path.exists(self.files_path):
+            return {}
+        with open(self.files_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def file_id(self, filename, create=True):
+        """Id of filename, assigned on first use. None when unknown and not create."""
+        files = self._files()
+        if filename not in files and create:
+            files[filename] = max(files.values(), default=-1) + 1
+            if files[filename] >> (63 - FILE_ID_SHIFT):
+                raise ValueError(f"Too many indexed files in {self.directory}")
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self.files_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(files, f, indent=2)
+            os.replace(tmp, self.files_path)
+        return files.get(filename)
+
+    # ---------- Segments ----------
+    def _segments(self):
+        """Sequence numbers of the segments on disk, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[len(_PREFIX):-len(_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.startswith(_PREFIX) and name.endswith(_SUFFIX))
+
+    def _segment_path(self, sequence):
+        return os.path.join(self.directory, f"{_PREFIX}{sequence:08d}{_SUFFIX}")
+
+    def _write(self, path, table):
+        tmp = path + ".tmp"
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+
+    def append(self, columns):
+        """Write rows as a new segment. columns maps every META_COLUMNS name to a sequence."""
+        table = pa.Table.from_pydict({name: list(columns[name]) for name in META_COLUMNS}, schema=META_SCHEMA)
+        table = table.sort_by("id")
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._write(self._segment_path(max(self._segments(), default=0) + 1), table)
+
+    def _table(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._tables.get(path)
+        if cached is None or cached[0] != mtime:
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            cached = (mtime, table, table.column("id").to_numpy())
+            self._tables[path] = cached
+        return cached[1], cached[2]
+
+    def row_count(self) -> int:
+        with self._lock:
+            return sum(self._table(self._segment_path(s))[0].num_rows for s in self._segments())
+
+    def take(self, ids):
+        """Metadata dicts of the given vector ids, in order; None for unknown ids."""
+        try:
+            return self._take(ids)
+        except FileNotFoundError:
+            # a compaction replaced the segments while they were listed
+            return self._take(ids)
+
+    def _take(self, ids):
+        ids = np.asarray(ids, dtype="int64")
+        rows = [None] * len(ids)
+        missing = np.flatnonzero(ids >= 0)
+        with self._lock:
+            sequences = self._segments()
+            # segments another process compacted away
+            live = {self._segment_path(s) for s in sequences}
+            for stale in [path for path in self._tables if path not in live]:
+                del self._tables[stale]
+            for sequence in reversed(sequences):
+                if not len(missing):
+                    break
+                table, segment_ids = self._table(self._segment_path(sequence))
+                at = np.searchsorted(segment_ids, ids[missing])
+                found = at < len(segment_ids)
+                found[found] = segment_ids[at[found]] == ids[missing[found]]
+                if not found.any():
+                    continue
+                taken = table.take(pa.array(at[found], type=pa.int64())).to_pylist()
+                for position, row in zip(missing[found], taken):
+                    del row["id"]
+                    rows[position] = row
+                missing = missing[~found]
+        return rows
+
+    def compact(self, live_ids, min_rows=4096):
+        """
+        Rewrite the newest row of every live id into one segment when the segments hold
+        more than twice as many rows (and at least min_rows).
+        """
+        live_ids = np.asarray(live_ids, dtype="int64")
+        if self.row_count() < max(min_rows, 2 * len(live_ids)):
+            return
+        with self._lock:
+            sequences = self._segments()
+            parts, seen = [], np.empty(0, dtype="int64")
+            for sequence in reversed(sequences):
+                table, segment_ids = self._table(self._segment_path(sequence))
+                keep = np.isin(segment_ids, live_ids) & ~np.isin(segment_ids, seen)
+                if keep.any():
+                    parts.append(table.filter(pa.array(keep)))
+                    seen = np.concatenate([seen, segment_ids[keep]])
+            table = pa.concat_tables(parts).sort_by("id") if parts else META_SCHEMA.empty_table()
+            self._write(self._segment_path(sequences[-1] + 1), table)
+            for sequence in sequences:
+                os.remove(self._segment_path(sequence))
+                self._tables.pop(self._segment_path(sequence), None)
+        print(f"Compacted {self.directory}: {len(sequences)} segments -> {table.num_rows} rows")
+
+    # ---------- meta.pkl (rows by vector position, before vector ids) ----------
+    def legacy_table(self):
+        """Rows of vector positions 0, 1, ... from meta.pkl, or None."""
+        if not os.path.exists(self.legacy_path):
+            return None
+        columns = ["template", "frequency", "filename"]
+        with open(self.legacy_path, "rb") as f:
+            rows = pickle.load(f)
+        return pa.Table.from_pydict({c: [row[c] for row in rows] for c in columns})
+
+    def drop_legacy(self):
+        if os.path.exists(self.legacy_path):
+            os.remove(self.legacy_path)
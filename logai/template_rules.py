@@ -0,0 +1,332 @@
+import re
+from pathlib import Path
+from re import _parser as sre_parse
+from typing import List, Pattern
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from drain3.template_miner_config import TemplateMinerConfig
+
+from logai.parameter_stats import parameter_stats_path
+from logai.pattern import result_is_current
+from logai.pattern_result import load_templates, result_format_version, row_index_has_offsets, row_index_path
+from logai.rule_matcher import MultiPatternMatcher, required_literals
+
+"""
+Rule matching against a parsed result instead of the raw log.
+
+Rules are evaluated on the parsed messages (the loglines column, i.e. the line without
+its leading timestamp). For every (rule, template) pair the template text and the exact
+parameter value sets of <file>.params.parquet first decide whether any of the rule's
+required literals can occur in a message of that template at all; templates where none
+can are skipped. The remaining rows are read through <file>.rowindex.parquet and each
+distinct message is matched once, so counts come from the template index rather than a
+scan of every raw line. Samples are the raw lines of the first matching rows in file
+order, read at the byte offsets the row index records for every row.
+
+Messages are stripped, their timestamp prefix and separator removed, and Drain3 joins
+tokens with single spaces. Rules that could match inside the timestamp prefix (digits,
+":", ".", any character, month names, letter classes), whitespace or a line ending, rules
+anchored to the start or end of the line and rules using lookbehind depend on the raw
+line around the message and are left for the raw-line scan.
+"""
+
+# Characters of every timestamp prefix Pattern recognises and its separator, plus line ends
+TIMESTAMP_CHARS = "0123456789:. \t\r\n\v\f"
+MONTH_NAMES = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+# Letters of the prefix ("Sep", ISO "T"): character classes must not match them
+TIMESTAMP_LETTERS = "".join(sorted(set("".join(MONTH_NAMES)) | {"T"}))
+
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: re.compile(r"\d"),
+    sre_parse.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    sre_parse.CATEGORY_SPACE: re.compile(r"\s"),
+    sre_parse.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    sre_parse.CATEGORY_WORD: re.compile(r"\w"),
+    sre_parse.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+
+# Distinct messages whose match result is remembered between row groups
+MESSAGE_MEMO_SIZE = 100000
+
+_drain_config = None
+
+
+def _config():
+    global _drain_config
+    if _drain_config is None:
+        _drain_config = TemplateMinerConfig()
+        _drain_config.load("drain3.ini")
+    return _drain_config
+
+
+def template_mode_available(fpath) -> bool:
+    """True if fpath has a current parsed result with everything template matching reads."""
+    result_file_path = Path(str(fpath) + ".parquet")
+    return (
+        result_is_current(fpath)
+        and result_format_version(result_file_path) >= 2
+        and row_index_has_offsets(result_file_path)
+        and parameter_stats_path(result_file_path).exists()
+    )
+
+
+def template_decidable(pattern: Pattern) -> bool:
+    """False for rules whose result depends on the raw line around the message."""
+    text = pattern.pattern if isinstance(pattern.pattern, str) else ""
+    if pattern.flags & re.IGNORECASE:
+        if any(month.lower() in text.lower() for month in MONTH_NAMES):
+            return False
+    elif any(month in text for month in MONTH_NAMES):
+        return False
+    try:
+        return _decidable(sre_parse.parse(pattern.pattern, pattern.flags), bool(pattern.flags & re.IGNORECASE))
+    except Exception:
+        return False
+
+
+def _matches_timestamp_char(op, av, ignorecase=False) -> bool:
+    """
+    True if the single-character item (op, av) can match a TIMESTAMP_CHARS character,
+    or, for a character class, a TIMESTAMP_LETTERS one.
+    """
+    if op is sre_parse.ANY or op is sre_parse.NOT_LITERAL:
+        return True
+    if op is sre_parse.LITERAL:
+        return chr(av) in TIMESTAMP_CHARS
+    if op is not sre_parse.IN:
+        return False
+    chars = TIMESTAMP_CHARS + TIMESTAMP_LETTERS
+    if ignorecase:
+        chars += TIMESTAMP_LETTERS.swapcase()
+    negate = False
+    hits = set()
+    for item_op, item_av in av:
+        if item_op is sre_parse.NEGATE:
+            negate = True
+        elif item_op is sre_parse.LITERAL:
+            hits.update(c for c in chars if ord(c) == item_av)
+        elif item_op in (sre_parse.RANGE, sre_parse.RANGE_UNI_IGNORE):
+            hits.update(c for c in chars if item_av[0] <= ord(c) <= item_av[1])
+        elif item_op is sre_parse.CATEGORY:
+            category = _CATEGORIES.get(item_av)
+            hits.update(c for c in chars if category is None or category.match(c))
+        else:
+            # unknown item: assume it can match
+            return True
+    return len(hits) < len(set(chars)) if negate else bool(hits)
+
+
+def _decidable(items, ignorecase=False) -> bool:
+    for op, av in items:
+        if _matches_timestamp_char(op, av, ignorecase):
+            return False
+        if op is sre_parse.AT and av in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING,
+                                         sre_parse.AT_BEGINNING_LINE, sre_parse.AT_END,
+                                         sre_parse.AT_END_STRING, sre_parse.AT_END_LINE):
+            return False
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            direction, sub = av
+            if direction < 0 or not _decidable(sub, ignorecase):
+                return False
+        elif op is sre_parse.SUBPATTERN:
+            if not _decidable(av[3], ignorecase):
+                return False
+        elif op is sre_parse.ATOMIC_GROUP:
+            if not _decidable(av, ignorecase):
+                return False
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, sre_parse.POSSESSIVE_REPEAT):
+            if not _decidable(av[2], ignorecase):
+                return False
+        elif op is sre_parse.BRANCH:
+            if not all(_decidable(branch, ignorecase) for branch in av[1]):
+                return False
+    return True
+
+
+class _TemplateText:
+    """
+    A template as static segments around its wildcards, with the exact parameter values
+    of each wildcard when every occurrence is known. Text is normalised the way Drain3
+    tokenises messages: extra delimiters become spaces and whitespace runs collapse.
+    """
+    def __init__(self, template, count, positions, wildcard_regex):
+        self.statics = wildcard_regex.split(template)
+        self.wildcards = []
+        for position in range(len(self.statics) - 1):
+            exact, seen, values = positions.get(position, (False, 0, None))
+            if not exact or seen < count:
+                # unknown or missing (empty) values: anything can be there
+                self.wildcards.append(None)
+            else:
+                self.wildcards.append([_collapse(v) for v in values])
+        last = len(self.statics) - 1
+        self.statics = [_collapse(s, left=i == 0, right=i == last) for i, s in enumerate(self.statics)]
+        self._lowered = None
+
+    def lowered(self):
+        if self._lowered is None:
+            lowered = object.__new__(_TemplateText)
+            lowered.statics = [s.lower() for s in self.statics]
+            lowered.wildcards = [None if w is None else [v.lower() for v in w] for w in self.wildcards]
+            lowered._lowered = lowered
+            self._lowered = lowered
+        return self._lowered
+
+    def may_contain(self, literal) -> bool:
+        """Necessary condition for literal to occur in a normalised message of this template."""
+        if any(literal in s for s in self.statics):
+            return True
+        n = len(literal)
+        for j, values in enumerate(self.wildcards):
+            if values is None:
+                return True
+            before, after = self.statics[j], self.statics[j + 1]
+            if any(literal in v for v in values):
+                return True
+            first = {v[0] for v in values if v}
+            last = {v[-1] for v in values if v}
+            for k in range(1, n):
+                # starts in the static text before the wildcard and runs into a value
+                if before.endswith(literal[:k]) and literal[k] in first:
+                    return True
+                # starts in a value and runs into the static text after it
+                if literal[k - 1] in last:
+                    rest = literal[k:]
+                    if not after:
+                        return True
+                    if after.startswith(rest) if len(rest) <= len(after) else rest.startswith(after):
+                        return True
+        return False
+
+
+def _collapse(text, left=True, right=True):
+    text = re.sub(r"\s+", " ", text)
+    if left:
+        text = text.lstrip()
+    return text.rstrip() if right else text
+
+
+def _normalise_literal(literal):
+    for delimiter in _config().drain_extra_delimiters:
+        literal = re.sub(delimiter, " ", literal)
+    return _collapse(literal)
+
+
+def match_rules_on_templates(result_file_path, patterns: List[Pattern], max_matches, sample_logs):
+    """
+    Count matches of every pattern over the parsed messages of result_file_path.
+    Returns one (count capped at max_matches, first sample_logs samples) per pattern.
+    """
+    config = _config()
+    masks = {instruction.mask_with for instruction in config.masking_instructions} | {"*"}
+    wildcard_regex = re.compile(
+        "|".join(re.escape(config.mask_prefix + mask + config.mask_suffix) for mask in sorted(masks, key=len, reverse=True))
+    )
+
+    templates = load_templates(result_file_path)
+    stats = pd.read_parquet(
+        parameter_stats_path(result_file_path),
+        columns=["template_id", "position", "count", "distinct_exact", "values"],
+    )
+    positions = {}
+    for template_id, position, count, exact, values in zip(
+        stats["template_id"], stats["position"], stats["count"], stats["distinct_exact"], stats["values"]
+    ):
+        positions.setdefault(int(template_id), {})[int(position)] = (bool(exact), int(count), values)
+    n_templates = int(templates["template_id"].max()) + 1 if not templates.empty else 0
+
+    # allowed[i, t]: pattern i can match some message of template t
+    allowed = np.zeros((len(patterns), n_templates), dtype=bool)
+    literals = [required_literals(pattern) for pattern in patterns]
+    literals = [
+        None if lits is None else [_normalise_literal(lit) for lit in lits]
+        for lits in literals
+    ]
+    always = [lits is None or not all(lits) for lits in literals]
+    allowed[always, :] = True
+    checked = [
+        (i, lits, bool(pattern.flags & re.IGNORECASE))
+        for i, (pattern, lits) in enumerate(zip(patterns, literals)) if not always[i]
+    ]
+    for template_id, template, count in zip(templates["template_id"], templates["template"], templates["count"]):
+        text = _TemplateText(template, int(count), positions.get(int(template_id), {}), wildcard_regex)
+        for i, lits, ignorecase in checked:
+            target = text.lowered() if ignorecase else text
+            allowed[i, template_id] = any(target.may_contain(lit) for lit in lits)
+
+    counts = np.zeros(len(patterns), dtype=np.int64)
+    sample_offsets = [[] for _ in patterns]
+    candidates = np.flatnonzero(allowed.any(axis=0))
+    print(f"Template rule matching: {len(candidates)} of {n_templates} templates can match {len(patterns)} rules.")
+    if len(candidates):
+        _match_rows(result_file_path, patterns, allowed, candidates, counts, sample_offsets, sample_logs)
+
+    samples = _sample_text(str(result_file_path)[:-len(".parquet")], sample_offsets)
+    return [(int(min(count, max_matches)), rule_samples) for count, rule_samples in zip(counts, samples)]
+
+
+def _match_rows(result_file_path, patterns, allowed, candidates, counts, sample_offsets, sample_logs):
+    """
+    Match the distinct messages of every candidate row group by group. sample_offsets
+    collects the log file offsets of the first sample_logs matching lines of every rule.
+    """
+    matcher = MultiPatternMatcher(patterns)
+    index = pd.read_parquet(
+        row_index_path(result_file_path), columns=["template_id", "row_group", "rows", "offsets"],
+        filters=[("template_id", "in", [int(t) for t in candidates])],
+    )
+
+    pf = pq.ParquetFile(str(result_file_path))
+    memo = {}
+    for row_group, entries in index.groupby("row_group", sort=True):
+        row_group = int(row_group)
+        line_offsets = np.full(pf.metadata.row_group(row_group).num_rows, -1, dtype=np.int64)
+        line_offsets[np.concatenate(entries["rows"].tolist())] = np.concatenate(entries["offsets"].tolist())
+        table = pf.read_row_group(row_group, columns=["template_id", "loglines"])
+        template_ids = table.column("template_id").to_numpy()
+        keep = np.flatnonzero(np.isin(template_ids, candidates))
+        if not len(keep):
+            continue
+        template_ids = template_ids[keep]
+        messages = table.column("loglines").take(pa.array(keep)).to_numpy(zero_copy_only=False)
+        codes, uniques = pd.factorize(messages)
+
+        if len(memo) > MESSAGE_MEMO_SIZE:
+            memo.clear()
+        pair_codes, pair_rules = [], []
+        for code, message in enumerate(uniques):
+            hits = memo.get(message)
+            if hits is None:
+                hits = tuple(matcher.match(message)) if isinstance(message, str) else ()
+                memo[message] = hits
+            for rule in hits:
+                pair_codes.append(code)
+                pair_rules.append(rule)
+        if not pair_codes:
+            continue
+
+        # expand (message, rule) hits to rows, keeping rules allowed for the row's template
+        pairs = pd.DataFrame({"code": pair_codes, "rule": pair_rules})
+        rows = pd.DataFrame({"code": codes, "template_id": template_ids, "offset": line_offsets[keep]})
+        hits = rows.merge(pairs, on="code")
+        hits = hits[allowed[hits["rule"].to_numpy(), hits["template_id"].to_numpy()]]
+        counts += np.bincount(hits["rule"].to_numpy(), minlength=len(patterns))
+        # rows are in timestamp order, samples in file order: keep the lowest offsets
+        for rule, group in hits.groupby("rule", sort=False):
+            first = np.sort(group["offset"].to_numpy())[:sample_logs].tolist()
+            sample_offsets[rule] = sorted(sample_offsets[rule] + first)[:sample_logs]
+
+
+def _sample_text(log_path, sample_offsets):
+    """The raw lines at the sampled offsets of log_path, as the raw-line scan yields them."""
+    text = {}
+    with open(log_path, "rb") as f:
+        for offset in sorted({offset for offsets in sample_offsets for offset in offsets}):
+            f.seek(offset)
+            line = f.readline().decode("utf-8", errors="ignore")
+            end = min((i for i in (line.find("\r"), line.find("\n")) if i >= 0), default=None)
+            text[offset] = line if end is None else line[:end] + "\n"
+    return [[text[offset] for offset in offsets] for offsets in sample_offsets]
@@ -6,6 +6,10 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 UPLOAD_DIRECTORY = os.path.join(BASE_DIR, "user_uploads")
 PARSER_CONFIG_PATH = os.path.join(UPLOAD_DIRECTORY, "rule_parser_config.json")
 PARSER_CONFIG_MAX_MATCHES = 100  # Stop counting after this (flood detection threshold)
+PARSER_CONFIG_SAMPLE_LOGS = 5     # Sample lines kept per matched rule
+PARSER_CONFIG_WORKERS = min(8, os.cpu_count() or 1)  # processes used for rule analysis
+PARSER_CONFIG_RANGE_BYTES = 32 * 1024 * 1024  # files are analysed in byte ranges of this size
+PARSER_CONFIG_USE_TEMPLATES = os.getenv("PARSER_CONFIG_USE_TEMPLATES", "0") == "1"  # match rules on parsed templates (opt-in)
 
 MERGED_LOGS_DIR_NAME = "merged_logs"
 MERGED_LOGS_ARCHIVE_NAME = "mergedlogs"
@@ -18,4 +22,53 @@ IGNORE_FILENAME_LIST = ['telemetry2', 'snapshot', 'SelfHeal']
 LINES_PER_PAGE = 1000
 
 # Sentence Transformer
-SENTENCE_TRANSFORMER_MODE_NAME = "all-MiniLM-L6-v2-local"
\ No newline at end of file
+SENTENCE_TRANSFORMER_MODE_NAME = "all-MiniLM-L6-v2-local"
+
+# Embedding service (see logai/embedding_service.py)
+EMBEDDING_SERVICE_SOCKET = os.getenv("EMBEDDING_SERVICE_SOCKET", os.path.join(BASE_DIR, "embedding_service.sock"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))  # texts encoded per model call
+EMBEDDING_BATCH_LATENCY_MS = float(os.getenv("EMBEDDING_BATCH_LATENCY_MS", "10"))  # wait for more requests to batch
+EMBEDDING_SERVICE_TIMEOUT = 300  # seconds a client waits for an encode
+EMBEDDING_SERVICE_CONNECT_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_CONNECT_TIMEOUT", "30"))  # seconds to wait for the service to answer
+EMBEDDING_LOCAL_FALLBACK = os.getenv("EMBEDDING_LOCAL_FALLBACK", "0") == "1"  # load the model in-process when the service is down
+
+# Template embedding cache shared by all projects (see logai/embedding_cache.py)
+EMBEDDING_CACHE_DIR = os.path.join(BASE_DIR, "embedding_cache", SENTENCE_TRANSFORMER_MODE_NAME)
+
+# FAISS index type management (see logai/vector_index.py)
+FAISS_PROMOTE_AT = int(os.getenv("FAISS_PROMOTE_AT", "50000"))  # vectors before a flat index is retrained
+FAISS_PROMOTED_TYPE = os.getenv("FAISS_PROMOTED_TYPE", "ivf_flat")  # ivf_flat, ivf_pq or hnsw
+FAISS_RETRAIN_GROWTH = 4       # retrain an IVF index once it holds this many times its training size
+FAISS_IVF_NPROBE = 32          # IVF lists scanned per query
+FAISS_PQ_M = 48                # IVF-PQ sub-quantizers (must divide the dimension)
+FAISS_HNSW_M = 32              # HNSW graph degree
+FAISS_HNSW_EF_SEARCH = 128     # HNSW search breadth
+
+# Loaded project indexes kept per process (see logai/index_registry.py)
+FAISS_REGISTRY_MAX_BYTES = int(os.getenv("FAISS_REGISTRY_MAX_MB", "1024")) * 1024 * 1024
+
+# Background indexing of parsed files (see FaissScheduler in logai/embedding.py)
+FAISS_INDEX_QUEUE_SIZE = 64            # parsed files waiting to be indexed
+FAISS_INDEX_BATCH_TEMPLATES = 50000    # templates encoded and added per batch
+FAISS_INDEX_STALE_SECONDS = 600        # "indexing" files of a dead worker are queued again
+FAISS_INDEX_RETRY_SECONDS = int(os.getenv("FAISS_INDEX_RETRY_SECONDS", "60"))  # failed adds and removals are offered again after this
+FAISS_INDEX_MAX_ATTEMPTS = 5           # files whose templates failed to be added this often are marked "error"
+
+# Pattern parsing
+PATTERN_STREAM_CHUNK_LINES = 200000        # lines handled per chunk in streaming mode
+PATTERN_STREAM_MIN_FILE_SIZE = 256 * 1024 * 1024  # stream files bigger than this (bytes)
+PATTERN_SHARDS = min(8, os.cpu_count() or 1)  # processes used by Pattern.parse_logs_sharded
+PATTERN_ROW_GROUP_ROWS = 65536  # rows per parquet row group in parsed results (drill-down read unit)
+
+# Result cache (per process, see logai/result_cache.py)
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Parameter statistics per template position (see logai/parameter_stats.py)
+PARAM_STATS_MAX_DISTINCT = 1000
+PARAM_STATS_TOP_K = 20
+PARAM_STATS_HIST_BINS = 10
+
+# Rule analysis PDF report (see logai/parser_report.py)
+REPORT_BATCH_ROWS = 500        # result rows read and laid out per step
+REPORT_SAMPLE_LOGS = PARSER_CONFIG_SAMPLE_LOGS  # sample lines printed per matched rule (all that are stored)
+REPORT_SAMPLE_LOG_CHARS = 2000 # longer sample lines are cut
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(df: pd.DataFrame, threshold: int, x: str = "timestamp", y: str = "count") -> pd.DataFrame:
+    """
+    Largest-Triangle-Three-Buckets downsampling of a time series to threshold points.
+    Keeps the first and last point and, from every bucket, the point forming the largest
+    triangle with its neighbours, so spikes survive where plain decimation drops them.
+    """
+    n = len(df)
+    if threshold >= n or threshold < 3:
+        return df
+
+    xs = df[x]
+    if pd.api.types.is_datetime64_any_dtype(xs):
+        xs = xs.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+
+    # bucket edges for the n - 2 inner points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xs[next_start:next_end].mean()
+        avg_y = ys[next_start:next_end].mean()
+
+        area = np.abs(
+            (xs[a] - avg_x) * (ys[start:end] - ys[a])
+            - (xs[a] - xs[start:end]) * (avg_y - ys[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return df.iloc[selected]
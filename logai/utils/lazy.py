@@ -0,0 +1,32 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a heavy module (faiss, torch, ...) that is imported on first attribute
+    access, so importing the code that uses it stays cheap.
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name) -> LazyModule:
+    return LazyModule(name)
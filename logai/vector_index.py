@@ -0,0 +1,208 @@
+import os
+import json
+import math
+import time
+
+import numpy as np
+
+from logai.utils.lazy import lazy_import
+from logai.utils.constants import (
+    FAISS_PROMOTE_AT,
+    FAISS_PROMOTED_TYPE,
+    FAISS_RETRAIN_GROWTH,
+    FAISS_IVF_NPROBE,
+    FAISS_PQ_M,
+    FAISS_HNSW_M,
+    FAISS_HNSW_EF_SEARCH,
+)
+
+faiss = lazy_import("faiss")
+
+"""
+Index type management for the per-project FAISS index.
+
+Projects start with an exact flat index. Once it holds FAISS_PROMOTE_AT vectors it is
+rebuilt as FAISS_PROMOTED_TYPE:
+    ivf_flat  inverted lists over exact vectors; retrained as the index keeps growing
+    ivf_pq    inverted lists over product-quantised vectors, a fraction of the memory
+    hnsw      graph index, fastest queries, no training
+Vectors carry 64-bit ids (see logai/template_meta.py), so the vectors of a file can be
+replaced or removed: flat and HNSW indexes are wrapped in an IndexIDMap2, IVF indexes
+keep the ids in their inverted lists with a hash table direct map. HNSW cannot remove
+vectors and is rebuilt instead. Indexes written before ids were introduced numbered
+their vectors by position; index_has_ids tells them apart. The chosen parameters are
+stored next to the index as <index>.params.json.
+"""
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def index_params_path(index_path) -> str:
+    return str(index_path) + ".params.json"
+
+
+def flat_params(dimension) -> dict:
+    return {"type": "flat", "dimension": dimension, "trained_on": 0}
+
+
+def load_index_params(index_path, dimension) -> dict:
+    path = index_params_path(index_path)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Failed to read {path}, assuming a flat index: {e}")
+    return flat_params(dimension)
+
+
+def save_index_params(index_path, params):
+    path = index_params_path(index_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+    os.replace(tmp, path)
+
+
+def promoted_params(index_type, dimension, count) -> dict:
+    """Parameters of an index_type index for count vectors."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type {index_type!r}, expected one of {INDEX_TYPES}")
+    params = {"type": index_type, "dimension": dimension, "trained_on": int(count)}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # ~4*sqrt(n) lists, with at least 39 training points per list
+        params["nlist"] = int(max(1, min(4 * math.sqrt(count), count // 39)))
+        params["nprobe"] = min(FAISS_IVF_NPROBE, params["nlist"])
+    if index_type == "ivf_pq":
+        m = FAISS_PQ_M
+        while dimension % m:
+            m -= 1
+        params["m"] = m
+        # 8-bit codes need 256 * 39 training points
+        params["nbits"] = int(min(8, max(4, math.log2(max(count, 1) / 39))))
+    if index_type == "hnsw":
+        params["hnsw_m"] = FAISS_HNSW_M
+        params["ef_search"] = FAISS_HNSW_EF_SEARCH
+    return params
+
+
+def create_index(params):
+    factory = {
+        "flat": "IDMap2,Flat",
+        "ivf_flat": "IVF{nlist},Flat",
+        "ivf_pq": "IVF{nlist},PQ{m}x{nbits}",
+        "hnsw": "IDMap2,HNSW{hnsw_m},Flat",
+    }[params["type"]].format(**params)
+    index = faiss.index_factory(params["dimension"], factory, faiss.METRIC_INNER_PRODUCT)
+    if params["type"] in ("ivf_flat", "ivf_pq"):
+        # lookups and removals by id
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def index_has_ids(index) -> bool:
+    """False for indexes written before vector ids, whose vectors are numbered by position."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return True
+    if isinstance(index, faiss.IndexIVF):
+        return index.direct_map.type == faiss.DirectMap.Hashtable
+    return False
+
+
+def apply_search_params(index, params):
+    """Set the query-time knobs stored in params on a loaded index."""
+    if params["type"] in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    elif params["type"] == "hnsw":
+        faiss.downcast_index(faiss.downcast_index(index).index).hnsw.efSearch = params["ef_search"]
+
+
+def build_index(params, vectors, ids):
+    """A params index holding vectors under ids, trained on them (or a sample) when needed."""
+    index = create_index(params)
+    if not index.is_trained:
+        sample = vectors
+        limit = 256 * params.get("nlist", 1)
+        if len(vectors) > limit:
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), limit, replace=False)]
+        index.train(sample)
+    if len(vectors):
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    apply_search_params(index, params)
+    return index
+
+
+def index_ids(index):
+    """int64 ids of every vector in index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map).astype("int64")
+    if isinstance(index, faiss.IndexIVF) and index_has_ids(index):
+        lists = index.invlists
+        return np.concatenate([np.empty(0, dtype="int64")] + [
+            faiss.rev_swig_ptr(lists.get_ids(l), lists.list_size(l)).copy()
+            for l in range(index.nlist) if lists.list_size(l)
+        ])
+    return np.arange(index.ntotal, dtype="int64")
+
+
+def ids_and_vectors(index):
+    """(ids, vectors) of every vector in index."""
+    index = faiss.downcast_index(index)
+    ids = index_ids(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return ids, index.index.reconstruct_n(0, index.ntotal)
+    if isinstance(index, faiss.IndexIVF):
+        if index_has_ids(index):
+            return ids, index.reconstruct_batch(ids)
+        index.make_direct_map()
+    return ids, index.reconstruct_n(0, index.ntotal)
+
+
+def remove_ids(index, params, ids):
+    """
+    Remove the vectors of ids from index. Returns (index, removed); an HNSW index is
+    rebuilt without them.
+    """
+    ids = np.asarray(ids, dtype="int64")
+    if not len(ids) or not index.ntotal:
+        return index, 0
+    if params["type"] == "hnsw":
+        current, vectors = ids_and_vectors(index)
+        keep = ~np.isin(current, ids)
+        removed = int(len(keep) - keep.sum())
+        if not removed:
+            return index, 0
+        start_time = time.perf_counter()
+        rebuilt = build_index(params, vectors[keep], current[keep])
+        print(f"FAISS hnsw index rebuilt without {removed} vectors: "
+              f"{time.perf_counter() - start_time:.3f} seconds")
+        return rebuilt, removed
+    removed = index.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids)))
+    return index, int(removed)
+
+
+def maybe_promote(index, params):
+    """
+    Rebuild index when it outgrew its type: a flat index past FAISS_PROMOTE_AT vectors,
+    or an IVF-Flat index past FAISS_RETRAIN_GROWTH times the size it was trained on.
+    Returns (index, params), unchanged when no rebuild is due.
+    """
+    count = index.ntotal
+    if params["type"] == "flat":
+        if count < FAISS_PROMOTE_AT:
+            return index, params
+        new_params = promoted_params(FAISS_PROMOTED_TYPE, params["dimension"], count)
+    elif params["type"] == "ivf_flat" and count >= FAISS_RETRAIN_GROWTH * max(params["trained_on"], 1):
+        new_params = promoted_params("ivf_flat", params["dimension"], count)
+    else:
+        # IVF-PQ only keeps approximate vectors and HNSW needs no training
+        return index, params
+
+    start_time = time.perf_counter()
+    ids, vectors = ids_and_vectors(index)
+    new_index = build_index(new_params, vectors, ids)
+    print(f"FAISS index {params['type']} -> {new_params['type']} for {count} vectors: "
+          f"{time.perf_counter() - start_time:.3f} seconds")
+    return new_index, new_params
@@ -2,4 +2,9 @@ from gui.application import app
 server = app.server
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # single-process development server: load the model here unless the service runs
+    from logai.embedding import warm_up_async
+    from logai.embedding_service import allow_local_fallback
+    allow_local_fallback()
+    warm_up_async(load_local=True)
+    app.run(debug=True)
@@ -0,0 +1,61 @@
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from logai.log_parser_config import LogParserConfig, compiled_rules
+from logai.pattern import Pattern
+from logai.template_rules import template_decidable, template_mode_available
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+WHITESPACE_RULES = [r"assoc\s", "  ", r"wifi\s+up", r"[A-Z]{3} ", r"timeout\s$"]
+
+
+def _write_log(path):
+    lines = []
+    for i in range(60):
+        ts = f"Sep  {1 + i % 9} 10:{i % 60:02d}:{i % 60:02d}"
+        lines.append(f"{ts} hostapd: wlan0: STA {i % 7} IEEE 802.11: assoc  request\n")
+        lines.append(f"{ts} netd: wifi   up on radio {i % 3}\n")
+        lines.append(f"{ts} dhcp: lease timeout \n")
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def _counts(project_dir, log_path, rules, use_templates):
+    lpc = LogParserConfig()
+    lpc.lookup_cache = {
+        "messages": [
+            {"Category": "wifi", "Title": rule, "Cause": "", "Description": "", "Pattern": rule,
+             "RegexCompiled": compiled_rules.compile(rule)}
+            for rule in rules
+        ]
+    }
+    files = [(log_path.name, str(log_path), "messages.log", None, None)]
+    df = lpc._parse_logs(str(project_dir), files, use_templates)
+    return dict(zip(df["Title"], df["Frequency"])) if not df.empty else {}
+
+
+@pytest.mark.parametrize("rule", WHITESPACE_RULES)
+def test_whitespace_rules_are_left_to_the_raw_scan(rule):
+    assert not template_decidable(re.compile(rule))
+
+
+def test_raw_and_template_mode_counts_are_equal(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)  # drain3.ini
+    log_path = tmp_path / "messages.log"
+    _write_log(log_path)
+    Pattern().parse_logs(str(log_path), streaming=False, load_result=False)
+    assert template_mode_available(str(log_path))
+
+    rules = WHITESPACE_RULES + ["assoc", "hostapd"]
+    raw_dir, template_dir = tmp_path / "raw", tmp_path / "templates"
+    os.makedirs(raw_dir)
+    os.makedirs(template_dir)
+    raw = _counts(raw_dir, log_path, rules, use_templates=False)
+    templates = _counts(template_dir, log_path, rules, use_templates=True)
+
+    assert raw == templates
+    for rule in WHITESPACE_RULES:
+        assert raw[rule] > 0